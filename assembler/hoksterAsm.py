@@ -612,6 +612,7 @@ class HoksterInstruction():
         directive (): unused at the moment
         errors (list): a list of HoksterErrors associated with the current instruction/directive
         num_cycles (int): the number of PC cycles associated with the current instruction.  Usually 1 or 2
+        line_num (int): the line of the input file the instruction was parsed from, None if not from a file
 
     Methods:
         __init__: sets the class variables, runs first pass on instruction parsing
@@ -642,6 +643,7 @@ class HoksterInstruction():
         self.directive    = directive        #
         self.errors       = []               #List of HoksterError Objects
         self.num_cycles   = 0                #the number of cycles required for this operation to occur
+        self.line_num     = None             #the input file line this instruction came from
 
         self.instruction_input = None
         self.instruction_output = None
@@ -1278,6 +1280,7 @@ class HoksterParser():
 
                     for i in range(num_nops):
                         new_instr = HoksterInstruction("single_cycle_nop", PC, None, from_asm=True)
+                        new_instr.line_num = idx + 1
                         self.instructions.append(new_instr)
                         PC    = new_instr.get_next_PC()
                         
@@ -1288,6 +1291,7 @@ class HoksterParser():
             
             else:
                 new_instr = HoksterInstruction(line, PC, temp_line["comment"])
+                new_instr.line_num = idx + 1
 
                 if new_instr.is_instr:
                     PC    = new_instr.get_next_PC()
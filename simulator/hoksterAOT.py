@@ -0,0 +1,310 @@
+'''
+hoksterAOT: ahead-of-time translation of HOKSTER programs.
+
+Takes a _prog.hex (and _data.hex), or an assembler HoksterParser, and
+writes a standalone Python module that runs the program as a state machine
+over int registers and a bytearray DRAM. Every basic block reachable from
+PC 0 becomes a function; cycle counts match hoksterCore's fsm for programs
+that end on "sys 0xff". Interrupts are not modelled: hlt stops the run,
+and rti, str and lsr stop it with an error.
+
+    python hoksterAOT.py prog.hex [-d data.hex] [-o prog_aot.py]
+'''
+import os
+import sys
+import inspect
+import argparse
+import hoksterCore
+from hoksterCore import Block_Translator, ISE_Tables, ISE_Machine, ISE_AMC, ISE_SWD, ISE_GSP
+
+TEMPLATE = '''"""
+HOKSTER program {name}, translated ahead of time by hoksterAOT.py.
+
+run() returns a dict with errc, pc, cycles, regs, dram, sp, ie, sr and sbus.
+"""
+PROG = bytes.fromhex("{prog}")
+DATA = bytes.fromhex("{data}")
+SBOX_ASB = bytes.fromhex("{sbox_asb}")
+SBOX_GIFT = bytes.fromhex("{sbox_gift}")
+PERM_GIFT = {perm}
+PERM_BYTES = [[0] * 256 for i in range(16)]
+for j, k in enumerate(PERM_GIFT):
+    tbl = PERM_BYTES[j >> 3]
+    for v in range(256):
+        if v >> (j & 7) & 1:
+            tbl[v] |= 1 << k
+
+class ISE_Tables(object):
+    # what hoksterCore.ISE_Tables has for the ISE machines below
+    gift = SBOX_GIFT
+    perm_bytes = PERM_BYTES
+    @classmethod
+    def get(cls):
+        return cls
+
+{ise}
+
+def run(dram = None, inputs = None, max_cycles = None):
+    R = bytearray(16)
+    V = bytearray(16)
+    M = bytearray({dsize})
+    M[:len(DATA)] = DATA
+    if dram is not None:
+        M[:len(dram)] = dram
+    for addr, words in (inputs or {{}}).items():
+        M[addr:addr+len(words)] = words
+    z = n = c = x = False
+    sp = 0
+    ie = 0
+    sbus = 0
+    cyc = 0
+    stop = None
+    amc = ISE_AMC()
+    swd = ISE_SWD()
+    gsp = ISE_GSP()
+{blocks}
+    B = {{
+{table}
+    }}
+    pc = 0
+    while pc >= 0:
+        if max_cycles is not None and cyc >= max_cycles:
+            stop = ("Cycle limit of {{}} reached.".format(max_cycles), pc)
+            break
+        blk = B.get(pc)
+        if blk is None:
+            if pc > {maxpc}:
+                stop = ("Error: Max PC Exceeded.", {maxpc})
+            else:
+                stop = ("Error: No translation for pc = {{:03x}}.".format(pc), pc)
+            break
+        pc = blk()
+    return {{
+        "errc" : stop[0],
+        "pc" : stop[1],
+        "cycles" : cyc,
+        "regs" : bytes(R),
+        "dram" : M,
+        "sp" : sp,
+        "ie" : ie,
+        "sr" : (z, n, c, x),
+        "sbus" : sbus,
+    }}
+
+if __name__ == "__main__":
+    res = run()
+    print("{{}} Cycles: {{}}".format(res["errc"], res["cycles"]))
+'''
+
+class AOT_Translator(Block_Translator):
+    '''
+    Block_Translator emitters plus the ones only a whole-program translation
+    can use: ISEs keep their state in the ISE machines of hoksterCore,
+    copied into the generated module, sys 0xff and hlt end the run, and cycles are kept in cyc.
+    '''
+    def __init__(self, core, meta, ins):
+        super(AOT_Translator, self).__init__(core, meta, ins)
+        self._emit.update({
+            "asb" : self.emit_asb,
+            "amc" : self.emit_ise,
+            "swd" : self.emit_ise,
+            "gsp" : self.emit_ise,
+            "sys" : self.emit_sys,
+            "hlt" : self.emit_hlt,
+        })
+        # the fsm counts one cycle for the aluc byte of a waiting ISE, run()
+        # returns the rest; the hlt cycle itself is never counted
+        self._cycles = {"amc" : 1, "swd" : 1, "gsp" : 1, "hlt" : 0}
+
+    def emit_asb(self, mnem, pc, b0, b1):
+        return ["R[{}] = SBOX_ASB[R[{}]]".format(b1 & 0xF, b1 >> 4)], set(), False
+    def emit_ise(self, mnem, pc, b0, b1):
+        return ["cyc += {}.run(R, {}, {})".format(mnem, b1 >> 4, b1 & 0xF)], {"cyc"}, False
+    def emit_sys(self, mnem, pc, b0, b1):
+        lines = ["sbus = {:#04x}".format(b1)]
+        if b1 != 0xff:
+            return lines, {"sbus"}, False
+        lines += ["stop = (\"System End signal received.\", {:#05x})".format(pc + 1), "return -1"]
+        return lines, {"sbus", "cyc", "stop"}, True
+    def emit_hlt(self, mnem, pc, b0, b1):
+        lines = ["stop = (\"Halted.\", {:#05x})".format(pc + 1), "return -1"]
+        return lines, {"cyc", "stop"}, True
+
+    def function(self, start):
+        '''
+        Returns the source of the block function for start and the PCs it can
+        continue at.
+        '''
+        pram = self._core._pram
+        maxpc = self._core._srgs._PC._maxPC
+        body = []
+        uses = set()
+        succ = []
+        pending = 0
+        pc = start
+        end = False
+        done = False
+        while not end:
+            dec = self._ins.fetch(pc)
+            mnem = dec._op._instr._mnem if dec._op is not None else None
+            length = dec._op._cycles if dec._op is not None else 1
+            if mnem not in self._emit:
+                if mnem is None:
+                    errc = "Error: Unrecognized instruction {:02x}".format(dec._word)
+                else:
+                    errc = "Error: {} not supported ahead of time".format(mnem)
+                body += ["cyc += {}".format(pending), "stop = (\"{} at pc = {:03x}.\", {:#05x})".format(errc, pc, pc), "return -1"]
+                uses |= {"cyc", "stop"}
+                done = True
+                break
+            b1 = pram.bus(pc + 1) if length > 1 and pc + 1 <= pram._maxaddr else 0
+            lines, used, end = self._emit[mnem](mnem, pc, dec._word, b1)
+            body.append("# {:03x}: {}".format(pc, mnem))
+            # the fsm stops with "Max PC Exceeded." when it cannot advance past
+            # the last cycle it ran; jumps only need to get past their first one
+            jumps = mnem in ("jmp", "jsr") or mnem in self._branch_flag
+            last = pc if jumps or (mnem == "sys" and b1 == 0xff) else pc + length - 1
+            if mnem != "ret" and last + 1 > maxpc:
+                ran = max(1, min(length, maxpc - pc + 1))
+                if ran == length and not end:
+                    body += lines
+                    uses |= used
+                body += ["cyc += {}".format(pending + ran), "stop = (\"Error: Max PC Exceeded.\", {:#05x})".format(maxpc), "return -1"]
+                uses |= {"cyc", "stop"}
+                done = True
+                break
+            cycles = self._cycles.get(mnem, length)
+            if "cyc" in used:
+                body.append("cyc += {}".format(pending + cycles))
+                pending = 0
+            else:
+                pending += cycles
+            body += lines
+            uses |= used
+            done = "stop" in used
+            if mnem == "jmp":
+                succ.append(((dec._word & 0xF) << 8) | b1)
+            elif jumps:
+                succ += [((dec._word & 0xF) << 8) | b1, pc + 2]
+            pc += length
+        if not done:
+            if pending:
+                body.append("cyc += {}".format(pending))
+                uses.add("cyc")
+            body.append("return pc")
+        names = [v for v in ("cyc", "stop", "sbus", "sp", "ie") if v in uses]
+        names += [f for f in "zncx" if f.upper() in uses]
+        if "IE" not in uses and "ie" in names:
+            names.remove("ie")
+        src = "    def b_{:03x}():\n".format(start)
+        if names:
+            src += "        nonlocal {}\n".format(", ".join(names))
+        src += "".join("        {}\n".format(l) for l in body)
+        return src, succ
+
+    def entries(self):
+        '''
+        PCs statically reachable as block starts from PC 0: branch, jump and
+        jsr targets and jsr return sites. ret only ever goes to the latter.
+        '''
+        maxpc = self._core._srgs._PC._maxPC
+        todo = [0]
+        found = {}
+        while todo:
+            pc = todo.pop()
+            if pc in found or pc > maxpc:
+                continue
+            found[pc] = self.function(pc)
+            todo += found[pc][1]
+        return found
+
+def hex_lines(src):
+    '''
+    Hex lines from a path, a list of lines, or an assembler HoksterParser.
+    '''
+    if src is None:
+        return []
+    if isinstance(src, str):
+        with open(src, 'r') as f:
+            return f.readlines()
+    if hasattr(src, "instructions"):
+        return "\n".join(i.to_newline_hex() for i in src.instructions if i.is_instr).split("\n")
+    return list(src)
+
+def parser_data(parser):
+    '''
+    The parser's data directives as hex lines, zero filled like
+    HoksterParser.write_data_file.
+    '''
+    words = bytearray()
+    for key, vals in parser.hokster_ref.data.items():
+        addr = key if isinstance(key, int) else int(key, 0)
+        if addr > len(words):
+            words += bytes(addr - len(words))
+        for v in vals:
+            words.append((v if isinstance(v, int) else int(v, 0)) & 0xFF)
+    return ["{:02x}".format(w) for w in words]
+
+def translate(prog, data = None, name = "prog"):
+    '''
+    Returns the source of the translated module. prog and data may be paths,
+    lists of hex lines or, for prog, a HoksterParser; its data is used when
+    data is None.
+    '''
+    h = hoksterCore.HOKSTER(quiet=True)
+    if data is None and hasattr(prog, "hokster_ref"):
+        data = parser_data(prog)
+    ret = h._h.pram_load(hex_lines(prog), name)
+    if "Error" in ret:
+        raise ValueError(ret)
+    datalines = hex_lines(data)
+    if datalines:
+        ret = h._h.data_load(datalines, name)
+        if "Error" in ret:
+            raise ValueError(ret)
+    pram = h.core._pram
+    dram = h.core._dram
+    maxpc = h.core._srgs._PC._maxPC
+    aot = AOT_Translator(h.core, h.meta, h._h._ins)
+    blocks = aot.entries()
+    tbl = ISE_Tables.get()
+    sbox_asb, sbox_gift, perm = tbl.asb, tbl.gift, tbl.perm
+    highest = h.meta._highest if datalines else -1
+    return TEMPLATE.format(
+        name = name,
+        prog = bytes(pram.view(0, maxpc + 1)).hex(),
+        data = bytes(dram.view(0, highest + 1)).hex(),
+        sbox_asb = sbox_asb.hex(),
+        sbox_gift = sbox_gift.hex(),
+        perm = tuple(perm),
+        ise = "\n\n".join(inspect.getsource(cls) for cls in (ISE_Machine, ISE_AMC, ISE_SWD, ISE_GSP)),
+        dsize = len(dram._mem),
+        maxpc = maxpc,
+        blocks = "".join(blocks[pc][0] for pc in sorted(blocks)),
+        table = "\n".join("        {:#05x} : b_{:03x},".format(pc, pc) for pc in sorted(blocks)),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Translate a HOKSTER program to a standalone Python module.')
+    parser.add_argument('prog', type=str, help='program hex file')
+    parser.add_argument('--data', '-d', type=str, help='data hex file', default=None, required=False)
+    parser.add_argument('--output', '-o', type=str, help='module to write', default=None, required=False)
+    args = parser.parse_args()
+    if args.data is None and "prog" in args.prog:
+        dsource = args.prog.replace("prog", "data")
+        if os.path.exists(dsource):
+            args.data = dsource
+    if args.output is None:
+        args.output = os.path.splitext(args.prog)[0] + "_aot.py"
+    name = os.path.basename(os.path.splitext(args.prog)[0])
+    try:
+        src = translate(args.prog, args.data, name)
+    except (IOError, ValueError) as er:
+        print("Error: {}".format(er))
+        sys.exit(1)
+    with open(args.output, 'w') as f:
+        f.write(src)
+    print("Success: Wrote \"{}\"".format(args.output))
+
+if __name__ == '__main__':
+    main()
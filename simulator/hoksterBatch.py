@@ -0,0 +1,150 @@
+'''
+hoksterBatch: runs many HOKSTER jobs across a process pool.
+
+A manifest is a JSON list of jobs, or one job per line. A job names a
+program and optionally its data, inputs, limits and DRAM ranges:
+
+    {"id": "gcd", "prog": "GCD_prog.hex", "data": "GCD_data.hex",
+     "inputs": {"0x0100": "0001"}, "max_cycles": 100000,
+     "ranges": [["0x0200", "0x0210"]], "engine": "block",
+     "interrupts": {"0x01b": "0002"}, "cycinterr": {"40": "0006"}}
+
+Addresses and cycles are ints or strings int(x, 0) reads, inputs and ivs
+hex. Relative paths are taken from the manifest's folder. A _prog.hex
+given instead of a manifest is one job, with the _data.hex next to it.
+Each worker keeps one HOKSTER per program it has loaded and restores it
+for the next job on the same program. Results are written as JSON lines,
+in the order jobs finish.
+
+    python hoksterBatch.py manifest.jsonl [X_prog.hex ...] [-j 4] [-o results.jsonl]
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import hoksterCore
+
+def num(x):
+    return x if isinstance(x, int) else int(x, 0)
+
+def load_manifest(path):
+    '''
+    Jobs of a manifest file, with paths made absolute.
+    '''
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        jobs = json.loads(text)
+    else:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    base = os.path.dirname(os.path.abspath(path))
+    for job in jobs:
+        for key in ("prog", "data"):
+            if job.get(key) is not None:
+                job[key] = os.path.join(base, job[key])
+    return jobs
+
+def prog_job(prog):
+    '''
+    Job for a _prog.hex, with its _data.hex when there is one.
+    '''
+    job = {"id": os.path.basename(prog), "prog": os.path.abspath(prog)}
+    dsource = prog.replace("_prog", "_data")
+    if dsource != prog and os.path.exists(dsource):
+        job["data"] = os.path.abspath(dsource)
+    return job
+
+# this worker's HOKSTERs by (prog, data), loaded once and restored per job
+_warm = {}
+
+def warm(prog, data):
+    key = (prog, data)
+    h = _warm.get(key)
+    if h is None:
+        h = hoksterCore.HOKSTER(quiet = True)
+        hoksterCore.load_program(h, prog, data)
+        h.snapshot()
+        _warm[key] = h
+    else:
+        h.restore()
+    return h
+
+def run_job(job):
+    '''
+    Runs one job, returns its result as a dict ready for JSON. Failures
+    come back as an "error" entry instead of raising.
+    '''
+    out = {"id": job.get("id"), "prog": job.get("prog")}
+    t = time.time()
+    try:
+        h = warm(job["prog"], job.get("data"))
+        ranges = [(num(a), num(b)) for a, b in job.get("ranges", [])]
+        r = hoksterCore.run_loaded(h,
+            max_cycles = job.get("max_cycles"),
+            inputs = {num(a): bytes.fromhex(v) for a, v in job.get("inputs", {}).items()},
+            ranges = ranges,
+            max_instructions = job.get("max_instructions"),
+            max_wall_seconds = job.get("max_wall_seconds"),
+            engine = job.get("engine", "block"),
+            interrupts = {num(pc): int(iv, 16) for pc, iv in job.get("interrupts", {}).items()},
+            cycinterr = {num(cyc): int(iv, 16) for cyc, iv in job.get("cycinterr", {}).items()})
+    except Exception as ex:
+        out["error"] = "{}: {}".format(type(ex).__name__, ex)
+        return out
+    out.update({
+        "stop": r.stop.name,
+        "errc": r.errc,
+        "cycles": r.cycles,
+        "halt_cycles": r.halt_cycles,
+        "instructions": r.instructions,
+        "pc": r.pc,
+        "sp": r.sp,
+        "regs": r.regs,
+        "dram": {"{:04x}-{:04x}".format(a, b): r.dram[(a, b)].hex() for a, b in ranges},
+        "seconds": round(time.time() - t, 6),
+    })
+    return out
+
+def run_batch(jobs, processes = None, out = None):
+    '''
+    Runs jobs on a pool of processes (default: one per CPU) and yields
+    each result dict as it finishes. With out, a writable file, every
+    result is also written to it as a JSON line.
+    '''
+    with multiprocessing.Pool(processes) as pool:
+        for res in pool.imap_unordered(run_job, jobs):
+            if out is not None:
+                out.write(json.dumps(res) + "\n")
+                out.flush()
+            yield res
+
+def main():
+    parser = argparse.ArgumentParser(description='Run HOKSTER jobs from manifests or _prog.hex files on a process pool.')
+    parser.add_argument('sources', type=str, nargs='+', help='manifest (.json/.jsonl) or _prog.hex files')
+    parser.add_argument('--jobs', '-j', type=int, help='worker processes, default one per CPU', default=None, required=False)
+    parser.add_argument('--output', '-o', type=str, help='JSON lines file to write, default stdout', default=None, required=False)
+    args = parser.parse_args()
+    jobs = []
+    try:
+        for src in args.sources:
+            if src.endswith(".hex"):
+                jobs.append(prog_job(src))
+            else:
+                jobs += load_manifest(src)
+    except (IOError, ValueError) as er:
+        print("Error: {}".format(er), file=sys.stderr)
+        sys.exit(1)
+    out = sys.stdout if args.output is None else open(args.output, 'w')
+    failed = 0
+    for res in run_batch(jobs, args.jobs, out):
+        failed += "error" in res
+    if out is not sys.stdout:
+        out.close()
+    if failed:
+        print("Error: {} of {} jobs failed.".format(failed, len(jobs)), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,15 @@
 import time
 #progtime = time.time()
 import sys
-try: 
-    from bitstring import BitArray
-except ImportError:
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "bitstring"])
-    from bitstring import BitArray
+from bitstring import BitArray
 
 import re
+import copy
+import heapq
+import mmap
+import struct
+import zlib
+from array import array
 from enum import IntEnum, unique
 
 @unique
@@ -18,6 +19,18 @@ class Debug(IntEnum):
     Warn = 2
     Test = 3
 
+@unique
+class Stop(IntEnum):
+    # why Handler.run returned, set next to its errc
+    End = 0
+    Breakpoint = 1
+    BreakInstr = 2
+    CycleLimit = 3
+    InstrLimit = 4
+    Timeout = 5
+    Error = 6
+    Halted = 7
+
 class Timeout(object):
     def __init__(self, seconds = 30):
         self._sec = seconds
@@ -28,6 +41,8 @@ class Timeout(object):
         self._tamt = time.time() + self._sec
     def expired(self):
         return self._tamt < time.time()
+    def expire(self):
+        self._tamt = 0
 
 class System(object):
     def __init__(self, sBits = 8):
@@ -91,9 +106,165 @@ class ProgramState(object):
     def _get_(self):
         return self._state
 
+def plain_state(obj, skip = ()):
+    '''
+    The attributes of obj copy_state copies, by name: numbers, strings,
+    BitArrays and containers.
+    '''
+    return {key: val for key, val in obj.__dict__.items() if key not in skip and
+        (val is None or isinstance(val, (BitArray, dict, list, array, bytearray, int, float, str, tuple)))}
+
+def set_state(dst, state):
+    '''
+    Sets the attributes of dst from state, as plain_state returns it.
+    '''
+    for key, val in state.items():
+        if isinstance(val, BitArray):
+            setattr(dst, key, val.__copy__())
+        elif isinstance(val, (dict, list, array, bytearray)):
+            mine = getattr(dst, key, None)
+            if type(mine) is not type(val):
+                setattr(dst, key, copy.copy(val))
+            elif isinstance(val, dict):
+                mine.clear()
+                mine.update(val)
+            else:
+                mine[:] = val
+        else:
+            setattr(dst, key, val)
+
+def copy_state(src, dst, skip = ()):
+    '''
+    Copies the plain state of src onto dst, an instance of the same class:
+    numbers, strings, BitArrays and containers. Containers are copied into
+    dst's own so whatever shares them keeps doing so (PC and Special_Regs
+    share _wait). References to other objects are left alone.
+    '''
+    set_state(dst, plain_state(src, skip))
+
+# checkpoint files: a header, then DRAM and PRAM raw and the rest of the
+# state packed by pack_state. DRAM starts at an mmap aligned offset.
+CHECKPOINT_MAGIC = b"HOKSTATE"
+CHECKPOINT_VERSION = 2
+_chk_head = struct.Struct("<8sIIIIIII")
+_u32 = struct.Struct("<I")
+_f64 = struct.Struct("<d")
+_enums = {"Debug" : Debug, "Stop" : Stop}
+
+# binary traces: a header with the mnemonic names, then one TRACE_RECORD
+# per cycle: the cycle it started at, pc, DRAM address, register value, second register
+# value, DRAM value, progword, mnemonic index, register, second register
+# (0xff for none, lxb writes two) and TRACE_* flags, the low nibble the
+# z/n/c/x flags of SR after the cycle.
+TRACE_MAGIC = b"HOKTRACE"
+TRACE_VERSION = 1
+TRACE_HEAD = struct.Struct("<8sIII")
+TRACE_RECORD = struct.Struct("<QHHHHHBBBBBx")
+TRACE_FIELDS = ("cycle", "pc", "addr", "val", "val2", "mem", "word", "ins", "reg", "reg2", "flags")
+TRACE_REG = 0x10
+TRACE_MEM = 0x20
+TRACE_HALT = 0x40
+TRACE_END = 0x80
+
+def pack_state(val, out):
+    '''
+    Appends val, plain state or dicts and lists of it, to the bytearray
+    out: a one letter tag, then the value.
+    '''
+    t = type(val)
+    if val is None:
+        out += b"n"
+    elif t is bool:
+        out += b"t" if val else b"f"
+    elif isinstance(val, IntEnum):
+        name = t.__name__.encode()
+        out += b"e" + bytes([len(name)]) + name
+        pack_state(int(val), out)
+    elif t is int:
+        n = (val.bit_length() + 8) >> 3
+        out += b"i" + bytes([n]) + val.to_bytes(n, "little", signed=True)
+    elif t is float:
+        out += b"d" + _f64.pack(val)
+    elif t is str:
+        val = val.encode()
+        out += b"s" + _u32.pack(len(val)) + val
+    elif t is bytearray:
+        out += b"y" + _u32.pack(len(val)) + val
+    elif t is array:
+        out += b"a" + val.typecode.encode() + _u32.pack(len(val)) + val.tobytes()
+    elif t is BitArray:
+        out += b"b" + _u32.pack(len(val)) + val.tobytes()
+    elif t is list or t is tuple:
+        out += (b"l" if t is list else b"u") + _u32.pack(len(val))
+        for v in val:
+            pack_state(v, out)
+    elif t is dict:
+        out += b"m" + _u32.pack(len(val))
+        for k, v in val.items():
+            pack_state(k, out)
+            pack_state(v, out)
+    else:
+        raise TypeError("Checkpoint Error: {} of type {} cannot be saved.".format(val, t.__name__))
+
+def unpack_state(buf, pos = 0):
+    '''
+    The value pack_state wrote at pos of buf, and the position after it.
+    '''
+    tag = chr(buf[pos])
+    pos += 1
+    if tag == "n":
+        return None, pos
+    if tag in ("t", "f"):
+        return tag == "t", pos
+    if tag == "e":
+        n = buf[pos]
+        cls = _enums[bytes(buf[pos+1:pos+1+n]).decode()]
+        val, pos = unpack_state(buf, pos+1+n)
+        return cls(val), pos
+    if tag == "i":
+        n = buf[pos]
+        return int.from_bytes(buf[pos+1:pos+1+n], "little", signed=True), pos+1+n
+    if tag == "d":
+        return _f64.unpack_from(buf, pos)[0], pos+8
+    if tag == "a":
+        typecode = chr(buf[pos])
+        n, = _u32.unpack_from(buf, pos+1)
+        val = array(typecode)
+        end = pos+5+n*val.itemsize
+        val.frombytes(bytes(buf[pos+5:end]))
+        return val, end
+    if tag in ("s", "y", "b", "l", "u", "m"):
+        n, = _u32.unpack_from(buf, pos)
+        pos += 4
+        if tag == "s":
+            return bytes(buf[pos:pos+n]).decode(), pos+n
+        if tag == "y":
+            return bytearray(buf[pos:pos+n]), pos+n
+        if tag == "b":
+            end = pos+(n+7 >> 3)
+            return BitArray(bytes=bytes(buf[pos:end]), length=n), end
+        if tag == "m":
+            val = {}
+            for i in range(n):
+                k, pos = unpack_state(buf, pos)
+                val[k], pos = unpack_state(buf, pos)
+            return val, pos
+        val = []
+        for i in range(n):
+            v, pos = unpack_state(buf, pos)
+            val.append(v)
+        return (val if tag == "l" else tuple(val)), pos
+    raise ValueError("Checkpoint Error: Unknown tag {} at {}.".format(tag, pos-1))
+
 def get_imm(args, base = 10):
     return int(''.join(args),base)
 
+_nibble = [BitArray(uint=nib, length=4) for nib in range(16)]
+
+def nibbles(word):
+    # shared, never-written BitArrays: ops only read their args
+    return _nibble[word >> 4], _nibble[word & 0xF]
+
 def reg_map(arg):
     if type(arg) is list:
         if len(arg) == 1:
@@ -109,9 +280,14 @@ def reg_map(arg):
 class Registers(object):
     def __init__(self, num_regs = 16, rbits = 8):
         self._rbits = rbits
+        self._mask = 2**rbits-1
         self._num_regs = num_regs
-        self._reg = [BitArray(length = self._rbits) for i in range(num_regs)]
-        self._regShadow = [BitArray(length = self._rbits) for i in range(num_regs)]
+        # plain ints, one entry per register
+        self._tc = 'B' if rbits <= 8 else 'H' if rbits <= 16 else 'L'
+        self._reg = array(self._tc, [0]*num_regs)
+        self._regShadow = array(self._tc, [0]*num_regs)
+        # (reg, word) of every write is appended here while traced
+        self._watch = None
         self.DEBUG = Debug.Warn
     def validReg(self, reg):
         if 0 <= reg < self._num_regs:
@@ -120,31 +296,21 @@ class Registers(object):
             print("Register Error: Invalid reg {}".format(reg))
         return False
     def toPair(self,reg):
-        halfRegs = (int) (self._num_regs/2)
-        if self.validReg(reg.uint):
-            if reg.uint >= halfRegs:
-                bx = self._reg[reg.uint-halfRegs].__copy__()
-                bx.prepend(self._reg[reg.uint].__copy__())
-                return bx
-            else:
-                bx = self._reg[reg.uint].__copy__()
-                bx.prepend(self._reg[reg.uint-halfRegs].__copy__())
-                return bx
+        # Ai&Ri as a single address, Ai is the upper word
+        halfRegs = self._num_regs >> 1
+        reg = self.isGood_reg(reg)
+        if reg is not None and self.validReg(reg):
+            ri = reg % halfRegs
+            return (self._reg[ri+halfRegs] << self._rbits) | self._reg[ri]
         return None
     def _shadow_(self, write = False, Ns = 2):
-        halfRegs = (int) (self._num_regs/2)
+        halfRegs = self._num_regs >> 1
         if write:
-            for i in range(Ns):
-                self._regShadow[i].overwrite(self._reg[i],0)
-                self._regShadow[i+halfRegs].overwrite(self._reg[i+halfRegs],0)
-            #for i, bA in enumerate(self._reg):
-            #    self._regShadow[i].overwrite(bA,0)
+            self._regShadow[0:Ns] = self._reg[0:Ns]
+            self._regShadow[halfRegs:halfRegs+Ns] = self._reg[halfRegs:halfRegs+Ns]
         else:
-            for i in range(Ns):
-                self._reg[i].overwrite(self._regShadow[i],0)
-                self._reg[i+halfRegs].overwrite(self._regShadow[i+halfRegs],0)
-            #for i, bA in enumerate(self._regShadow):
-            #    self._reg[i].overwrite(bA,0)
+            self._reg[0:Ns] = self._regShadow[0:Ns]
+            self._reg[halfRegs:halfRegs+Ns] = self._regShadow[halfRegs:halfRegs+Ns]
         if self.DEBUG >= Debug.Test:
             if write:
                 print("Copied registers to shadow registers.")
@@ -176,20 +342,21 @@ class Registers(object):
     def isGood_word(self,word):
         if word is None:
             return None
-        if type(word) is not BitArray:
-            raise TypeError("Reg Word must be bit array.")
-        return word
-    def write(self, reg, word):
         if type(word) is BitArray:
-            self._reg[reg] = word
-        elif type(word) is int:
-            self._reg[reg].int = word
+            return word.uint & self._mask
+        if type(word) is not int:
+            raise TypeError("Reg Word must be int or BitArray.")
+        return word & self._mask
+    def write(self, reg, word):
+        self._reg[reg] = word
+        if self._watch is not None:
+            self._watch.append((reg, word))
         if self.DEBUG >= Debug.Test:
             print("Write {} at {}".format(word, reg))
     def read(self,reg):
         if self.DEBUG >= Debug.Test:
-            print("Read {} at {}".format(self._reg[reg].int, reg))
-        return self._reg[reg].__copy__()
+            print("Read {} at {}".format(self._reg[reg], reg))
+        return self._reg[reg]
     def bus(self, reg, word=None):
         if self.DEBUG >= Debug.Test:
             print("bus reg: {} word: {}".format(reg,word))
@@ -209,20 +376,26 @@ class Memory(object): # TODO: add handling for reading unitialized memory
         self._minaddr = 0
         self._w_width = word_width
         self._a_width = addr_width
-        self._mem = [BitArray(length = self._w_width) for i in range(self._size)]
+        self._mask = 2**word_width-1
+        # one flat buffer, views into it are handed out for bulk access
+        if word_width <= 8:
+            self._mem = bytearray(self._size)
+        else:
+            self._mem = array('H' if word_width <= 16 else 'L', [0]*self._size)
+        # (address, word) of every write is appended here while traced
+        self._watch = None
+        # per address counters of reads and writes, while counted
+        self._reads = None
+        self._writes = None
         self.DEBUG = Debug.Warn
     def isGood_word(self, word):
         if word is None:
             return word
-        if type(word) is not BitArray:
-            raise TypeError("Mem Word must be BitArray")
-            # try:
-            #     word = BitArray(int=word, length=self._w_width)
-            # except ValueError:
-            #     if self.DEBUG >= Debug.Err:
-            #         print("Word Error: {} does not fit in word width {}.".format(word, self._w_width))
-            #     return None
-        return word
+        if type(word) is BitArray:
+            return word.uint & self._mask
+        if type(word) is not int:
+            raise TypeError("Mem Word must be int or BitArray")
+        return word & self._mask
     def isGood_addr(self,address):
         if address is None:
             if self.DEBUG >= Debug.Err:
@@ -241,12 +414,42 @@ class Memory(object): # TODO: add handling for reading unitialized memory
         return address
     def write(self, address, word):
         self._mem[address] = word
+        if self._watch is not None:
+            self._watch.append((address, word))
+        if self._writes is not None:
+            self._writes[address] += 1
         if self.DEBUG >= Debug.Test:
             print("Write {} at {}".format(word, address))
     def read(self,address):
+        if self._reads is not None:
+            self._reads[address] += 1
+        if self.DEBUG >= Debug.Test:
+            print("Read {} at {}".format(self._mem[address], address))
+        return self._mem[address]
+    def view(self, start = 0, end = None):
+        '''
+        Zero-copy memoryview of words [start, end).
+        Writes through the view land in memory.
+        '''
+        return memoryview(self._mem)[start:end]
+    def load(self, start, words):
+        '''
+        Bulk write of words (bytes, bytearray, memoryview or list of ints)
+        starting at start. Raises IndexError if they run past the end of memory.
+        '''
+        end = start + len(words)
+        if start < 0 or end > len(self._mem):
+            raise IndexError("Memory Error: {} words at {} exceed size {}".format(len(words), start, len(self._mem)))
+        if type(words) is list:
+            words = bytes(words) if type(self._mem) is bytearray else array(self._mem.typecode, words)
+        self.view(start, end)[:] = words
         if self.DEBUG >= Debug.Test:
-            print("Read {} at {}".format(self._mem[address].int, address))
-        return self._mem[address].__copy__()
+            print("Loaded {} words at {}".format(len(words), start))
+    def copy(self, src, dst, count):
+        '''
+        DMA-style copy of count words from src to dst, overlap safe.
+        '''
+        self.load(dst, self.view(src, src+count))
     def bus(self,address,word=None):
         if self.DEBUG >= Debug.Test:
             print("bus addr: {} word: {}".format(address,word))
@@ -259,6 +462,25 @@ class Memory(object): # TODO: add handling for reading unitialized memory
                 if word is not None:
                     self.write(address, word)
 
+class ProgMemory(Memory):
+    '''
+    Program memory carrying the decode cache: one Decoded entry per PC,
+    dropped whenever that PC is written, and the translated block cache.
+    '''
+    def __init__(self, size = 0, word_width = 8, addr_width = 12):
+        super(ProgMemory,self).__init__(size, word_width, addr_width)
+        self._decoded = [None]*self._size
+        # translated blocks by entry PC, any write drops them all
+        self._blocks = {}
+    def write(self, address, word):
+        super(ProgMemory,self).write(address, word)
+        self._decoded[address] = None
+        self._blocks.clear()
+    def load(self, start, words):
+        super(ProgMemory,self).load(start, words)
+        self._decoded[start:start+len(words)] = [None]*len(words)
+        self._blocks.clear()
+
 class Special_Regs(object):
     def __init__(self, dram: Memory = None, pc = 0, pcBits = 12, ie = 0, ieBits = 16, sp = 0):
         self._SP = self.StackPointer(sp, dram)
@@ -270,9 +492,13 @@ class Special_Regs(object):
         self.DEBUG = Debug.Warn
     # nested Status Register class
     class StatusReg(object):
+        '''
+        Flags packed in one int, bit i holds the flag at index i of _sr.
+        '''
         def __init__(self, srBits = 8):
             self._srBits = srBits
-            self._stat = BitArray(uint=0,length=self._srBits)
+            self._mask = 2**srBits-1
+            self._stat = 0
             self._sr = {
                 "z" : 0,
                 "n" : 1,
@@ -283,55 +509,70 @@ class Special_Regs(object):
                 "u3" : 6,
                 "u4" : 7
             }
-            self._statShadow = self._stat.__copy__()
+            self._statShadow = self._stat
             self.DEBUG = Debug.Warn
         def status(self,flag = None):
             if flag is None:
-                return self._stat.bin[::-1]
-            return self._stat[self._sr[flag]]
+                return self._stat
+            return bool(self._stat >> self._sr[flag] & 1)
         def _shadow_(self, write = False):
             if write:
-                self._statShadow.overwrite(self._stat, 0)
+                self._statShadow = self._stat
             else:
-                self._stat.overwrite(self._statShadow, 0)
+                self._stat = self._statShadow
             if self.DEBUG >= Debug.Test:
                 if write:
                     print("Copying sr to shadow sr.")
                 else:
                     print("Restoring sr from shadow sr.")
         def _set_(self, word):
-            if type(word) is not BitArray:
-                try:
-                    word = BitArray(int=word, length=self._srBits)
-                except Exception as ex:
-                    print("StatusReg Error: In _set_, {}".format(ex))
-            self._stat.overwrite(word, 0)
+            if type(word) is BitArray:
+                word = int(word.bin[::-1], 2)
+            try:
+                self._stat = word & self._mask
+            except Exception as ex:
+                print("StatusReg Error: In _set_, {}".format(ex))
         def clear(self):
-            self._stat.set(0)
+            self._stat = 0
+        def flag(self, f, v):
+            bit = 1 << self._sr[f]
+            if v:
+                self._stat |= bit
+            else:
+                self._stat &= ~bit
         def zeroed(self, z):
             # arithmetic result of 0
-            self._stat.set(z,self._sr["z"])
+            self.flag("z", z)
         def neged(self, n):
             # MSB = 1 in arithmetic
-            self._stat.set(n,self._sr["n"])
+            self.flag("n", n)
         def carried(self, c):
             # carried in addition, borrowed in subtraction
-            self._stat.set(c,self._sr["c"])
+            self.flag("c", c)
+        def arith(self, flags):
+            # packed z, n, c of ALU_Tables line up with bits 0..2
+            self._stat = (self._stat & ~7) | flags
     # nested Program Counter class
     class ProgCount(object):
         def __init__(self, pc, pcBits, wait):
             self._pcBits = pcBits
             self._minPC = 0
             self._maxPC = 2**pcBits-1
-            self._pc = BitArray(uint=pc, length=pcBits)
+            self._pc = pc & self._maxPC
             self.DEBUG = Debug.Warn
             self._changed = False
             self._wait = wait
-            self._pcShadow = self._pc.__copy__()
+            self._pcShadow = self._pc
+            self._fmt = "{{:0{}x}}".format((pcBits + 3) >> 2)
+        def hex(self, pc = None):
+            '''
+            PC as zero padded hex digits, pcBits wide.
+            '''
+            return self._fmt.format(self._pc if pc is None else pc)
         def incr(self):
-            if self._pc.uint + 1 > self._maxPC:
+            if self._pc >= self._maxPC:
                 return False
-            self._pc.uint += 1
+            self._pc += 1
             if self.DEBUG >= Debug.Test:
                 print("Incrementing PC.")
             return True
@@ -340,20 +581,18 @@ class Special_Regs(object):
                 if self.DEBUG >= Debug.Err:
                     print("PC Error: pc is None")
                 return pc
-            if type(pc) is not BitArray:
-                try:
-                    pc = BitArray(uint=pc, length=self._pcBits)
-                except ValueError as verror:
-                    if self.DEBUG >= Debug.Err:
-                        print(verror)
-                        print("PC Error: {} is type {}".format(pc, type(pc)))
-                    return None
+            if type(pc) is BitArray:
+                pc = pc.uint
+            if type(pc) is not int or not 0 <= pc < 2**self._pcBits:
+                if self.DEBUG >= Debug.Err:
+                    print("PC Error: {} is type {}".format(pc, type(pc)))
+                return None
             return pc
         def _shadow_(self, write = False):
             if write:
-                self._pcShadow = self._pc.__copy__()
+                self._pcShadow = self._pc
             else:
-                self.bus(self._pcShadow.__copy__())
+                self.bus(self._pcShadow)
             if self.DEBUG >= Debug.Test:
                 if write:
                     print("Copying pc to shadow pc.")
@@ -377,10 +616,10 @@ class Special_Regs(object):
             self._pc = pc
             self._changed = True
             if self.DEBUG >= Debug.Test:
-                print("Write {} to PC".format(pc.hex))
+                print("Write {} to PC".format(self.hex(pc)))
         def read(self):
             if self.DEBUG >= Debug.Test:
-                print("Read {} from PC".format(self._pc.hex))
+                print("Read {} from PC".format(self.hex()))
             return self._pc
         def bus(self,pc=None):
             if self.DEBUG >= Debug.Test:
@@ -393,85 +632,67 @@ class Special_Regs(object):
                     self.write(pc)
     # nested interrupt Enable class
     class iEnable(object):
+        '''
+        Enable bits in one int, i15 is bit 0 and i0 bit 15 as in the
+        BitArray order of the interrupt tables.
+        '''
         def __init__(self, ie, ieBits):
             self._ieBits = ieBits
-            self._ie = BitArray(uint=ie, length=ieBits)
+            self._half = ieBits >> 1
+            self._ie = ie & (2**ieBits-1)
             self.DEBUG = Debug.Warn
         def isGood_word(self, word):
             if word is None:
                 return None
-            if type(word) is not BitArray:
-                raise TypeError("ienable Word must be BitArray")
-            return word
+            if type(word) is BitArray:
+                word = word.uint
+            if type(word) is not int:
+                raise TypeError("ienable Word must be BitArray or int")
+            return word & (2**self._half-1)
+        def enabled(self, it):
+            return self._ie >> (self._ieBits-1-it) & 1
         def read(self):
-            a = int(self._ie.__len__()/2)
+            a = self._half
             if self.DEBUG >= Debug.Test:
-                print("Read {} {} from iEnable a={}.".format(self._ie[:a].bin,self._ie[a:].bin,a))
-            return (self._ie[:a], self._ie[a:])
+                print("Read {:0{w}b} {:0{w}b} from iEnable a={}.".format(self._ie >> a, self._ie & (2**a-1), a, w=a))
+            return (self._ie >> a, self._ie & (2**a-1))
         def write(self, words):
             if self.DEBUG >= Debug.Test:
                 s = "".join(str(words))
                 print("Write {} to iEnable.".format(s))
-            for i, w in enumerate(words):             
-                self._ie.overwrite(w,i*int(w.__len__()))
+            ie = 0
+            for w in words:
+                ie = (ie << self._half) | w
+            self._ie = ie
         def bus(self, words = None):
             if words is None:
                 return self.read()
             else:
-                for w in words:
-                    w = self.isGood_word(w)
+                words = [self.isGood_word(w) for w in words]
                 if not any(w is None for w in words):
                     self.write(words)
     # nested Stack Pointer class
     class StackPointer(object):
         def __init__(self, sp, dram: Memory):
             self._dram = dram
-            self._sp = BitArray(uint=sp, length=dram._a_width)
+            self._sp = sp & (2**dram._a_width-1)
             self.DEBUG = Debug.Warn
         def isGood_addr(self, sp):
             sp = self._dram.isGood_addr(sp)
             if sp is not None:
-                if type(sp) is BitArray:
-                    return sp
-                if type(sp) is not BitArray: #? unnecessary?
-                    try:
-                        sp = BitArray(uint=sp, length=self._dram._a_width)
-                        return sp
-                    except:
-                        if self.DEBUG >= Debug.Err:
-                            print("SP Error: {} is type {}".format(sp, type(sp)))
+                return sp & (2**self._dram._a_width-1)
             return None
         def isGood_word(self, word):
             #//print("isGood_word?", word)
             word = self._dram.isGood_word(word)
             #//print("dram.word:",word)
-            if word is not None:
-                #//print("not none",type(word))
-                if type(word) is BitArray:
-                    return word
-                if type(word) is not BitArray: #? unnecessary?
-                    try:
-                        word = BitArray(int=word, length=self._dram._w_width)
-                        #//print("wordbA",word)
-                        return word
-                    except:
-                        if self.DEBUG >= Debug.Err:
-                            print("SP Error: {} is type {}".format(word, type(word)))
-            return None
+            return word
         def set_(self, sp):
-            #print("SET??")
             sp = self.isGood_addr(sp)
-            #print("sp set")
             if sp is not None:
-                #print("not none")
-                if type(sp) is int:
-                    sp = BitArray(uint=sp, length=self._dram._a_width)
-                #print("sp: {} type: {}".format(sp,type(sp)))
                 if self.DEBUG >= Debug.Test:
-                    print("SP set to {}".format(sp.hex))
-                self._sp = sp#.__copy__()
-            #else:
-                #print("isGood_addr: ", sp)
+                    print("SP set to {:x}".format(sp))
+                self._sp = sp
         def isUnderflow(self, sp):
             if sp > self._dram._maxaddr:
                 return 1
@@ -479,41 +700,31 @@ class Special_Regs(object):
         def isOverflow(self): # TODO: implement
             return 0
         def decr(self):
-            #pass
             # # TODO: check for overflow into mem
-            #sp = self._sp.uint
-            if self._sp.uint > 0:
-                self._sp.uint -= 1
-                #sp -= 1
-                #self._sp = BitArray(uint=sp, length=self._dram._a_width)
+            if self._sp > 0:
+                self._sp -= 1
         def incr(self):
-            if not self.isUnderflow(self._sp.uint + 1):
-                self._sp.uint += 1
-                #self._sp = BitArray(self._sp+1, length=self._dram._a_width)
+            if not self.isUnderflow(self._sp + 1):
+                self._sp += 1
         def write(self, word):
-            self._dram.bus(self._sp, word)
+            self._dram.write(self._sp, word)
             if self.DEBUG >= Debug.Test:
-                print("Write {} to SP={} over d-bus".format(word.int,self._sp.hex))
+                print("Write {} to SP={:x} over d-bus".format(word,self._sp))
         def read(self):
-            word = self._dram.bus(self._sp)
+            word = self._dram.read(self._sp)
             if self.DEBUG >= Debug.Test:
-                print("Read {} from SP={} over d-bus".format(word.int,self._sp.hex))
+                print("Read {} from SP={:x} over d-bus".format(word,self._sp))
             return word
         def bus(self,word=None):
             if self.DEBUG >= Debug.Test:
                 print("bus SP: {}".format(word))
-            self._sp = self.isGood_addr(self._sp)
-            if self._sp is not None:
-                #//print("read/write")
-                if word is None:
-                    #//print("read")
-                    return self.read()
-                else:
-                    #//print("write?")
-                    word = self.isGood_word(word)
-                    if word is not None:
-                        #//print("write")
-                        self.write(word)
+            # _sp only ever holds a masked int, no need to re-check it
+            if word is None:
+                return self.read()
+            else:
+                word = self.isGood_word(word)
+                if word is not None:
+                    self.write(word)
         def push(self, word=None):
             if self.DEBUG >= Debug.Test:
                 print("Pushing {} onto stack".format(word))
@@ -553,25 +764,51 @@ class Instr_ALUC2(Instruction):
     def __init__(self, mnem, call, opc2, cycles = 2):
         super(Instr_ALUC2,self).__init__(mnem, call, 11, opc2)
 
+class Decoded(object):
+    '''
+    Predecoded progword, ready for state_None to dispatch without looking
+    at opcode tables. op is None if the opcode is not recognized. One entry
+    per byte value, shared by every PC holding that byte.
+    '''
+    def __init__(self, word, op1 = None, op2 = None, instr = None, op = None):
+        self._word = word
+        self._nibs = nibbles(word)
+        self._op1 = op1
+        self._op2 = op2
+        self._instr = instr
+        self._op = op
+        self._cycles = op._cycles if op is not None else 0
+
 class Occurrence(object):
     def __init__(self):
         self.occ = {}
+        # instructions started, all mnemonics together
+        self.count = 0
     def occur(self, mnem):
+        self.count += 1
         if mnem in self.occ:
             self.occ[mnem] += 1
         else:
             self.occ[mnem] = 1
         
 class Operation(object):
+    # aluc ops run until their ISE drops its wait request, not by cycles
+    _aluc = False
     def __init__(self, instr : Instruction, meta):
         self._instr = instr
         self._meta = meta
         self._cycles = instr._cycles
-        self._op = {i:None for i in range(instr._cycles)}
-        self._op[0] = self.recognize
-        self._op[self._cycles-1] = self._instr._call
+        # one micro-op per cycle: recognize first, the instruction's call last
+        ops = [None]*max(instr._cycles, 1)
+        ops[0] = self.recognize
+        ops[-1] = self._instr._call
+        self._op = tuple(ops)
         self._cur = 0
         self.DEBUG = Debug.Warn
+    def micro(self, cycle, call):
+        ops = list(self._op)
+        ops[cycle] = call
+        self._op = tuple(ops)
     def recognize(self, *args, **kwargs):
         if self.DEBUG >= Debug.Test:
             return "{} recognized.".format(self._instr._mnem)
@@ -584,23 +821,12 @@ class Operation(object):
         return self._op[cycle](*args,**kwargs)
 
 class OpISE(Operation):
+    _aluc = True
+    # the ISE_Machine the op steps, None for single cycle ones
+    _ise = None
     def __init__(self, instr : Instruction, meta):
         super(OpISE,self).__init__(instr, meta)
-        self._states = {}
-        self._mapst = {}
-        self._enumst = {}
         self._wait_req = [0]
-    def state_init(self, sts, stm):
-        self.states(sts)
-        self.mapst(stm)
-    def states(self, sts):
-        self._states = sts.copy()
-        self._enumst = dict([(value, key) for key, value in self._states.items()])
-        self._state = self._enumst[len(self._enumst)-1]
-    def mapst(self, stm):
-        self._mapst = stm.copy()    
-    def is_Done(self):
-        return self._state == self._enumst[len(self._enumst)-1]
 
 class Handle_OPC1(object):
     def __init__(self, core, meta):
@@ -610,6 +836,8 @@ class Handle_OPC1(object):
         self._dram = core._dram
         self._srgs = core._srgs
         self._iVects = core._iVects
+        # CallGraph told about calls, when attached
+        self._calls = None
         self._instrs = {
             "mvs" : Instruction("mvs", self.op_mvs, 0),
             "mvv" : Instruction("mvv", self.op_mvv, 1),
@@ -637,7 +865,7 @@ class Handle_OPC1(object):
         for key in delk: del(self._meta._occur.occ[key])
                 
         self.DEBUG = Debug.Test
-        self._ops["jsr"]._op[0] = self.op_jsr_0
+        self._ops["jsr"].micro(0, self.op_jsr_0)
     ##opc1 ops
     def op_mvs(self, args):
         im = BitArray().join(args[0:3])
@@ -668,8 +896,7 @@ class Handle_OPC1(object):
             return "{} called with <im[11..0]>={}".format(sys._getframe().f_code.co_name[3:], im)
         
     def op_jsr_0(self,args): #* first cycle of jsr
-        upper = BitArray(uint=self._srgs._PC.bus().uint+2,length=self._srgs._PC._pcBits)[:4]
-        upper.prepend('0b0000')
+        upper = ((self._srgs._PC.bus()+2) & ((1 << self._srgs._PC._pcBits) - 1)) >> 8
         self._srgs._SP.push(upper)
         if self.DEBUG >= Debug.Test:
             return "{} recognized and PC[11..8]+2={} pushed onto stack.".format(sys._getframe().f_code.co_name[3:],self._meta.repr(upper))
@@ -678,9 +905,11 @@ class Handle_OPC1(object):
         im = BitArray().join(args[0:3])
         #pc8 = BitArray(uint=self._srgs._PC.bus()+1,length=12)
         #pc8.__irshift__(8)
-        lower = BitArray(uint=self._srgs._PC.bus().uint+1,length=self._srgs._PC._pcBits)[4:]
+        lower = (self._srgs._PC.bus()+1) & 0xFF
         self._srgs._SP.push(lower)
         self._srgs._PC.bus(im)
+        if self._calls is not None:
+            self._calls.call(self._srgs._PC.bus(), self._core._cycle + self._core._haltCycles + 1)
         if self.DEBUG >= Debug.Test:
             return "{} called with <lower>={} <im[11..0]>={}".format(sys._getframe().f_code.co_name[3:], self._meta.repr(lower), self._meta.repr(im))
     def op_bzi(self, args): 
@@ -750,6 +979,55 @@ class Handle_OPC1(object):
         if self.DEBUG >= Debug.Test:
             return "{} called with <dst>: {}={}".format(sys._getframe().f_code.co_name[3:], reg_map(dst), self._meta.repr(word))
 
+class ALU_Tables(object):
+    '''
+    8-bit results and packed flags (z=1, n=2, c=4) of the ALU ops for every
+    operand pair, built once per process on first use. add/adc and sub/sbc
+    are indexed by (c << 16) | (a << 8) | b for a+b+c and a-b-c, the shifts
+    by (a << 8) | b for b shifted by a.
+    '''
+    _tables = None
+    @classmethod
+    def get(cls):
+        if cls._tables is None:
+            cls._tables = cls()
+        return cls._tables
+    def __init__(self):
+        up = bytes(range(256)) * 2
+        down = bytes(range(255, -1, -1)) * 2
+        zn = bytes((r == 0) | (r >> 7) << 1 for r in range(256))
+        znc = bytes(f | 4 for f in zn)
+        add = []
+        addf = []
+        sub = []
+        subf = []
+        for c in (0, 1):
+            for a in range(256):
+                row = up[(a + c) & 0xFF:][:256]
+                # carry out for b >= 256-a-c
+                t = max(0, 256 - a - c)
+                add.append(row)
+                addf.append(row[:t].translate(zn) + row[t:].translate(znc))
+                row = down[(255 - a + c) & 0xFF:][:256]
+                # borrow for b > a-c
+                t = max(0, a - c + 1)
+                sub.append(row)
+                subf.append(row[:t].translate(zn) + row[t:].translate(znc))
+        self.add = b"".join(add)
+        self.addf = b"".join(addf)
+        self.sub = b"".join(sub)
+        self.subf = b"".join(subf)
+        rows = {
+            "sll" : [bytes((b << a) & 0xFF for b in range(256)) if a < 8 else bytes(256) for a in range(9)],
+            "slr" : [bytes(b >> a for b in range(256)) for a in range(9)],
+            "rol" : [bytes(((b << a) | (b >> (8 - a))) & 0xFF for b in range(256)) for a in range(8)],
+            "ror" : [bytes(((b >> a) | (b << (8 - a))) & 0xFF for b in range(256)) for a in range(8)],
+        }
+        self.sll = b"".join(rows["sll"][min(a, 8)] for a in range(256))
+        self.slr = b"".join(rows["slr"][min(a, 8)] for a in range(256))
+        self.rol = b"".join(rows["rol"][a & 7] for a in range(256))
+        self.ror = b"".join(rows["ror"][a & 7] for a in range(256))
+
 class Handle_ALU(object):
     def __init__(self, core, meta):
         self._core = core
@@ -783,191 +1061,141 @@ class Handle_ALU(object):
             self._meta._occur.occ.update({ins._mnem:0})
         delk = [key for key in self._meta._occur.occ if len(key) > 3]
         for key in delk: del(self._meta._occur.occ[key])
+        self._tbl = ALU_Tables.get()
         self.DEBUG = Debug.Test
     ##ALU ops
     def op_add(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        res = BitArray(uint=s1.uint + s2.uint,length=s2.__len__()+1)
-        self._srgs._SR.carried(res[0])
-        res.__delitem__(0)
-        self._srgs._SR.neged(res[0])
-        self._srgs._SR.zeroed(res.int == 0)
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        i = (s1 << 8) | s2
+        res = self._tbl.add[i]
+        self._srgs._SR.arith(self._tbl.addf[i])
         self._regs.bus(args[1],res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(res))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_sub(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        s2t = BitArray(uint=s2.uint,length=s2.__len__())
-        s2t.invert()
-        s2t = BitArray(uint=s2t.uint + 1,length=9)
-        s2t.__delitem__(0)
-        res = BitArray(uint=s1.uint + s2t.uint,length=s2.__len__()+1)
-        res.__delitem__(0)
-        # self._srgs._SR.carried(res[0] != s1[0])
-        self._srgs._SR.carried('0' + s1.bin < '0' + s2.bin)
-        self._srgs._SR.neged(res[0])
-        self._srgs._SR.zeroed(res.int == 0)
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        i = (s1 << 8) | s2
+        res = self._tbl.sub[i]
+        self._srgs._SR.arith(self._tbl.subf[i])
         self._regs.bus(args[1],res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(res))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_and(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        s2 = s1 & s2
-        self._regs.bus(args[1], s2)
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        res = s1 & s2
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_lor(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        s2 = s1 | s2
-        self._regs.bus(args[1], s2)
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        res = s1 | s2
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_sll(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        if s1.int < 0 and self.DEBUG >= Debug.Warn:
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        if s1 & 0x80 and self.DEBUG >= Debug.Warn:
             print("Warning: sll with negative value taken as unsigned.")
-        s2.__ilshift__(s1.uint)
-        self._regs.bus(args[1], s2)
+        res = self._tbl.sll[(s1 << 8) | s2]
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_rol(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        if s1.int < 0 and self.DEBUG >= Debug.Warn:
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        if s1 & 0x80 and self.DEBUG >= Debug.Warn:
             print("Warning: rol with negative value taken as unsigned.")
-        s2.rol(s1.uint)
-        self._regs.bus(args[1], s2)
+        res = self._tbl.rol[(s1 << 8) | s2]
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_slr(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        if s1.int < 0 and self.DEBUG >= Debug.Warn:
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        if s1 & 0x80 and self.DEBUG >= Debug.Warn:
             print("Warning: slr with negative value taken as unsigned.")
-        s2.__irshift__(s1.uint)
-        self._regs.bus(args[1], s2)
+        res = self._tbl.slr[(s1 << 8) | s2]
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_ror(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        if s1.int < 0 and self.DEBUG >= Debug.Warn:
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        if s1 & 0x80 and self.DEBUG >= Debug.Warn:
             print("Warning: ror with negative value taken as unsigned.")
-        s2.ror(s1.uint)
-        self._regs.bus(args[1], s2)
+        res = self._tbl.ror[(s1 << 8) | s2]
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
         
     def op_not(self, args):
         src = self._regs.bus(args[0])
-        res = src.__copy__()
-        res.invert()
+        res = src ^ 0xFF
         dst = self._regs.bus(args[1])
         self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
             return "{} called with <src1>{}={} <dst>{}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(src),reg_map(args[1]),self._meta.repr(dst),self._meta.repr(res))
     def op_xor(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
-        s2 = s1 ^ s2
-        self._regs.bus(args[1], s2)
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
+        res = s1 ^ s2
+        self._regs.bus(args[1], res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),self._meta.repr(s2))
+            return "{} called with <src1> {}={} <src2=dst> {}={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),self._meta.repr(res))
 
     def op_adc(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
         cflag = self._srgs._SR.status("c")
-        res = BitArray(uint=s1.uint + s2.uint + cflag,length=s2.__len__()+1)
-        self._srgs._SR.carried(res[0])
-        res.__delitem__(0)
-        self._srgs._SR.neged(res[0])
-        self._srgs._SR.zeroed(res.int == 0)
+        i = (cflag << 16) | (s1 << 8) | s2
+        res = self._tbl.add[i]
+        self._srgs._SR.arith(self._tbl.addf[i])
         self._regs.bus(args[1],res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={}, <src2=dst> {}={}, sr[c]={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),cflag,self._meta.repr(res))
+            return "{} called with <src1> {}={}, <src2=dst> {}={}, sr[c]={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),cflag,self._meta.repr(res))
         
     def op_sbc(self, args):
-        s1 = self._regs.bus(args[0]).__copy__()
-        s2 = self._regs.bus(args[1]).__copy__()
-        src2 = s2.__copy__()
+        s1 = self._regs.bus(args[0])
+        s2 = self._regs.bus(args[1])
         cflag = self._srgs._SR.status("c")
-        
-        s2t = BitArray(uint=s2.uint,length=s2.__len__())
-        s2t.invert()
-        s2t = BitArray(uint=s2t.uint + 1,length=9)
-        s2t.__delitem__(0)
-        cft = BitArray(uint=cflag,length=s2.__len__())
-        cft.invert()
-        cft = BitArray(uint=cft.uint + 1,length=9)
-        cft.__delitem__(0)
-        res = BitArray(uint=s1.uint + s2t.uint + cft.uint,length=s2.__len__()+1)
-        #self._srgs._SR.carried(res[0] != s1[0])
-        res.__delitem__(0)
-        # self._srgs._SR.carried(res[0] != s1[0])
-        bC = BitArray(uint=s2.uint + cflag,length=s2.__len__()+1)
-        self._srgs._SR.carried('0' + s1.bin < bC.bin)
-        self._srgs._SR.neged(res[0])
-        self._srgs._SR.zeroed(res.int == 0)
+        i = (cflag << 16) | (s1 << 8) | s2
+        res = self._tbl.sub[i]
+        self._srgs._SR.arith(self._tbl.subf[i])
         self._regs.bus(args[1],res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1> {}={}, <src2=dst> {}={}, sr[c]={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(src2),cflag,self._meta.repr(res))
+            return "{} called with <src1> {}={}, <src2=dst> {}={}, sr[c]={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(s1),reg_map(args[1]),self._meta.repr(s2),cflag,self._meta.repr(res))
         
     def op_adi(self, args):
-        s1 = self._regs.bus(args[1]).__copy__()
-        im = args[0].__copy__()
-        im.uint = im.uint + 1
-        src1=s1.__copy__()
-        res = BitArray(uint=s1.uint + im.uint,length=s1.__len__()+1)
-        self._srgs._SR.carried(res[0])
-        res.__delitem__(0)
-        self._srgs._SR.neged(res[0])
-        self._srgs._SR.zeroed(res.int == 0)
+        s1 = self._regs.bus(args[1])
+        im = args[0].uint + 1
+        i = (im << 8) | s1
+        res = self._tbl.add[i]
+        self._srgs._SR.arith(self._tbl.addf[i])
         self._regs.bus(args[1],res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1=dst> {}={} <im[3..0]>={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[1]),self._meta.repr(src1),self._meta.repr(im),self._meta.repr(res))
+            return "{} called with <src1=dst> {}={} <im[3..0]>={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[1]),self._meta.repr(s1),self._meta.repr(im,width=4),self._meta.repr(res))
         
     def op_sbi(self, args):
-        s1 = self._regs.bus(args[1]).__copy__()
-        im = args[0].__copy__()
-        im.uint = im.uint + 1
-        src1=s1.__copy__()
-        imt = BitArray(uint=im.uint,length=s1.__len__())
-        imt.invert()
-        imt = BitArray(uint=imt.uint + 1,length=9)
-        imt.__delitem__(0)
-        res = BitArray(uint=s1.uint + imt.uint,length=s1.__len__()+1)
-        res.__delitem__(0)
-        #self._srgs._SR.carried(res[0] != s1[0])
-        aINC = BitArray(uint=im.uint,length=s1.__len__()+1)
-        self._srgs._SR.carried('0' + s1.bin < aINC.bin)
-        self._srgs._SR.neged(res[0])
-        self._srgs._SR.zeroed(res.int == 0)
+        s1 = self._regs.bus(args[1])
+        im = args[0].uint + 1
+        i = (s1 << 8) | im
+        res = self._tbl.sub[i]
+        self._srgs._SR.arith(self._tbl.subf[i])
         self._regs.bus(args[1],res)
         if self.DEBUG >= Debug.Test:
-            return "{} called with <src1=dst> {}={} <im[3..0]>={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[1]),self._meta.repr(src1),self._meta.repr(im),self._meta.repr(res))
+            return "{} called with <src1=dst> {}={} <im[3..0]>={} result: {}".format(sys._getframe().f_code.co_name[3:],reg_map(args[1]),self._meta.repr(s1),self._meta.repr(im,width=4),self._meta.repr(res))
         
     def op_alu8(self, args): #* unused
         print (sys._getframe().f_code.co_name[3:] + " called with args", args)
@@ -982,6 +1210,8 @@ class Handle_GEN1(object):
         self._dram = core._dram
         self._srgs = core._srgs
         self._pState = core._pState
+        # CallGraph told about returns, when attached
+        self._calls = None
         self.DEBUG = Debug.Test
         
         self._instrs = {
@@ -1003,7 +1233,7 @@ class Handle_GEN1(object):
             self._ops.update({ins._mnem: Operation(ins, meta)})
             self._opc2_dict.update({ins._opc2: ins._mnem})
             self._meta._occur.occ.update({ins._mnem:0})
-        self._ops["ret"]._op[0] = self.op_ret_0
+        self._ops["ret"].micro(0, self.op_ret_0)
     def op_mov(self, args):
         src = args[0].__copy__()
         dst = args[1].__copy__()
@@ -1014,15 +1244,14 @@ class Handle_GEN1(object):
     def op_lxb(self, args):
         src = args[0].__copy__()
         Ri = src[1:].__copy__()
-        wRi = self._regs.bus(Ri).__copy__()
+        wRi = self._regs.bus(Ri)
         pairR = self._regs.toPair(Ri)
         dst = args[1].__copy__()
         word = self._dram.bus(pairR)
         self._regs.bus(dst,word)
         incr = src[0]
         if incr:
-            wRi.int += incr
-            self._regs.bus(Ri,wRi.__copy__())
+            self._regs.bus(Ri,wRi + 1)
         if self.DEBUG >= Debug.Test:
             if incr:
                 return "lpb called with <src>: a{}&r{}, <dst>: {} word: {}".format(Ri.uint,Ri.uint,reg_map(args[1]),self._meta.repr(word))
@@ -1032,14 +1261,13 @@ class Handle_GEN1(object):
         src = args[0].__copy__()
         dst = args[1].__copy__()
         Ri = dst[1:].__copy__()
-        wRi = self._regs.bus(Ri).__copy__()
+        wRi = self._regs.bus(Ri)
         pairR = self._regs.toPair(Ri)
         word = self._regs.bus(src)
         self._dram.bus(pairR,word)
         incr = dst[0]
         if incr:
-            wRi.int += incr
-            self._regs.bus(Ri,wRi.__copy__())
+            self._regs.bus(Ri,wRi + 1)
         if self.DEBUG >= Debug.Test:
             if incr:
                 return "spb called with <src>: {} <dst>: a{}&r{} word: {}".format(reg_map(args[0]),Ri.uint,Ri.uint,self._meta.repr(word))
@@ -1052,35 +1280,30 @@ class Handle_GEN1(object):
         '''
         lower = self._srgs._SP.pop()
         #curPC = BitArray(uint=self._srgs._PC.bus(),length=self._srgs._PC._pcBits)
-        curPC = self._srgs._PC.bus()
-        curPC.overwrite(lower, curPC.__len__()-lower.__len__())
+        curPC = (self._srgs._PC.bus() & ~0xFF) | lower
         self._srgs._PC.bus(curPC)
             
         if self.DEBUG >= Debug.Test:
-            return "{} recognized. PC = {}.".format(sys._getframe().f_code.co_name[3:], self._meta.repr(curPC))
+            return "{} recognized. PC = {}.".format(sys._getframe().f_code.co_name[3:], self._meta.repr(curPC,width=self._srgs._PC._pcBits))
     def op_ret(self,args): #? args not needed
         '''
         pc[7..0] = [sp+1]
         sp = sp + 1
         '''
-        upper = None
-        try:
-            upper = BitArray(self._srgs._SP.pop(),length=8)[4:]
-        except Exception as ex:
-            print("ret_Cycle_0 Error: {}".format(ex))
-        if upper is not None:
-            #curPC = BitArray(uint=self._srgs._PC.bus(),length=self._srgs._PC._pcBits)
-            curPC = self._srgs._PC.bus()
-            curPC.overwrite(upper, 0)
-            self._srgs._PC.bus(curPC)
+        upper = self._srgs._SP.pop() & 0xF
+        #curPC = BitArray(uint=self._srgs._PC.bus(),length=self._srgs._PC._pcBits)
+        curPC = (self._srgs._PC.bus() & 0xFF) | (upper << 8)
+        self._srgs._PC.bus(curPC)
+        if self._calls is not None:
+            self._calls.ret(self._core._cycle + self._core._haltCycles + 1)
         
         if self.DEBUG >= Debug.Test:
-            return "{} called. PC = {}".format(sys._getframe().f_code.co_name[3:], self._meta.repr(curPC))
+            return "{} called. PC = {}".format(sys._getframe().f_code.co_name[3:], self._meta.repr(curPC,width=self._srgs._PC._pcBits))
     def op_str(self,args): #? args not needed
         status = self._srgs._SR.status()
         self._srgs._SP.push(status)
         if self.DEBUG >= Debug.Test:
-            return "{} called with sr = {}.".format(sys._getframe().f_code.co_name[3:], status)
+            return "{} called with sr = {:08b}.".format(sys._getframe().f_code.co_name[3:], status)
     def op_lsr(self,args): #? args not needed
         status = self._srgs._SP.pop()
         self._srgs._SR._set_(status)
@@ -1117,6 +1340,8 @@ class Handle_GEN1(object):
         self._srgs._SR._shadow_()
         self._regs._shadow_(False,self._meta._num_pairs_shadowed)
         self._pState._intr = False
+        if self._calls is not None:
+            self._calls.rti(self._core._cycle + self._core._haltCycles + 1)
         if self.DEBUG >= Debug.Test:
             return "{} called. Ns={} Ri, Ai Regs & SR, PC restored from shadows.".format(sys._getframe().f_code.co_name[3:],self._meta._num_pairs_shadowed)
     def op_sys(self, args):
@@ -1126,32 +1351,16 @@ class Handle_GEN1(object):
             return "{} called. im[7..0] = {}".format(sys._getframe().f_code.co_name[3:], self._meta.repr(im))
 
 class AMC(OpISE):
-        def __init__(self, instr : Instruction, meta):
-            super(AMC,self).__init__(instr, meta)
-            #self._core = core
-            self._xtime_result = BitArray(hex='00')
-            self._xtime_input = BitArray(hex='00')
-            self._s = [0 for i in range(0,4)]
-            self._sum = BitArray(hex='00')
-        def reset(self):
-            self._xtime_result = BitArray(hex='00')
-            self._xtime_input = BitArray(hex='00')
-            self._s = [0 for i in range(0,4)]
-            self._sum = BitArray(hex='00')
-            self._state = self._enumst[len(self._enumst)-1]
-        
-        def set_xtime(self):
-            if self._xtime_input[0]:
-                self._xtime_result = (self._xtime_input[1:] + 1) ^ BitArray(hex='1b')
-            else:
-                self._xtime_result = (self._xtime_input[1:] + 1)
+    def __init__(self, instr : Instruction, meta):
+        super(AMC,self).__init__(instr, meta)
+        self._ise = ISE_AMC()
 
 class ASB(OpISE):
     def __init__(self, instr : Instruction, meta):
         super(ASB, self).__init__(instr,meta)
-        self.init_map()
-    def init_map(self):
-        self._map = {
+    @staticmethod
+    def sbox_map():
+        return {
             0 : '63',
             1 : '7C',
             2 : '77',
@@ -1411,39 +1620,20 @@ class ASB(OpISE):
         }
     
     def get(self,a):
-        return BitArray(hex=self._map[a.uint]).__copy__()
+        return ISE_Tables.get().asb[a]
 
 class SWD(OpISE):
     def __init__(self, instr : Instruction, meta):
         super(SWD, self).__init__(instr,meta)
-        self._shifter_out = BitArray(hex='00000000')
-        self._shifter_in = BitArray(hex='00000000')
-        self._shift_amount = BitArray(bin='00000')
-    def reset(self):
-        self._shifter_out = BitArray(hex='00000000')
-        self._shifter_in = BitArray(hex='00000000')
-        self._shift_amount = BitArray(bin='00000')
-        self._state = self._enumst[len(self._enumst)-1]
-    def set_shift_out(self):
-        tmp = self._shifter_in << self._shift_amount.uint
-        tmp2 = self._shifter_in >> 32 - self._shift_amount.uint
-        self._shifter_out = tmp | tmp2
+        self._ise = ISE_SWD()
 
 class GSP(OpISE):
     def __init__(self, instr : Instruction, meta):
         super(GSP, self).__init__(instr,meta)
-        self._sbox_a = BitArray(hex='00')
-        self._sbox_b = BitArray(hex='00')
-        self._in = BitArray(uint=0, length=128)
-        self._out = BitArray(uint=0, length=128)
-    def reset(self):
-        self._sbox_a = BitArray(hex='00')
-        self._sbox_b = BitArray(hex='00')
-        self._in = BitArray(uint=0, length=128)
-        self._out = BitArray(uint=0, length=128)
-        self._state = self._enumst[len(self._enumst)-1]
-    def gift_sbox(self, inp):
-        sbox_map = [
+        self._ise = ISE_GSP()
+    @staticmethod
+    def gift_sbox_map():
+        return [
             "1",
             "a", 
             "4",
@@ -1460,10 +1650,9 @@ class GSP(OpISE):
             "0",
             "8",
             "e" ]
-        return BitArray(hex=sbox_map[inp[0:4].uint]+sbox_map[inp[4:].uint])
-    def gift_perm(self):
-        inp = self._in.__copy__()[::-1]
-        out = BitArray(uint=0,length=128)
+    @staticmethod
+    def gift_perm_map(inp, out):
+        # out[i] = inp[j] for bit i of the output from bit j of the input, lsb first
         out[0]   = inp[0]
         out[33]  = inp[1]
         out[66]  = inp[2]
@@ -1592,13 +1781,178 @@ class GSP(OpISE):
         out[93]  = inp[125]
         out[126] = inp[126]
         out[31]  = inp[127]
-        self._out = out.__copy__()[::-1]
-    def sbox(self, a, b):
-        self._sbox_a = self.gift_sbox(a)
-        self._sbox_b = self.gift_sbox(b)
-    def perm(self):
-        self.gift_perm()
         
+class ISE_Tables(object):
+    '''
+    Lookup tables of the ISEs, built once per process on first use:
+    asb and gift are the AES and GIFT S-boxes per byte, perm the output
+    bit of each GIFT permutation input bit and perm_bytes the output
+    bits of each value of input byte k, to OR together for a permutation.
+    '''
+    _tables = None
+    @classmethod
+    def get(cls):
+        if cls._tables is None:
+            cls._tables = cls()
+        return cls._tables
+    def __init__(self):
+        asb = ASB.sbox_map()
+        self.asb = bytes(int(asb[a], 16) for a in range(256))
+        gift = [int(n, 16) for n in GSP.gift_sbox_map()]
+        self.gift = bytes(gift[a >> 4] << 4 | gift[a & 0xF] for a in range(256))
+        src = [0]*128
+        GSP.gift_perm_map(list(range(128)), src)
+        self.perm = [0]*128
+        for i, j in enumerate(src):
+            self.perm[j] = i
+        self.perm_bytes = [[0]*256 for k in range(16)]
+        for j, i in enumerate(self.perm):
+            tbl = self.perm_bytes[j >> 3]
+            for v in range(256):
+                if v >> (j & 7) & 1:
+                    tbl[v] |= 1 << i
+
+class ISE_Machine(object):
+    '''
+    State machine of an ISE on ints, a state per cycle. The core's aluc
+    ops, the modules hoksterAOT writes and the lanes of hoksterVec all step
+    these; step() only uses operators numpy arrays have too. FIELDS are the
+    (name, width) of the state kept between cycles, width None for one
+    value and n for a list of n bytes. The last of STATES is done, WAIT
+    the states after which the PC waits for the next.
+    '''
+    STATES = ("done",)
+    DONE = 0
+    WAIT = ()
+    FIELDS = ()
+    def __init__(self):
+        self.reset()
+    def reset(self):
+        for name, width in self.FIELDS:
+            setattr(self, name, 0 if width is None else [0]*width)
+        self.state = self.DONE
+    def step(self, st, a, b):
+        '''
+        Runs state st, not done, on a and b, the values of the two register
+        operands. Returns the value for b's register, None for none.
+        '''
+        raise NotImplementedError
+    def advance(self, a, b):
+        '''
+        Runs the current state, done running the first, and moves on.
+        Returns the value for b's register or None, and whether to wait.
+        '''
+        st = self.state
+        if st == self.DONE:
+            self.reset()
+            st = 0
+        out = self.step(st, a, b)
+        self.state = st + 1
+        if self.state == self.DONE:
+            self.reset()
+        return out, st in self.WAIT
+    def run(self, R, a, b):
+        '''
+        Advances on registers R until a state does not wait. Returns the
+        cycles taken.
+        '''
+        n = 1
+        while True:
+            out, wait = self.advance(R[a], R[b])
+            if out is not None:
+                R[b] = out
+            if not wait:
+                return n
+            n += 1
+
+class ISE_AMC(ISE_Machine):
+    '''
+    AES MixColumns: a column is loaded over the first cycles and unloaded
+    from its last byte. s0-s2 hold the first three bytes, sum the XOR of
+    all four, xi the xtime input of the next unload and res the first.
+    '''
+    STATES = ("load01", "ld23u3", "calc_1", "calc_2", "unld_3", "unld_2", "unld_1", "unld_0", "done")
+    DONE = 8
+    WAIT = (1, 2, 3)
+    FIELDS = (("s0", None), ("s1", None), ("s2", None), ("sum", None), ("xi", None), ("res", None))
+    @staticmethod
+    def xtime(x):
+        return ((x << 1) & 0xFF) ^ (x >> 7) * 0x1b
+    def step(self, st, a, b):
+        if st == 0:
+            self.s0, self.s1 = a, b
+            self.sum = a ^ b
+        elif st == 1:
+            self.s2 = a
+            self.sum = self.sum ^ a
+        elif st == 2:
+            self.sum = self.sum ^ b
+            self.xi = b ^ self.s0
+        elif st == 3:
+            self.res = b ^ self.xtime(self.xi) ^ self.sum
+            self.xi = self.s2 ^ b
+        elif st == 4:
+            return self.res
+        elif st == 5:
+            out = self.s2 ^ self.xtime(self.xi) ^ self.sum
+            self.xi = self.s1 ^ self.s2
+            return out
+        elif st == 6:
+            out = self.s1 ^ self.xtime(self.xi) ^ self.sum
+            self.xi = self.s0 ^ self.s1
+            return out
+        else:
+            return self.s0 ^ self.xtime(self.xi) ^ self.sum
+        return None
+
+class ISE_SWD(ISE_Machine):
+    '''
+    32 bit rotate left: the word is loaded two bytes a cycle into inp, the
+    amount from a, then unloaded from its top byte.
+    '''
+    STATES = ("load01", "load23", "shifam", "unld_3", "unld_2", "unld_1", "unld_0", "done")
+    DONE = 7
+    WAIT = (2,)
+    FIELDS = (("inp", None), ("amt", None))
+    def step(self, st, a, b):
+        if st == 0:
+            self.inp = (self.inp & 0xFFFF0000) | (b << 8) | a
+        elif st == 1:
+            self.inp = (self.inp & 0x0000FFFF) | (b << 24) | (a << 16)
+        elif st == 2:
+            self.amt = a & 0x1F
+        else:
+            x = self.inp
+            return (((x << self.amt) | (x >> (32 - self.amt))) >> (8 * (6 - st))) & 0xFF
+        return None
+
+class ISE_GSP(ISE_Machine):
+    '''
+    GIFT S-box and bit permutation of 128 bits: sixteen bytes are loaded
+    two a cycle through the S-box into inp, byte 0 first, permuted into out
+    on the first unload and unloaded from byte 15.
+    '''
+    STATES = tuple("load{:x}{:x}".format(2*i, 2*i + 1) for i in range(8)) + tuple("unld_{:x}".format(15 - i) for i in range(16)) + ("done",)
+    DONE = 24
+    WAIT = (7,)
+    FIELDS = (("inp", 16), ("out", 16))
+    def __init__(self):
+        self.sbox = ISE_Tables.get().gift
+        super(ISE_GSP, self).__init__()
+    def permute(self, inp):
+        x = 0
+        for tbl, v in zip(ISE_Tables.get().perm_bytes, inp):
+            x |= tbl[v]
+        return [(x >> (8 * j)) & 0xFF for j in range(16)]
+    def step(self, st, a, b):
+        if st < 8:
+            self.inp[2 * st] = self.sbox[a]
+            self.inp[2 * st + 1] = self.sbox[b]
+            return None
+        if st == 8:
+            self.out = self.permute(self.inp)
+        return self.out[23 - st]
+
 class Handle_ALUC(object):
     def __init__(self, core, meta):
         self._core = core
@@ -1626,111 +1980,6 @@ class Handle_ALUC(object):
         self._ops.update({"gsp" : GSP(self._instrs["gsp"],meta)})
         self._opc2_dict.update({self._instrs["gsp"]._opc2 : "gsp"})
         
-        self._amc_states = {
-            "load01" : 0,
-            "ld23u3" : 1,
-            "calc_1" : 2,
-            "calc_2" : 3,
-            "unld_3" : 4,
-            "unld_2" : 5,
-            "unld_1" : 6,
-            "unld_0" : 7,
-            "done" : 8
-        }
-            
-        self._amc_state_map = {
-            "load01" : self.op_amc_0,
-            "ld23u3" : self.op_amc_1_0,
-            "calc_1" : self.op_amc_1_1,
-            "calc_2" : self.op_amc_1_2,
-            "unld_3" : self.op_amc_1_3,
-            "unld_2" : self.op_amc_2,
-            "unld_1" : self.op_amc_3,
-            "unld_0" : self.op_amc_4,
-            "done" : self.op_amc_done
-        }
-        
-        self._swd_states = {
-            "load01" : 0,
-            "load23" : 1,
-            "shifam" : 2,
-            "unld_3" : 3,
-            "unld_2" : 4,
-            "unld_1" : 5,
-            "unld_0" : 6,
-            "done" : 7
-        }
-        
-        self._swd_state_map = {
-            "load01" : self.op_swd_0,
-            "load23" : self.op_swd_1,
-            "shifam" : self.op_swd_2_0,
-            "unld_3" : self.op_swd_2_1,
-            "unld_2" : self.op_swd_3,
-            "unld_1" : self.op_swd_4,
-            "unld_0" : self.op_swd_5,
-            "done" : self.op_swd_done
-        }
-        
-        self._gsp_states = {
-            "load01" : 0,
-            "load23" : 1,
-            "load45" : 2,
-            "load67" : 3,
-            "load89" : 4,
-            "loadab" : 5,
-            "loadcd" : 6,
-            "loadef" : 7,
-            "unld_f" : 8,
-            "unld_e" : 9,
-            "unld_d" : 10,
-            "unld_c" : 11,
-            "unld_b" : 12,
-            "unld_a" : 13,
-            "unld_9" : 14,
-            "unld_8" : 15,
-            "unld_7" : 16,
-            "unld_6" : 17,
-            "unld_5" : 18,
-            "unld_4" : 19,
-            "unld_3" : 20,
-            "unld_2" : 21,
-            "unld_1" : 22,
-            "unld_0" : 23,
-            "done" : 24
-        }
-        
-        self._gsp_state_map = {
-            "load01" : self.op_gsp_load,
-            "load23" : self.op_gsp_load,
-            "load45" : self.op_gsp_load,
-            "load67" : self.op_gsp_load,
-            "load89" : self.op_gsp_load,
-            "loadab" : self.op_gsp_load,
-            "loadcd" : self.op_gsp_load,
-            "loadef" : self.op_gsp_load,
-            "unld_f" : self.op_gsp_unld,
-            "unld_e" : self.op_gsp_unld,
-            "unld_d" : self.op_gsp_unld,
-            "unld_c" : self.op_gsp_unld,
-            "unld_b" : self.op_gsp_unld,
-            "unld_a" : self.op_gsp_unld,
-            "unld_9" : self.op_gsp_unld,
-            "unld_8" : self.op_gsp_unld,
-            "unld_7" : self.op_gsp_unld,
-            "unld_6" : self.op_gsp_unld,
-            "unld_5" : self.op_gsp_unld,
-            "unld_4" : self.op_gsp_unld,
-            "unld_3" : self.op_gsp_unld,
-            "unld_2" : self.op_gsp_unld,
-            "unld_1" : self.op_gsp_unld,
-            "unld_0" : self.op_gsp_unld,
-            "done" : self.op_gsp_done
-        }
-        
-        self._ops["amc"].state_init(self._amc_states,self._amc_state_map)
-        self._ops["swd"].state_init(self._swd_states,self._swd_state_map)
-        self._ops["gsp"].state_init(self._gsp_states,self._gsp_state_map)
         for ins in self._instrs.values():
             self._meta._occur.occ.update({ins._mnem:0})
         self._srgs._wait.update({"amc":self._ops["amc"]._wait_req})
@@ -1743,304 +1992,33 @@ class Handle_ALUC(object):
         regB = self._regs.bus(dst)
         result = self._ops["asb"].get(regA)
         self._regs.bus(dst,result)
-        return "{} called with <src>{}={} <dst>{}={} result={}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(regA),reg_map(args[1]),self._meta.repr(regB),self._meta.repr(result))
+        if self.DEBUG >= Debug.Test:
+            return "{} called with <src>{}={} <dst>{}={} result={}".format(sys._getframe().f_code.co_name[3:],reg_map(args[0]),self._meta.repr(regA),reg_map(args[1]),self._meta.repr(regB),self._meta.repr(result))
             
-    def op_amc(self,args):
-        self._ops["amc"].set_xtime()
-        ret = self._ops["amc"]._mapst[self._ops["amc"]._state](args)
-        self._srgs._wait.update({"amc":self._ops["amc"]._wait_req})
-        #print(self._ops["amc"]._state,self._ops["amc"]._cur)
-        
-        return ret
-    def op_amc_0(self,args):
-        '''
-        sum = a ^ b
-        s0 = a
-        s1 = b
-        state = load_2_3_unload_3
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["amc"]._sum = a ^ b
-        self._ops["amc"]._s[0] = a
-        self._ops["amc"]._s[1] = b
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[1]
-        self._ops["amc"]._wait_req = [0]
-        return "{} {} {}={} {}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_1_0(self,args):
-        '''
-        state is load_2_3_unload_3
-        sum = sum ^ a
-        s2 = a
-        state = 
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["amc"]._sum ^= a
-        self._ops["amc"]._s[2] = a
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[2]
-        self._ops["amc"]._wait_req = [1]
-        return "{} {} {}={} {}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_1_1(self,args):
-        '''
-        calc_1
-        sum = sum ^ b
-        '''
-        
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["amc"]._sum ^= b
-        self._ops["amc"]._xtime_input = b ^ self._ops["amc"]._s[0]
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[3]
-        self._ops["amc"]._wait_req = [1]
-        return "{} {} {}={} {}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_1_2(self,args):
-        '''
-        calc_2
-        result = b ^ xtime_result ^ sum
-        xtime_input = s2 ^ b
-        wait_req = 1
-        '''
-        
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["amc"]._res = (b ^ self._ops["amc"]._xtime_result ^ self._ops["amc"]._sum).__copy__()
-        
-        self._ops["amc"]._xtime_input = self._ops["amc"]._s[2] ^ b
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[4]
-        self._ops["amc"]._wait_req = [1]
-        return "{} {} {}={} {}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_1_3(self,args):
-        '''
-        unload_3
-        wait_req = 0
-        '''
-        dst = args[1].__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._regs.bus(dst,self._ops["amc"]._res)
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[5]
-        self._ops["amc"]._wait_req = [0]
-        return "{} {} <dst>{}={} res={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["amc"]._res))
-    def op_amc_2(self,args):
-        '''
-        unload_2
-        result = s2 ^ xtime_result ^ sum
-        xtime_input = s1 ^ s2
-        wait_req = 0
-        '''
-        dst = args[1].__copy__()
-        res = self._ops["amc"]._s[2] ^ self._ops["amc"]._xtime_result ^ self._ops["amc"]._sum
-        self._ops["amc"]._xtime_input = self._ops["amc"]._s[1] ^ self._ops["amc"]._s[2]
-        self._regs.bus(dst,res)
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[6]
-        self._ops["amc"]._wait_req = [0]
-        return "{} {} <dst>{}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[1]),self._meta.repr(res),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_3(self,args):
-        '''
-        unload_1
-        result = s1 ^ xtime_result ^ sum
-        xtime_input = s0 ^ s1
-        wait_req = 0
-        '''
-        dst = args[1].__copy__()
-        res = self._ops["amc"]._s[1] ^ self._ops["amc"]._xtime_result ^ self._ops["amc"]._sum
-        self._ops["amc"]._xtime_input = self._ops["amc"]._s[0] ^ self._ops["amc"]._s[1]
-        self._regs.bus(dst,res)
-        state = self._ops["amc"]._state
-
-        self._ops["amc"]._state = self._ops["amc"]._enumst[7]
-        self._ops["amc"]._wait_req = [0]
-        return "{} {} <dst>{}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[1]),self._meta.repr(res),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_4(self,args):
+    def op_amc(self, args):
+        return self.op_ise("amc", args)
+    def op_swd(self, args):
+        return self.op_ise("swd", args)
+    def op_gsp(self, args):
+        return self.op_ise("gsp", args)
+    def op_ise(self, mnem, args):
         '''
-        unload_0
-        result = s0 ^ xtime_result ^ sum
-        wait_req = 0
+        One cycle of the ISE mnem on <src> and <dst>, a result goes to <dst>.
         '''
-        dst = args[1].__copy__()
-        res = self._ops["amc"]._s[0] ^ self._ops["amc"]._xtime_result ^ self._ops["amc"]._sum
-        self._regs.bus(dst,res)
-        state = self._ops["amc"]._state
-        self._ops["amc"]._state = self._ops["amc"]._enumst[8]
-        self._ops["amc"]._wait_req = [0]
-        return "{} {} <dst>{}={} sum={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[1]),self._meta.repr(res),self._meta.repr(self._ops["amc"]._sum))
-    def op_amc_done(self,args):
-        self._ops["amc"].reset()
-        self._ops["amc"]._state = self._ops["amc"]._enumst[0]
-        return self._ops["amc"]._mapst[self._ops["amc"]._state](args)
-    
-    def op_swd(self,args):
-        self._ops["swd"].set_shift_out()
-        ret = self._ops["swd"]._mapst[self._ops["swd"]._state](args)
-        self._srgs._wait.update({"swd":self._ops["swd"]._wait_req})
-        #print(self._ops["swd"]._state,self._ops["swd"]._cur)
-        
-        return ret
-    def op_swd_0(self, args):
-        '''
-        LOAD_0_1
-        shifter_in[7:0] <= a;
-        shifter_in[15:8] <= b;
-        state = LOAD_2_3
-        wait_req = 0
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["swd"]._shifter_in.overwrite(b+a,16)
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[1]
-        self._ops["swd"]._wait_req = [0]
-        return "{} {} {}={} {}={} shifter_in={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["swd"]._shifter_in))
-    def op_swd_1(self, args):
-        '''
-        LOAD_2_3
-        shifter_in[23:16] <= a;
-        shifter_in[31:24] <= b;
-        state = SHIFT_UNLOAD_3
-        wait_req = 0
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["swd"]._shifter_in.overwrite(b+a,0)
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[2]
-        self._ops["swd"]._wait_req = [0]
-        return "{} {} {}={} {}={} shifter_in={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(self._ops["swd"]._shifter_in))
-    def op_swd_2_0(self, args):
-        '''
-        SHIFT AMOUNT
-        shift_amount <= a[4:0];
-        wait_req_reg <= 1'b1;
-        state = UNLOAD_3
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["swd"]._shift_amount.overwrite(a[3:].__copy__(),0)
-        
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[3]
-        self._ops["swd"]._wait_req = [1]
-        return "{} {} {}={} {}={} shift_amount={} (uint)".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._ops["swd"]._shift_amount.uint)
-    def op_swd_2_1(self, args):
-        '''
-        UNLOAD_3
-        result <= shifter_out[31:24];
-        wait_req_reg <= 1'b0;
-        state = UNLOAD_2
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        res = self._ops["swd"]._shifter_out.__copy__()[:8]
-        self._regs.bus(args[1], res.__copy__())
-        
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[4]
-        self._ops["swd"]._wait_req = [0]
-        return "{} {} {}={} {}={} res={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(res))
-    def op_swd_3(self, args):
-        '''
-        UNLOAD_2
-        result <= shifter_out[23:16];
-        wait_req_reg <= 1'b0;
-        state = UNLOAD_1
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        res = self._ops["swd"]._shifter_out.__copy__()[8:16]
-        self._regs.bus(args[1], res.__copy__())
-        
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[5]
-        self._ops["swd"]._wait_req = [0]
-        return "{} {} {}={} {}={} res={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(res))
-    def op_swd_4(self, args):
-        '''
-        UNLOAD_1
-        result <= shifter_out[15:8];
-        wait_req_reg <= 1'b0;
-        state = UNLOAD_0
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        res = self._ops["swd"]._shifter_out.__copy__()[16:24]
-        self._regs.bus(args[1], res.__copy__())
-        
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[6]
-        self._ops["swd"]._wait_req = [0]
-        return "{} {} {}={} {}={} res={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(res))
-    def op_swd_5(self, args):
-        '''
-        UNLOAD_0
-        result <= shifter_out[8:0];
-        wait_req_reg <= 1'b0;
-        state = done
-        '''
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        res = self._ops["swd"]._shifter_out.__copy__()[24:]
-        self._regs.bus(args[1], res.__copy__())
-        
-        state = self._ops["swd"]._state
-        self._ops["swd"]._state = self._ops["swd"]._enumst[7]
-        self._ops["swd"]._wait_req = [0]
-        return "{} {} {}={} {}={} res={}".format(sys._getframe().f_code.co_name[3:6],state,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(res))
-    def op_swd_done(self, args):
-        self._ops["swd"].reset()
-        self._ops["swd"]._state = self._ops["swd"]._enumst[0]
-        return self._ops["swd"]._mapst[self._ops["swd"]._state](args)
-
-    def op_gsp(self, args):
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["gsp"].sbox(a,b)
-        self._ops["gsp"].perm()
-        ret = self._ops["gsp"]._mapst[self._ops["gsp"]._state](args)
-        self._srgs._wait.update({"gsp":self._ops["gsp"]._wait_req})
-        return ret
-
-    def op_gsp_load(self, args):
-        curstate = self._ops["gsp"]._state
-        if self._ops["gsp"]._state.startswith("load"):
-            state = self._gsp_states[self._ops["gsp"]._state]
-            a = self._regs.bus(args[0].__copy__()).__copy__()
-            b = self._regs.bus(args[1].__copy__()).__copy__()
-            self._ops["gsp"]._in[120-state*16:128-state*16] = self._ops["gsp"]._sbox_a.__copy__()
-            self._ops["gsp"]._in[112-state*16:120-state*16] = self._ops["gsp"]._sbox_b.__copy__()
-            self._ops["gsp"]._state = self._ops["gsp"]._enumst[state+1]
-            self._ops["gsp"]._wait_req = [0]
-            if self._ops["gsp"]._state.startswith("unld"):
-                self._ops["gsp"]._wait_req = [1]
-            return "{} {} {}={} {}={} in[{}:{}]={}".format(sys._getframe().f_code.co_name[3:6],curstate,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),state*16+15,state*16,self._meta.repr(self._ops["gsp"]._in[112-state*16:120-state*16]+self._ops["gsp"]._in[120-state*16:128-state*16]))
-        print("ERROR IN GSP load state= {}".format(self._ops["gsp"]._state))
-        return "ERROR IN GSP load state= {}".format(self._ops["gsp"]._state)
-    def op_gsp_unld(self, args):
-        curstate = self._ops["gsp"]._state
-        if self._ops["gsp"]._state.startswith("unld"):
-            state = self._gsp_states[self._ops["gsp"]._state]
-            a = self._regs.bus(args[0].__copy__()).__copy__()
-            b = self._regs.bus(args[1].__copy__()).__copy__()
-            res = self._ops["gsp"]._out[(state-8)*8:8+(state-8)*8]
-            self._regs.bus(args[1], res.__copy__())
-            self._ops["gsp"]._state = self._ops["gsp"]._enumst[state+1]
-            self._ops["gsp"]._wait_req = [0]
-            return "{} {} {}={} {}={} res={}".format(sys._getframe().f_code.co_name[3:6],curstate,reg_map(args[0]),self._meta.repr(a),reg_map(args[1]),self._meta.repr(b),self._meta.repr(res))
-        print("ERROR IN GSP load state= {}".format(self._ops["gsp"]._state))
-        return "ERROR IN GSP unld state= {}".format(self._ops["gsp"]._state)
-    def op_gsp_done(self, args):
-        self._ops["gsp"].reset()
-        a = self._regs.bus(args[0].__copy__()).__copy__()
-        b = self._regs.bus(args[1].__copy__()).__copy__()
-        self._ops["gsp"].sbox(a,b)
-        self._ops["gsp"].perm()
-        self._ops["gsp"]._state = self._ops["gsp"]._enumst[0]
-        return self._ops["gsp"]._mapst[self._ops["gsp"]._state](args)
+        ise = self._ops[mnem]._ise
+        state = ise.STATES[ise.state if ise.state != ise.DONE else 0]
+        a = self._regs.bus(args[0])
+        b = self._regs.bus(args[1])
+        res, wait = ise.advance(a, b)
+        if res is not None:
+            self._regs.bus(args[1], res)
+        self._ops[mnem]._wait_req = [1 if wait else 0]
+        self._srgs._wait.update({mnem:self._ops[mnem]._wait_req})
+        if self.DEBUG >= Debug.Test:
+            ret = "{} {} {}={} {}={}".format(mnem, state, reg_map(args[0]), self._meta.repr(a), reg_map(args[1]), self._meta.repr(b))
+            if res is not None:
+                ret += " res={}".format(self._meta.repr(res))
+            return ret
 
 class Instruction_Handler(object):
     def __init__(self, core, meta):
@@ -2061,33 +2039,343 @@ class Instruction_Handler(object):
             "aluc1" : self._aluc,
             "aluc2" : self._aluc
         }
+        # Decoded entry for every progword, indexed by the raw byte, filled on first use
+        self._table = [None]*256
+    def entry(self, word):
+        dec = self._table[word]
+        if dec is None:
+            dec = self._table[word] = self.decode_word(word)
+        return dec
+    def decode_word(self, progword):
+        dec = Decoded(progword)
+        if progword >> 4 in self._opc1._opc1_dict:
+            dec._op1 = self._opc1._opc1_dict[progword >> 4]
+            dec._instr = self._opc1._instrs[dec._op1]
+            if dec._instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
+                if dec._op1 in self._opc2:
+                    if progword & 0xF in self._opc2[dec._op1]._opc2_dict:
+                        dec._op2 = self._opc2[dec._op1]._opc2_dict[progword & 0xF]
+                        dec._op = self._opc2[dec._op1]._ops[dec._op2]
+            else:
+                dec._op = self._opc1._ops[dec._op1]
+            if dec._op is not None:
+                dec._cycles = dec._op._cycles
+        return dec
+    def decode(self, pc):
+        dec = self.entry(self._core._pram.bus(pc))
+        self._core._pram._decoded[pc] = dec
+        return dec
+    def predecode(self, start, end):
+        pram = self._core._pram
+        pram._decoded[start:end] = [self.entry(word) for word in pram._mem[start:end]]
+    def lookup(self, op1, op2 = None):
+        instr = self._opc1._instrs[op1]
+        if op2 is not None:
+            return instr, self._opc2[op1]._ops[op2]
+        if instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
+            return instr, None
+        return instr, self._opc1._ops[op1]
+    def relink(self, dec):
+        return self.entry(dec._word)
+    def ops(self):
+        '''
+        (handler, mnemonic, op) of every op; their cycle counters and ISE
+        state machines are part of the machine state.
+        '''
+        for hndl in ("_opc1", "_alu", "_gen1", "_aluc"):
+            for name, op in getattr(self, hndl)._ops.items():
+                yield hndl, name, op
+    def adopt(self, pram):
+        '''
+        Takes over the words, decoded entries and blocks of another core's
+        PRAM, the entries pointing at this handler's ops, so nothing is parsed
+        again.
+        '''
+        own = self._core._pram
+        own._mem[:] = pram._mem
+        own._maxaddr = pram._maxaddr
+        own._size = pram._size
+        own._blocks = dict(pram._blocks)
+        for pc, dec in enumerate(pram._decoded):
+            if dec is not None:
+                dec = self.relink(dec)
+            own._decoded[pc] = dec
+    def fetch(self, pc):
+        dec = self._core._pram._decoded[pc]
+        if dec is None:
+            dec = self.decode(pc)
+        return dec
+    def debug(self, level):
+        for hndl in (self._opc1, self._alu, self._gen1, self._aluc):
+            hndl.DEBUG = level
     def get_instr(self,pc):
         return self.get_code(pc), self.get_mnem(pc)
     def get_mnem(self, pc):
-        progword = self._core._pram.bus(pc)
-        if progword[:4].uint in self._opc1._opc1_dict:
-            op1 = self._opc1._opc1_dict[progword[:4].uint]
-            instr = self._opc1._instrs[op1]
-            if instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
-                if op1 in self._opc2:
-                    op2 = self._opc2[op1]._opc2_dict[progword[4:].uint]
-                    instr = self._opc2[op1]._intrs[op2]
-            return instr._mnem
+        dec = self.fetch(pc)
+        if dec._op is not None:
+            return dec._op._instr._mnem
+        if dec._instr is not None:
+            return dec._instr._mnem
         return ""
     def get_code(self,pc):
         code = ""
-        progword = self._core._pram.bus(pc)
-        if progword[:4].uint in self._opc1._opc1_dict:
-            op1 = self._opc1._opc1_dict[progword[:4].uint]
-            instr = self._opc1._instrs[op1]
-            if instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
-                if op1 in self._opc2:
-                    code = progword.hex
+        dec = self.fetch(pc)
+        if dec._instr is not None:
+            if dec._instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
+                if dec._op1 in self._opc2:
+                    code = "{:02x}".format(dec._word)
             else:
-                code = progword[:4].hex
+                code = "{:x}".format(dec._word >> 4)
         return code
 
+class Block(object):
+    '''
+    Translated straight-line run of instructions starting at _start.
+    _fn runs the whole block and returns the next PC.
+    '''
+    def __init__(self, start, end, cycles, pcs, occ, fn, src):
+        self._start = start
+        self._end = end
+        self._cycles = cycles
+        self._pcs = pcs
+        self._occ = occ
+        self._fn = fn
+        self._src = src
+
+class Block_Translator(object):
+    '''
+    Turns runs of instructions into Python functions over the raw core
+    state: R (regs), V (iVects), M (dram), sp, ie and the z/n/c/x flags.
+    Instructions with no emitter (ISEs, hlt, rti, sys, str, lsr, ...) end
+    a block and are left to Handler.handle_fsm.
+    '''
+    def __init__(self, core, meta, ins, maxlen = 64):
+        self._core = core
+        self._meta = meta
+        self._ins = ins
+        self._maxlen = maxlen
+        self._emit = {
+            "mvs" : self.emit_mvs,
+            "mvv" : self.emit_mvv,
+            "jmp" : self.emit_jmp,
+            "jsr" : self.emit_jsr,
+            "bzi" : self.emit_bxx,
+            "bni" : self.emit_bxx,
+            "bci" : self.emit_bxx,
+            "bxi" : self.emit_bxx,
+            "mvi" : self.emit_mvi,
+            "psh" : self.emit_psh,
+            "pop" : self.emit_pop,
+            "add" : self.emit_add,
+            "adc" : self.emit_add,
+            "adi" : self.emit_add,
+            "sub" : self.emit_sub,
+            "sbc" : self.emit_sub,
+            "sbi" : self.emit_sub,
+            "and" : self.emit_log,
+            "lor" : self.emit_log,
+            "xor" : self.emit_log,
+            "not" : self.emit_not,
+            "sll" : self.emit_sft,
+            "slr" : self.emit_sft,
+            "rol" : self.emit_sft,
+            "ror" : self.emit_sft,
+            "mov" : self.emit_mov,
+            "lxb" : self.emit_lxb,
+            "sxb" : self.emit_sxb,
+            "ret" : self.emit_ret,
+            "rie" : self.emit_rie,
+            "sie" : self.emit_sie,
+        }
+        self._branch_flag = {"bzi": "z", "bni": "n", "bci": "c", "bxi": "x"}
+        self.DEBUG = Debug.Warn
+
+    ##emitters: each returns (lines, uses, ends_block)
+    ## uses holds the state names the lines read or write, flags written are upper case
+    def emit_mvs(self, mnem, pc, b0, b1):
+        im = ((b0 & 0xF) << 8) | b1
+        return ["sp = {:#x}".format((im << 4) & 0xFFF)], {"sp", "mvs"}, False
+    def emit_mvv(self, mnem, pc, b0, b1):
+        return ["V[{}] = {:#04x}".format(b0 & 0xF, b1)], set(), False
+    def emit_jmp(self, mnem, pc, b0, b1):
+        return ["pc = {:#05x}".format(((b0 & 0xF) << 8) | b1)], set(), True
+    def emit_jsr(self, mnem, pc, b0, b1):
+        ret = (pc + 2) % 2**12
+        lines = [
+            "M[sp] = {:#x}".format(ret >> 8),
+            "if sp > 0: sp -= 1",
+            "M[sp] = {:#04x}".format(ret & 0xFF),
+            "if sp > 0: sp -= 1",
+            "pc = {:#05x}".format(((b0 & 0xF) << 8) | b1),
+        ]
+        return lines, {"sp"}, True
+    def emit_bxx(self, mnem, pc, b0, b1):
+        flag = self._branch_flag[mnem]
+        im = ((b0 & 0xF) << 8) | b1
+        return ["pc = {:#05x} if {} else {:#05x}".format(im, flag, pc + 2)], {flag}, True
+    def emit_mvi(self, mnem, pc, b0, b1):
+        return ["R[{}] = {:#04x}".format(b0 & 0xF, b1)], set(), False
+    def emit_psh(self, mnem, pc, b0, b1):
+        return ["M[sp] = R[{}]".format(b0 & 0xF), "if sp > 0: sp -= 1"], {"sp"}, False
+    def emit_pop(self, mnem, pc, b0, b1):
+        lines = [
+            "if sp < {}: sp += 1".format(self._core._dram._maxaddr),
+            "R[{}] = M[sp]".format(b0 & 0xF),
+        ]
+        return lines, {"sp"}, False
+    def emit_add(self, mnem, pc, b0, b1):
+        a, b = b1 >> 4, b1 & 0xF
+        if mnem == "adi":
+            lines = ["t = R[{}] + {}".format(b, a + 1)]
+        elif mnem == "adc":
+            lines = ["t = R[{}] + R[{}] + c".format(a, b)]
+        else:
+            lines = ["t = R[{}] + R[{}]".format(a, b)]
+        lines += [
+            "c = t > 0xFF",
+            "t &= 0xFF",
+            "n = t > 0x7F",
+            "z = t == 0",
+            "R[{}] = t".format(b),
+        ]
+        return lines, {"c", "Z", "N", "C"}, False
+    def emit_sub(self, mnem, pc, b0, b1):
+        a, b = b1 >> 4, b1 & 0xF
+        if mnem == "sbi":
+            lines = ["s = R[{}]".format(b), "c = s < {}".format(a + 1), "t = (s - {}) & 0xFF".format(a + 1)]
+        elif mnem == "sbc":
+            lines = ["s = R[{}]; u = R[{}] + c".format(a, b), "c = s < u", "t = (s - u) & 0xFF"]
+        else:
+            lines = ["s = R[{}]; u = R[{}]".format(a, b), "c = s < u", "t = (s - u) & 0xFF"]
+        lines += [
+            "n = t > 0x7F",
+            "z = t == 0",
+            "R[{}] = t".format(b),
+        ]
+        return lines, {"c", "Z", "N", "C"}, False
+    def emit_log(self, mnem, pc, b0, b1):
+        a, b = b1 >> 4, b1 & 0xF
+        op = {"and": "&", "lor": "|", "xor": "^"}[mnem]
+        return ["R[{}] {}= R[{}]".format(b, op, a)], set(), False
+    def emit_not(self, mnem, pc, b0, b1):
+        return ["R[{}] = R[{}] ^ 0xFF".format(b1 & 0xF, b1 >> 4)], set(), False
+    def emit_sft(self, mnem, pc, b0, b1):
+        a, b = b1 >> 4, b1 & 0xF
+        lines = [
+            "s = R[{}]".format(a),
+            "if s & 0x80: print(\"Warning: {} with negative value taken as unsigned.\")".format(mnem),
+        ]
+        if mnem == "sll":
+            lines += ["R[{0}] = (R[{0}] << s) & 0xFF".format(b)]
+        elif mnem == "slr":
+            lines += ["R[{0}] = R[{0}] >> s".format(b)]
+        elif mnem == "rol":
+            lines += ["s &= 7; t = R[{0}]".format(b), "R[{}] = ((t << s) | (t >> (8 - s))) & 0xFF".format(b)]
+        else:
+            lines += ["s &= 7; t = R[{0}]".format(b), "R[{}] = ((t >> s) | (t << (8 - s))) & 0xFF".format(b)]
+        return lines, set(), False
+    def emit_mov(self, mnem, pc, b0, b1):
+        return ["R[{}] = R[{}]".format(b1 & 0xF, b1 >> 4)], set(), False
+    def emit_lxb(self, mnem, pc, b0, b1):
+        src, dst = b1 >> 4, b1 & 0xF
+        ri = src & 7
+        lines = ["w = R[{}]".format(ri), "R[{}] = M[(R[{}] << 8) | w]".format(dst, ri + 8)]
+        if src & 8:
+            lines += ["R[{}] = (w + 1) & 0xFF".format(ri)]
+        return lines, set(), False
+    def emit_sxb(self, mnem, pc, b0, b1):
+        src, dst = b1 >> 4, b1 & 0xF
+        ri = dst & 7
+        lines = ["w = R[{}]".format(ri), "M[(R[{}] << 8) | w] = R[{}]".format(ri + 8, src)]
+        if dst & 8:
+            lines += ["R[{}] = (w + 1) & 0xFF".format(ri)]
+        return lines, set(), False
+    def emit_ret(self, mnem, pc, b0, b1):
+        top = self._core._dram._maxaddr
+        lines = [
+            "if sp < {}: sp += 1".format(top),
+            "t = M[sp]",
+            "if sp < {}: sp += 1".format(top),
+            "pc = ((M[sp] & 0xF) << 8) | t",
+        ]
+        return lines, {"sp"}, True
+    def emit_rie(self, mnem, pc, b0, b1):
+        ri = (b1 >> 4) & 7
+        return ["R[{}] = ie >> 8".format(ri + 8), "R[{}] = ie & 0xFF".format(ri)], {"ie"}, False
+    def emit_sie(self, mnem, pc, b0, b1):
+        ri = (b1 >> 4) & 7
+        return ["ie = (R[{}] << 8) | R[{}]".format(ri + 8, ri)], {"ie", "IE"}, False
+
+    def translate(self, start):
+        pram = self._core._pram
+        maxpc = self._core._srgs._PC._maxPC
+        body = []
+        uses = set()
+        pcs = []
+        occ = {}
+        pc = start
+        cycles = 0
+        end = False
+        while not end and len(pcs) < self._maxlen:
+            dec = self._ins.fetch(pc)
+            if dec._op is None:
+                break
+            mnem = dec._op._instr._mnem
+            length = dec._op._cycles
+            if mnem not in self._emit or pc + length > maxpc:
+                break
+            b1 = pram.bus(pc + 1) if length > 1 else 0
+            lines, used, end = self._emit[mnem](mnem, pc, dec._word, b1)
+            body.append("# {:03x}: {}".format(pc, mnem))
+            body += lines
+            uses |= used
+            pcs.append(pc)
+            occ[mnem] = occ.get(mnem, 0) + 1
+            pc += length
+            cycles += length
+        if not pcs:
+            return None
+        if not end:
+            body.append("pc = {:#05x}".format(pc))
+        flags = [f for f in "zncx" if f in uses or f.upper() in uses]
+        head = []
+        tail = []
+        if flags:
+            head.append("st = SR._stat")
+            head += ["{} = st >> {} & 1".format(f, "zncx".index(f)) for f in flags]
+            out = [f for f in flags if f.upper() in uses]
+            if out:
+                keep = 0xFF & ~sum(1 << "zncx".index(f) for f in out)
+                tail.append("SR._stat = st & {:#04x} | {}".format(keep, " | ".join("{} << {}".format(f, "zncx".index(f)) for f in out)))
+        if "sp" in uses:
+            head.append("sp = SP._sp")
+            tail.append("SP._sp = sp")
+        if "ie" in uses:
+            head.append("ie = IE._ie")
+            if "IE" in uses:
+                tail.append("IE._ie = ie")
+        tail.append("return pc")
+        src = "def blk_{:03x}(R, V, M, SP, SR, IE):\n".format(start)
+        src += "".join("    {}\n".format(l) for l in head + body + tail)
+        env = {"BitArray": BitArray}
+        exec(compile(src, "<block {:03x}>".format(start), "exec"), env)
+        return Block(start, pc, cycles, tuple(pcs), tuple(occ.items()), env["blk_{:03x}".format(start)], src)
+
+    def block(self, pc):
+        blocks = self._core._pram._blocks
+        if pc in blocks:
+            return blocks[pc]
+        blk = self.translate(pc)
+        blocks[pc] = blk
+        return blk
+
 class Interrupt_Handler(object):
+    '''
+    Raises interrupts and keeps the schedule of pending ones built from
+    meta._cycinterr and meta._interrupts: a min-heap of cycles with their
+    iv masks and a PC-indexed table of iv masks. An iv mask has bit k set
+    for interrupt ik, as the int value of the four digit iv.
+    '''
     def __init__(self, core, meta):
         self._core = core
         self._meta = meta
@@ -2097,6 +2385,58 @@ class Interrupt_Handler(object):
         self._iVects = core._iVects
         self._pState = core._pState
         self._addr = None
+        self._heap = []
+        self._cyc = {}
+        self._pcint = [0]*2**self._srgs._PC._pcBits
+        self._pckey = {}
+        self._src = None
+    @staticmethod
+    def mask(iv):
+        return iv.uint if type(iv) is BitArray else iv
+    @staticmethod
+    def priority(iv):
+        # lowest set bit: i0 is served first
+        return (iv & -iv).bit_length() - 1
+    def schedule(self):
+        '''
+        Rebuilds the schedule when the meta tables were replaced or resized
+        since the last build. The tables themselves are kept to tell, an id
+        can be reused once the old one is freed.
+        '''
+        cycinterr = self._meta._cycinterr
+        interrupts = self._meta._interrupts
+        src = self._src
+        if src is not None and src[0] is cycinterr and src[1] == len(cycinterr) and src[2] is interrupts and src[3] == len(interrupts):
+            return
+        self._src = (cycinterr, len(cycinterr), interrupts, len(interrupts))
+        self._cyc = {cyc: self.mask(iv) for cyc, iv in cycinterr.items()}
+        self._heap = list(self._cyc)
+        heapq.heapify(self._heap)
+        for pc in self._pckey:
+            self._pcint[pc] = 0
+        self._pckey = {}
+        for key, iv in interrupts.items():
+            pc = key if type(key) is int else int(key, 16)
+            self._pcint[pc] |= self.mask(iv)
+            self._pckey[pc] = key
+    def next_cycle(self, cyc):
+        '''
+        First scheduled cycle at or after cyc, None if there is none.
+        Cycles already passed can no longer fire and are dropped.
+        '''
+        heap = self._heap
+        while heap and heap[0] < cyc:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+    def cycle_done(self, cyc):
+        heapq.heappop(self._heap)
+        del self._cyc[cyc]
+        del self._meta._cycinterr[cyc]
+        self._src = self._src[:1] + (self._src[1]-1,) + self._src[2:]
+    def pc_done(self, pc):
+        self._pcint[pc] = 0
+        del self._meta._interrupts[self._pckey.pop(pc)]
+        self._src = self._src[:3] + (self._src[3]-1,)
     def do_intr(self):
         self._regs._shadow_(True,self._meta._num_pairs_shadowed)
         self._srgs._SR._shadow_(True)
@@ -2105,9 +2445,8 @@ class Interrupt_Handler(object):
         self._srgs._PC._shadow_(True)
         if self._addr is None:
             return "Error: Interrupt address of iVect is None."
-        pc = self._iVects.bus(self._addr)
-        pc <<= 4
-        self._srgs._PC._pc = pc.__copy__()
+        pc = self._iVects.bus(self._addr) << 4
+        self._srgs._PC._pc = pc % 2**self._srgs._PC._pcBits
         self._srgs._PC.changed = False
         self._pState._set_("None")
         return None
@@ -2124,13 +2463,36 @@ class Handler(object):
         self._pState = core._pState
         self._ins = Instruction_Handler(core, meta)
         self._intr = Interrupt_Handler(core, meta)
+        self._blk = Block_Translator(core, meta, self._ins)
         self._maxpc = 0
+        # meta._breakpoints and meta._brkins compiled by debug_sets
+        self._bpflag = bytearray(2**self._srgs._PC._pcBits)
+        self._biflag = bytearray(256)
+        self._checked = False
+        # run limits, see check_limits
+        self._check_every = 4096
+        self._limit_at = 0
+        self._start_cyc = 0
+        self._start_ins = 0
+        self._stop_cyc = None
+        self._stop_ins = None
+        # History checkpoints are taken on the same checks, when kept
+        self._history = None
+        # TraceWriter getting a record per cycle, when tracing to a file
+        self._tracer = None
+        # Profile counting cycles per PC, when profiling
+        self._profile = None
+        # CallGraph keeping the shadow call stack, when attached
+        self._calls = None
         self.DEBUG = Debug.Test
         self.progword = None
+        self.decoded = None
         self.op1 = None
         self.op2 = None
         self.pw = ""
+        self.verbose = True
         self.errc = None
+        self.stop = None
         self.firstCyc = True
         self.tstart = None
         self.bins_firstCyc = True
@@ -2147,37 +2509,49 @@ class Handler(object):
             return None
         return get_imm([char for char in m[1]],16)
  
+    def hex_words(self, lines):
+        words = bytearray()
+        for line in lines:
+            word = self.hex_rgx(line)
+            if word is not None:
+                words.append(word)
+        return words
+
     def pram_load(self, prog, fn):
-        self._maxpc = 0
-        for it, progword in enumerate(prog):
-            progword = self.hex_rgx(progword)
-            if progword is not None:
-                self._pram._mem[it] = BitArray(uint=progword,length=self._pram._w_width)
-                self._maxpc += 1
-        self._maxpc -= 1
+        return self.pram_words(self.hex_words(prog), fn)
+
+    def pram_words(self, words, fn):
+        self._maxpc = len(words) - 1
         if self._maxpc < 0:
             return "Error: No progwords of hex-pair format found in \"{}\"".format(fn)
+        if self._maxpc >= 2**self._core._pram._a_width:
+            return "Error: Lines in program exceeds maximum of {}.".format(2**self._core._pram._a_width)
+        self._pram.load(0, words)
+        self._ins.predecode(0, len(words))
         # pass number of proglines to PC and pram
         self._srgs._PC._maxPC = self._maxpc
         self._pram._maxaddr = self._maxpc
         self._pram._size = self._maxpc+1
-        
-        if self._maxpc >= 2**self._core._pram._a_width:
-            return "Error: Lines in program exceeds maximum of {}.".format(2**self._core._pram._a_width)
         return "Success: Loaded program file \"{}\"".format(fn)
 
+    def pram_copy(self, pram, maxpc):
+        '''
+        pram_load from an already loaded ProgMemory.
+        '''
+        self._maxpc = maxpc
+        self._ins.adopt(pram)
+        self._srgs._PC._maxPC = maxpc
+
     def data_load(self, datalines, fn, start = 0):
-        self._meta._highest = start
-        for it, data in enumerate(datalines):
-            data = self.hex_rgx(data)
-            if data is not None:
-                self._dram._mem[it+start] = BitArray(uint=data,length=self._pram._w_width)
-                self._meta._highest += 1
-        self._meta._highest -= 1
+        return self.data_words(self.hex_words(datalines), fn, start)
+
+    def data_words(self, words, fn, start = 0):
+        self._meta._highest = start + len(words) - 1
         if self._meta._highest < 0:
             return "Error: No data of hex-pair format found in \"{}\"".format(fn)
-        if self._maxpc >= 2**self._core._pram._a_width:
-            return "Error: Lines in program exceeds maximum of {}.".format(2**self._core._pram._a_width)
+        if self._meta._highest >= len(self._dram._mem):
+            return "Error: Lines in data exceeds maximum of {}.".format(len(self._dram._mem) - start)
+        self._dram.load(start, words)
         #//if self.DEBUG >= Debug.Test:
         return "Success: Loaded data file \"{}\"".format(fn)
         
@@ -2191,10 +2565,17 @@ class Handler(object):
         #print("Timer expired.")
         return False
     
+    def set_verbose(self, run = True):
+        '''
+        Op handlers only build their messages when something will print them:
+        never in quiet mode, otherwise when stepping or with print on.
+        '''
+        self.verbose = not self._meta._quiet and (self._meta._print or not run)
+        self._ins.debug(Debug.Test if self.verbose else Debug.Warn)
+
     def status(self):
-        pc = self._core._srgs._PC._pc
         status_out = ""
-        status_out += "PC: {} ".format(pc.hex)
+        status_out += "PC: {} ".format(self._core._srgs._PC.hex())
         if self._core._op._instr._opc1 >= 0:
             if self._core._op._instr._opc2 is not None:
                 code = hex(self._core._op._instr._opc1) + hex(self._core._op._instr._opc2)[2:]
@@ -2206,9 +2587,9 @@ class Handler(object):
             code = -1
         status_out += "Instr: {} Mnem: {} ".format(code, self._core._op._instr._mnem)
         for it, reg in enumerate(self._core._regs._reg[:8]):
-            status_out += "r{}: 0x{} ".format(it,reg.hex)
+            status_out += "r{}: 0x{:02x} ".format(it,reg)
         for it, reg in enumerate(self._core._regs._reg[8:]):
-            status_out += "a{}: 0x{} ".format(it,reg.hex)
+            status_out += "a{}: 0x{:02x} ".format(it,reg)
         status_out += "Z: {} ".format(self._core._srgs._SR.status("z"))
         status_out += "N: {} ".format(self._core._srgs._SR.status("n"))
         status_out += "C: {} ".format(self._core._srgs._SR.status("c"))
@@ -2219,26 +2600,27 @@ class Handler(object):
         if self.progword is None:
             self.errc = "Error: Progword is None."
             return -1
-        if self.progword[:4].uint in self._ins._opc1._opc1_dict:
+        dec = self.decoded
+        if dec._op1 is not None:
             self._pState._set_("Op")
+            if self._profile is not None:
+                self._profile.start(self.curpc)
             self._core._args = []
-            self.op1 = self._ins._opc1._opc1_dict[self.progword[:4].uint]
-            self._core._instr = self._ins._opc1._instrs[self.op1]
-            if self._core._instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
-                if self.op1 in self._ins._opc2:
-                    if self.progword[4:].uint in self._ins._opc2[self.op1]._opc2_dict:
-                        self.op2 = self._ins._opc2[self.op1]._opc2_dict[self.progword[4:].uint]
-                        self._core._op = self._ins._opc2[self.op1]._ops[self.op2]
-                    else:
-                        self.errc = "Error: {} {} not recognized.".format(self.op1,self.progword[4:].hex)
-                        return 1
+            self.op1 = dec._op1
+            self._core._instr = dec._instr
+            if dec._instr._cycles == -2: #? -2 cycles used for gen1/alu/aluc
+                if dec._op is None:
+                    self.errc = "Error: {} {:x} not recognized.".format(self.op1,self.progword & 0xF)
+                    return 1
+                self.op2 = dec._op2
+                self._core._op = dec._op
             else:
-                self._core._op = self._ins._opc1._ops[self.op1]
-                self._core._args.append(self.progword[4:])
-            if run:
+                self._core._op = dec._op
+                self._core._args.append(dec._nibs[1])
+            if run and self._checked:
                 if self.bins_firstCyc:
                     self.bins_firstCyc = False
-                elif self._core._op._instr._mnem in self._meta._brkins.keys():
+                elif self._biflag[self.progword]:
                     brkins = False
                     if self._meta._brkins[self._core._op._instr._mnem] > 0:
                         brkins = True
@@ -2249,16 +2631,19 @@ class Handler(object):
                         brkins = True
                     else:
                         del self._meta._brkins[self._core._op._instr._mnem]
+                    if self._core._op._instr._mnem not in self._meta._brkins:
+                        self.debug_sets()
                     if brkins:
-                        self.errc = "Break on Instruction reached at pc = {}".format(self.curpc.hex)
+                        self.errc = "Break on Instruction reached at pc = {}".format(self._srgs._PC.hex(self.curpc))
+                        self.stop = Stop.BreakInstr
                         self._pState._set_("None")
                         return 3 
             tmp = self._core._op.zero(self._core._args)
-            if tmp is not None:
+            if tmp is not None and self.verbose:
                 self.pw += tmp
             self._core._op._cur += 1
         else:
-            self.errc = "Error: Unrecognized opc1: {}".format(self.progword[:4].hex)
+            self.errc = "Error: Unrecognized opc1: {:x}".format(self.progword >> 4)
             return 2
         return None
     
@@ -2266,31 +2651,19 @@ class Handler(object):
         if self.op1 is None:
             self.errc = "Error: op1 is None."
             return -1
-        if "aluc" in self.op1:
+        if self._core._op._aluc:
             #print(self.op1,self._core._op._instr._mnem)
-            self._core._args = []
-            self._core._args.append(self.progword[:4])
-            self._core._args.append(self.progword[4:])
+            self._core._args = list(self.decoded._nibs)
             tmp = self._core._op.call(self._core._op._cur,self._core._args)
-            if tmp is not None:
+            if tmp is not None and self.verbose:
                     self.pw += tmp
-            try:
-                if self._core._op._state == "done":
-                    self._core._op.reset()
-                    self._core._op._cur = 0
-                    self._pState._set_("None")
-            except AttributeError:
-                if self._core._op._cur >= self._core._op._cycles:
-                    self._core._op._cur = 0
-                    self._pState._set_("None")
             if not self._srgs._PC.check_wait():
                 self._core._op._cur = 0
                 self._pState._set_("None")
         elif self._core._op._cur < self._core._op._cycles:
-                self._core._args.append(self.progword[:4])
-                self._core._args.append(self.progword[4:])
+                self._core._args.extend(self.decoded._nibs)
                 tmp = self._core._op.call(self._core._op._cur,self._core._args)
-                if tmp is not None:
+                if tmp is not None and self.verbose:
                     self.pw += tmp
                 self._core._op._cur += 1
         return None
@@ -2299,49 +2672,45 @@ class Handler(object):
         pass
 
     def check_interrupts(self):
-        iv = None
-        tmpCyc = self._core._cycle+self._core._haltCycles
-        if tmpCyc in self._meta._cycinterr:
-            for it, bit in enumerate(self._meta._cycinterr[tmpCyc]):
-                if self._core._srgs._IE._ie[it] and bit:
-                    iv = it
-            if iv is not None:
-                self._intr._addr = 15-iv
-                print("Interrupt i{} occurring.".format(self._intr._addr))
-                del self._meta._cycinterr[tmpCyc]
-                return True
-        elif self.curpc.hex in self._meta._interrupts:
-            for it, bit in enumerate(self._meta._interrupts[self.curpc.hex]):
-                if self._core._srgs._IE._ie[it] and bit:
-                    iv = it
-            if iv is not None:
-                self._intr._addr = 15-iv
-                print("Interrupt i{} occurring.".format(self._intr._addr))
-                del self._meta._interrupts[self.curpc.hex]
+        intr = self._intr
+        if intr._heap:
+            tmpCyc = self._core._cycle+self._core._haltCycles
+            if intr._heap[0] <= tmpCyc and intr.next_cycle(tmpCyc) == tmpCyc:
+                iv = intr._cyc[tmpCyc] & self._srgs._IE._ie
+                if iv:
+                    intr._addr = intr.priority(iv)
+                    if not self._meta._quiet:
+                        print("Interrupt i{} occurring.".format(intr._addr))
+                    intr.cycle_done(tmpCyc)
+                    return True
+                return False
+        if intr._pckey:
+            iv = intr._pcint[self.curpc] & self._srgs._IE._ie
+            if iv:
+                intr._addr = intr.priority(iv)
+                if not self._meta._quiet:
+                    print("Interrupt i{} occurring.".format(intr._addr))
+                intr.pc_done(self.curpc)
                 return True
         return False
     
     def pre_state(self, run = True):
         introcc = False
-        if run:
-            if self._meta._timer.expired():
-                touttime = time.time()
-                contin = input("Timeout of {} seconds expired. Cont? [y]/n: ".format(self._meta._timeout))
-                if contin == "" or 'y' in contin.lower() or '1' in contin.lower() or 'true' in contin.lower():
-                    self._meta._timer.start(self._meta._timeout)
-                elif 'n' in contin.lower() or contin == '0' or contin.lower() == 'false':
-                    self.errc = "Timeout reached at {} seconds.".format(str(touttime - self.tstart)[:10])
-                    return 5
+        if run and self._core._cycle + self._core._haltCycles >= self._limit_at:
+            if self.check_limits() is not None:
+                return 5
         self.curpc = self._srgs._PC.bus()
-        if run:
+        if run and self._checked:
             if self.firstCyc:
                 self.firstCyc = False
-            elif self.curpc.uint in self._meta._breakpoints.keys():
-                self.errc = "Breakpoint reached at pc = {}".format(self.curpc.hex)
+            elif self._bpflag[self.curpc]:
+                self.errc = "Breakpoint reached at pc = {}".format(self._srgs._PC.hex(self.curpc))
+                self.stop = Stop.Breakpoint
                 return 6
         sysFF = self._core._sbus.bus()
         if sysFF == "ff":
             self.errc = "System End signal received."
+            self.stop = Stop.End
             return 7
         if self._pState._get_() != "Op" and not self._pState._intr:
             self._pState._intr = self.check_interrupts()
@@ -2351,32 +2720,38 @@ class Handler(object):
                 ret_di = self._intr.do_intr()
                 if ret_di is not None:
                     return ret_di
+                if self._calls is not None:
+                    self._calls.interrupt(self._srgs._PC._pc, self._core._cycle + self._core._haltCycles)
         if introcc:
             return "intr"
             #self.curpc = self._srgs._PC.bus()
-        self.progword = self._pram.bus(self._srgs._PC.bus())
-        if self._pState._get_() != "Halt":
+        self.decoded = self._ins.fetch(self._srgs._PC._pc)
+        self.progword = self.decoded._word
+        if self._pState._get_() != "Halt" and self.verbose:
             self.pw = ""
             if self._srgs._PC.check_wait():
                 self.pw += "Waiting "
             else:
-                self.pw += "pc: {} ".format(self._srgs._PC._pc.hex)
+                self.pw += "pc: {} ".format(self._srgs._PC.hex())
     
     def post_state(self, run = True):
         if self._core._op._cur >= self._core._op._cycles:
-            if "aluc" not in self.op1:
+            if not self._core._op._aluc:
                 self._core._op._cur = 0
                 self._pState._set_("None")
-        if self._meta._print:
-            print(self.pw)
-        elif not run:
+        if self.verbose:
             print(self.pw)
         sysFF = self._core._sbus.bus()
         self._core._cycle += 1
         if self._meta._trace:
             print(self.status())
+        if self._tracer is not None:
+            self._tracer.record(self, self._core._cycle - 1 + self._core._haltCycles, sysFF == "ff")
+        if self._profile is not None:
+            self._profile.cycle(self._srgs._PC.check_wait())
         if sysFF == "ff":
             self.errc = "System End signal received."
+            self.stop = Stop.End
             return 3
         elif not self._srgs._PC.advance():
             self.errc = "Error: Max PC Exceeded."
@@ -2398,60 +2773,828 @@ class Handler(object):
             if ret_pos is not None:
                 return self.errc
         elif state != "Halt":
-            if self._meta._print:
-                print(self.pw)
-            elif not run:
+            if self.verbose:
                 print(self.pw)
             if self._meta._trace:
                 print(self.status())
+            if self._tracer is not None:
+                self._tracer.record(self, self._core._cycle + self._core._haltCycles)
             if not self._srgs._PC.advance():
                 self.errc = "Error: Max PC Exceeded."
                 return self.errc
         else:
             self._core._haltCycles += 1
+            if self._profile is not None:
+                self._profile.halt(1)
+            if run:
+                self.skip_halt()
+        return None
+
+    def skip_halt(self):
+        '''
+        Nothing but an interrupt ends a halt, so jump the halted cycles
+        straight to the next scheduled cycle interrupt. With none left the
+        halt never ends and the run stops with Stop.Halted. Skipped cycles
+        count as halted cycles.
+        '''
+        intr = self._intr
+        if self._bpflag[self.curpc] or intr._pcint[self.curpc]:
+            return
+        cyc = self._core._cycle + self._core._haltCycles
+        due = intr.next_cycle(cyc)
+        if self._stop_cyc is not None and (due is None or due > self._stop_cyc):
+            due = self._stop_cyc
+        if due is None:
+            self.errc = "Halted with no interrupt pending."
+            self.stop = Stop.Halted
+        elif due > cyc:
+            self._core._haltCycles += due - cyc
+            self._core._haltSkipped += due - cyc
+            if self._profile is not None:
+                self._profile.halt(due - cyc)
+
+    def check_limits(self):
+        '''
+        Run limits, checked every _check_every cycles and exactly on the
+        cycle a cycle or instruction budget can run out, and on the cycles
+        a History checkpoint is due. Returns None to go on, else the errc
+        the run stops with. The wall clock goes by
+        meta._policy: "ask" prompts, "continue" restarts the timer, "stop"
+        ends the run and "raise" raises TimeoutError, as do the budgets.
+        '''
+        core = self._core
+        meta = self._meta
+        cyc = core._cycle + core._haltCycles
+        errc = None
+        if self._history is not None:
+            self._history.tick()
+        if self._stop_cyc is not None and cyc >= self._stop_cyc:
+            errc = "Cycle limit of {} reached.".format(self._stop_cyc - self._start_cyc)
+            self.stop = Stop.CycleLimit
+        elif self._stop_ins is not None and meta._occur.count >= self._stop_ins and self._pState._get_() != "Op":
+            errc = "Instruction limit of {} reached.".format(self._stop_ins - self._start_ins)
+            self.stop = Stop.InstrLimit
+        elif meta._timer.expired():
+            touttime = time.time()
+            if meta._policy == "ask":
+                contin = input("Timeout of {} seconds expired. Cont? [y]/n: ".format(meta._timer._sec))
+                if contin == "" or 'y' in contin.lower() or '1' in contin.lower() or 'true' in contin.lower():
+                    meta._timer.start()
+                elif 'n' in contin.lower() or contin == '0' or contin.lower() == 'false':
+                    errc = "Timeout reached at {} seconds.".format(str(touttime - self.tstart)[:10])
+                    self.stop = Stop.Timeout
+            elif meta._policy == "continue":
+                meta._timer.start()
+            else:
+                errc = "Timeout reached at {} seconds.".format(str(touttime - self.tstart)[:10])
+                self.stop = Stop.Timeout
+        if errc is not None:
+            if meta._policy == "raise":
+                raise TimeoutError(errc)
+            self.errc = errc
+            return errc
+        at = cyc + self._check_every
+        if self._stop_cyc is not None:
+            at = min(at, self._stop_cyc)
+        if self._stop_ins is not None:
+            # an instruction takes at least a cycle
+            at = min(at, cyc + max(self._stop_ins - meta._occur.count, 1))
+        if self._history is not None:
+            at = min(at, self._history._next)
+        self._limit_at = at
         return None
     
-    def pre_run(self):
-        self._meta._timer = Timeout(self._meta._timeout)
-        self._meta._timer.start(self._meta._timeout)
+    def pre_run(self, max_cycles = None, max_instructions = None, max_wall_seconds = None):
+        '''
+        Limits given here hold for this run only, the meta ones otherwise.
+        Cycle and instruction budgets count from the start of the run.
+        '''
+        meta = self._meta
+        if max_cycles is None:
+            max_cycles = meta._max_cycles
+        if max_instructions is None:
+            max_instructions = meta._max_instructions
+        if max_wall_seconds is None:
+            max_wall_seconds = meta._timeout
+        meta._timer = Timeout(max_wall_seconds)
+        self._start_cyc = self._core._cycle + self._core._haltCycles
+        self._start_ins = meta._occur.count
+        self._stop_cyc = None if max_cycles is None else self._start_cyc + max_cycles
+        self._stop_ins = None if max_instructions is None else self._start_ins + max_instructions
+        self._limit_at = self._start_cyc
         self.tstart = time.time()
         self.firstCyc = True
         self.bins_firstCyc = True
-        self._core._args = []
         self.errc = None
+        self.stop = None
+        self.set_verbose()
+        self._intr.schedule()
+        self.debug_sets()
     
     def pre_step(self):
         self.errc = None
+        self.stop = None
+        self.set_verbose(False)
+        self._intr.schedule()
+        self.debug_sets()
+
+    def debug_sets(self):
+        '''
+        Compiles meta._breakpoints into a flag per PC and meta._brkins into
+        a flag per progword, so the run loop tests one byte instead of
+        walking the dicts. With neither set the checks are skipped.
+        '''
+        bp = self._bpflag
+        bp[:] = bytes(len(bp))
+        for pc in self._meta._breakpoints:
+            bp[pc] = 1
+        brkins = self._meta._brkins
+        if brkins:
+            entry = self._ins.entry
+            self._biflag[:] = bytes(entry(w)._op is not None and entry(w)._op._instr._mnem in brkins for w in range(256))
+        else:
+            self._biflag[:] = bytes(256)
+        self._checked = bool(self._meta._breakpoints or brkins)
+        return self._checked
     
-    def run(self):
-        self.pre_run()
+    def run_block(self):
+        '''
+        Runs the translated block at PC in one go. Returns False, leaving the
+        cycle to handle_fsm, whenever something in the block's span needs
+        cycle granularity: mid-instruction or halted state, ISE waits, the
+        timeout, breakpoints, break on instruction, or cycle/PC interrupts
+        that may fire in it.
+        '''
+        if self._pState._get_() != "None" or self._srgs._PC.check_wait():
+            return False
+        blk = self._blk.block(self._srgs._PC._pc)
+        if blk is None:
+            return False
+        if self._core._cycle + self._core._haltCycles + blk._cycles > self._limit_at:
+            return False
+        if self._checked:
+            if any(self._bpflag[blk._start:blk._end]):
+                return False
+            if any(self._biflag[self._pram._mem[pc]] for pc in blk._pcs):
+                return False
+        intr = self._intr
+        if intr._heap:
+            cyc = self._core._cycle + self._core._haltCycles
+            due = intr.next_cycle(cyc)
+            if due is not None and due < cyc + blk._cycles:
+                return False
+        if intr._pckey:
+            if any(intr._pcint[pc] for pc in blk._pcs):
+                return False
+        srgs = self._srgs
+        pc = blk._fn(self._regs._reg, self._iVects._reg, self._dram._mem, srgs._SP, srgs._SR, srgs._IE)
+        srgs._PC._pc = pc
+        srgs._PC._changed = False
+        self._core._cycle += blk._cycles
+        occ = self._meta._occur.occ
+        for mnem, n in blk._occ:
+            occ[mnem] = occ.get(mnem, 0) + n
+        self._meta._occur.count += len(blk._pcs)
+        if self._profile is not None:
+            self._profile.block(blk)
+        if self._calls is not None:
+            self._calls.block(self, blk)
+        self.firstCyc = False
+        self.bins_firstCyc = False
+        return True
+
+    def run(self, max_cycles = None, max_instructions = None, max_wall_seconds = None):
+        self.pre_run(max_cycles, max_instructions, max_wall_seconds)
+        # blocks only where nothing watches individual cycles or DRAM accesses
+        blocks = self._meta._engine == "block" and not self.verbose and not self._meta._trace and self._tracer is None and self._dram._reads is None
         while self.errc is None:
+            if blocks and self.run_block():
+                continue
             ret_fsm = self.handle_fsm()
             if ret_fsm is not None:
                 break
+        if self.errc is not None and self.stop is None:
+            self.stop = Stop.Error
+        if self._core._haltSkipped != 0:
+            return self.errc, "Active Cycles: {} Halted Cycles: {} ({} skipped) Time Elapsed: {} s".format(self._core._cycle,self._core._haltCycles,self._core._haltSkipped, str(time.time() - self.tstart)[:10])
         if self._core._haltCycles != 0:
             return self.errc, "Active Cycles: {} Halted Cycles: {} Time Elapsed: {} s".format(self._core._cycle,self._core._haltCycles, str(time.time() - self.tstart)[:10])
         return self.errc, "Cycles Elapsed: {} Time Elapsed: {} s".format(self._core._cycle, str(time.time() - self.tstart)[:10])
     
     def step(self):
         self.pre_step()
+        if self._history is not None:
+            self._history.tick()
         self.handle_fsm(False)
+        if self.errc is not None and self.stop is None:
+            self.stop = Stop.Error
         return self.errc
   
+class TraceWriter(object):
+    '''
+    Streams a TRACE_RECORD per cycle to a binary trace file through a
+    buffered writer. While attached, the registers and DRAM append their
+    writes to _regw and _memw; a record keeps the first two register
+    writes and the last DRAM write of its cycle.
+    '''
+    def __init__(self, path, mnems, buffering = 1 << 20):
+        self._f = open(path, "wb", buffering = buffering)
+        names = ",".join(mnems).encode()
+        self._f.write(TRACE_HEAD.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD.size, len(names)) + names)
+        self._ins = {mnem: i for i, mnem in enumerate(mnems)}
+        self._regw = []
+        self._memw = []
+        self.path = path
+        self.count = 0
+    def attach(self, core):
+        core._regs._watch = self._regw
+        core._dram._watch = self._memw
+    def detach(self, core):
+        core._regs._watch = None
+        core._dram._watch = None
+    def record(self, h, cyc, end = False):
+        core = h._core
+        flags = core._srgs._SR._stat & 0xF
+        reg = val = val2 = addr = mem = 0
+        reg2 = 0xFF
+        if self._regw:
+            reg, val = self._regw[0]
+            if len(self._regw) > 1:
+                reg2, val2 = self._regw[1]
+            flags |= TRACE_REG
+            del self._regw[:]
+        if self._memw:
+            addr, mem = self._memw[-1]
+            flags |= TRACE_MEM
+            del self._memw[:]
+        if core._pState._get_() == "Halt":
+            flags |= TRACE_HALT
+        if end:
+            flags |= TRACE_END
+        op = core._op
+        ins = self._ins.get(op._instr._mnem, 255) if op is not None else 255
+        self._f.write(TRACE_RECORD.pack(cyc, h.curpc, addr, val, val2, mem,
+            h.progword & 0xFF, ins, reg, reg2, flags))
+        self.count += 1
+    def close(self):
+        self._f.close()
+
+class Profile(object):
+    '''
+    Per PC: instructions started there and the cycles they took, ISE wait
+    and halted cycles among them, counted while attached to a Handler.
+    Every cycle counts at the PC its instruction started at, _at. Blocks
+    count each of their instructions with its length in cycles.
+    '''
+    def __init__(self, size):
+        self.cycles = array('Q', [0]*size)
+        self.waits = array('Q', [0]*size)
+        self.halts = array('Q', [0]*size)
+        self.instrs = array('Q', [0]*size)
+        self._at = 0
+    def clear(self):
+        for a in (self.cycles, self.waits, self.halts, self.instrs):
+            a[:] = array('Q', [0]*len(a))
+    def start(self, pc):
+        self._at = pc
+        self.instrs[pc] += 1
+    def cycle(self, wait):
+        self.cycles[self._at] += 1
+        if wait:
+            self.waits[self._at] += 1
+    def halt(self, n):
+        self.cycles[self._at] += n
+        self.halts[self._at] += n
+    def block(self, blk):
+        pcs = blk._pcs
+        for i, pc in enumerate(pcs):
+            self.instrs[pc] += 1
+            self.cycles[pc] += (pcs[i+1] if i + 1 < len(pcs) else blk._end) - pc
+    def save(self, n):
+        '''
+        Copy of the counts of PCs below n, for load().
+        '''
+        return tuple(a[:n] for a in (self.cycles, self.waits, self.halts, self.instrs)) + (self._at,)
+    def load(self, saved):
+        self.clear()
+        for a, b in zip((self.cycles, self.waits, self.halts, self.instrs), saved):
+            a[:len(b)] = b
+        self._at = saved[-1]
+    def pcs(self):
+        '''
+        PCs with any cycles, in order.
+        '''
+        return [pc for pc, c in enumerate(self.cycles) if c]
+
+class CallGraph(object):
+    '''
+    Shadow call stack kept from jsr/ret, interrupt entries and rti while
+    attached, and the cycles spent under each stack. A stack is a tuple
+    of the entry PCs of its frames, from the root (the PC counting
+    started at) down; interrupt frames are their PC + _intr. stacks maps
+    a stack to the cycles its top frame ran, entered to how often it was
+    entered. A ret or rti with no frame to leave is not counted.
+    '''
+    def __init__(self, size, root = 0, at = 0):
+        self._intr = size
+        self.clear(root, at)
+    def clear(self, root = 0, at = 0):
+        self.stacks = {}
+        self.entered = {}
+        self._path = (root,)
+        self._since = at
+    def save(self):
+        return dict(self.stacks), dict(self.entered), self._path, self._since
+    def load(self, saved):
+        stacks, entered, self._path, self._since = saved
+        self.stacks = dict(stacks)
+        self.entered = dict(entered)
+    def attach(self, h):
+        h._calls = h._ins._opc1._calls = h._ins._gen1._calls = self
+    def detach(self, h):
+        h._calls = h._ins._opc1._calls = h._ins._gen1._calls = None
+    def settle(self, at):
+        '''
+        Charges the cycles up to cycle at to the current stack.
+        '''
+        if at > self._since:
+            self.stacks[self._path] = self.stacks.get(self._path, 0) + at - self._since
+        self._since = at
+    def enter(self, frame, at):
+        self.settle(at)
+        self._path += (frame,)
+        self.entered[self._path] = self.entered.get(self._path, 0) + 1
+    def call(self, pc, at):
+        self.enter(pc, at)
+    def interrupt(self, pc, at):
+        self.enter(pc + self._intr, at)
+    def ret(self, at):
+        if len(self._path) > 1 and self._path[-1] < self._intr:
+            self.settle(at)
+            self._path = self._path[:-1]
+    def rti(self, at):
+        # leaves the innermost interrupt and whatever it did not return from
+        i = len(self._path) - 1
+        while i > 0 and self._path[i] < self._intr:
+            i -= 1
+        if i > 0:
+            self.settle(at)
+            self._path = self._path[:i]
+    def block(self, h, blk):
+        '''
+        A block can only end in a call or return, its cycles go before it.
+        '''
+        mnem = h._ins.fetch(blk._pcs[-1])._op._instr._mnem
+        if mnem == "jsr":
+            self.call(h._srgs._PC._pc, h._core._cycle + h._core._haltCycles)
+        elif mnem == "ret":
+            self.ret(h._core._cycle + h._core._haltCycles)
+
+class MemAccess(object):
+    '''
+    Reads and writes per DRAM address, counted by Memory.read and write
+    while attached to a core: lxb/sxb, psh/pop and the stack words of
+    jsr/ret and str/lsr. Bulk loads (data files, inputs) are not counted.
+    '''
+    def __init__(self, size):
+        self.reads = array('Q', bytes(8*size))
+        self.writes = array('Q', bytes(8*size))
+    def clear(self):
+        for a in (self.reads, self.writes):
+            a[:] = array('Q', bytes(8*len(a)))
+    def save(self):
+        # mostly zeros, compressed to a few hundred bytes
+        return zlib.compress(self.reads.tobytes() + self.writes.tobytes(), 1)
+    def load(self, saved):
+        raw = zlib.decompress(saved)
+        n = len(raw) // 2
+        self.reads[:] = array('Q', raw[:n])
+        self.writes[:] = array('Q', raw[n:])
+    def attach(self, core):
+        core._dram._reads = self.reads
+        core._dram._writes = self.writes
+    def detach(self, core):
+        core._dram._reads = None
+        core._dram._writes = None
+    def touched(self):
+        '''
+        Addresses read or written, in order.
+        '''
+        return [addr for addr, (r, w) in enumerate(zip(self.reads, self.writes)) if r or w]
+
+class History(object):
+    '''
+    Checkpoints of a HOKSTER taken every _every cycles as it runs or steps,
+    to go back in time: rewind(cyc) restores the last checkpoint at or
+    before cyc and replays from there. A checkpoint holds the packed plain
+    state and DRAM as 256 word pages, shared with the checkpoint before
+    where they did not change. Past _keep checkpoints every other one is
+    dropped and the interval doubles, so memory stays bounded.
+    Breakpoints, break on instruction and the meta settings are not part
+    of the past; pending interrupts are, and so are the counts of the
+    profiler, call graph and DRAM access counters kept at the time.
+    '''
+    _page = 256
+    def __init__(self, hokster, every = 4096, keep = 256):
+        self._hk = hokster
+        self._every = every
+        self._keep = keep
+        self._cps = []
+        self._next = 0
+    def now(self):
+        core = self._hk.core
+        return core._cycle + core._haltCycles
+    def clear(self):
+        self._cps = []
+        self._next = 0
+    def tick(self):
+        if self.now() >= self._next:
+            self.record()
+    def record(self):
+        '''
+        Takes a checkpoint now, replacing any at or after this cycle.
+        '''
+        hk = self._hk
+        cyc = self.now()
+        while self._cps and self._cps[-1][0] >= cyc:
+            self._cps.pop()
+        meta = hk.meta
+        state = {name: plain_state(obj, skip) for name, obj, skip in hk._parts() if name != "meta"}
+        state["meta"] = {"_interrupts" : meta._interrupts, "_cycinterr" : meta._cycinterr, "_highest" : meta._highest}
+        state["decoded"] = hk._h.decoded._word if hk._h.decoded is not None else None
+        blob = bytearray()
+        pack_state(state, blob)
+        mem = hk.core._dram.view()
+        n = self._page
+        pages = [bytes(mem[i:i+n]) for i in range(0, len(mem), n)]
+        if self._cps:
+            prev = self._cps[-1][2]
+            pages = [old if old == new else new for old, new in zip(prev, pages)]
+        self._cps.append((cyc, bytes(blob), tuple(pages), self.counts()))
+        if len(self._cps) > self._keep:
+            self._cps = self._cps[::2]
+            self._every *= 2
+        self._next = cyc + self._every
+    def counts(self):
+        '''
+        (profile, call graph, access) counts saved with a checkpoint, None
+        for the ones not kept.
+        '''
+        hk = self._hk
+        return (hk.profiler.save(hk._h._maxpc + 1) if hk.profiler is not None else None,
+            hk.calls.save() if hk.calls is not None else None,
+            hk.access.save() if hk.access is not None else None)
+    def restore(self, i):
+        hk = self._hk
+        cyc, blob, pages, counts = self._cps[i]
+        state, end = unpack_state(blob)
+        hk.core._dram.view()[:] = b"".join(pages)
+        for name, obj, skip in hk._parts():
+            if name in state:
+                set_state(obj, state[name])
+        hk._relink(state["decoded"])
+        hk._h.pre_step()
+        # counts started after the checkpoint start over from it
+        for kept, saved in zip((hk.profiler, hk.calls, hk.access), counts):
+            if kept is not None and saved is not None:
+                kept.load(saved)
+        hk._restart_counts(*(saved is None for saved in counts))
+    def replay(self, cyc, watch = None):
+        '''
+        Steps on to the start of cycle cyc, quietly and untraced. Counts
+        kept go on from the checkpoint as they did the first time.
+        watch, if given, is called before every step.
+        '''
+        h = self._hk._h
+        meta = self._hk.meta
+        quiet, trace, tracer = meta._quiet, meta._trace, h._tracer
+        meta._quiet, meta._trace, h._tracer = True, False, None
+        # restore() left verbose as the settings have it
+        h.set_verbose(False)
+        if tracer is not None:
+            tracer.detach(self._hk.core)
+        try:
+            while self.now() < cyc:
+                if watch is not None:
+                    watch()
+                if h.handle_fsm(False) is not None:
+                    break
+        finally:
+            meta._quiet, meta._trace, h._tracer = quiet, trace, tracer
+            h.set_verbose(False)
+            if tracer is not None:
+                tracer.attach(self._hk.core)
+    def rewind(self, cyc):
+        '''
+        Puts the HOKSTER back in its state at the start of cycle cyc.
+        Later checkpoints are dropped. Returns None, or an error string.
+        '''
+        if not self._cps:
+            return "Error: No history to go back in."
+        if cyc > self.now():
+            return "Error: Cycle {} is not in the past.".format(cyc)
+        if cyc < self._cps[0][0]:
+            return "Error: Cycle {} is before the oldest checkpoint at {}.".format(cyc, self._cps[0][0])
+        i = len(self._cps) - 1
+        while self._cps[i][0] > cyc:
+            i -= 1
+        del self._cps[i+1:]
+        self.restore(i)
+        self._next = self._cps[i][0] + self._every
+        self.replay(cyc)
+        return None
+    def previous_break(self):
+        '''
+        Goes back to the last cycle before now at which the PC arrived at a
+        breakpoint and returns it. Without one it goes back to the oldest
+        checkpoint and returns None.
+        '''
+        if not self._cps:
+            return None
+        h = self._hk._h
+        pcr = self._hk.core._srgs._PC
+        now = self.now()
+        for i in range(len(self._cps) - 1, -1, -1):
+            end = self._cps[i+1][0] if i + 1 < len(self._cps) else now
+            hits = []
+            last = [None]
+            def watch():
+                pc = pcr._pc
+                if h._bpflag[pc] and pc != last[0] and self.now() < now:
+                    hits.append(self.now())
+                last[0] = pc
+            self.restore(i)
+            self.replay(end, watch)
+            if hits:
+                self.rewind(hits[-1])
+                return hits[-1]
+        self.rewind(self._cps[0][0])
+        return None
+
 class HOKSTER(object):
-    def __init__(self, p_Size = 2**12, p_Width = 12, d_Size = 2**16, dword_Width = 8, daddr_Width = 16):
+    def __init__(self, p_Size = 2**12, p_Width = 12, d_Size = 2**16, dword_Width = 8, daddr_Width = 16, quiet = False, engine = "fsm",
+            max_cycles = None, max_instructions = None, max_wall_seconds = None, policy = "ask"):
         self._ps = p_Size
         self._pw = p_Width
         self._ds = d_Size
         self._dww = dword_Width
         self._daw = daddr_Width
         self.meta = self.Meta()
+        self.meta.quiet(quiet)
+        self.meta.engine(engine)
+        self.meta.limits(max_cycles, max_instructions, max_wall_seconds, policy)
         self.core = self.Core(self.meta, self._ps, self._pw, self._ds, self._dww, self._daw)
         self._h = Handler(self.core, self.meta)
+        self._snap = None
+        self.history = None
+        self.tracer = None
+        self.profiler = None
+        self.calls = None
+        self.access = None
     def reset(self):
         self.meta.reset()
         self.core = self.Core(self.meta, self._ps, self._pw, self._ds, self._dww, self._daw)
         self._h = Handler(self.core, self.meta)
+        self._h._history = self.history
+        if self.history is not None:
+            self.history.clear()
+        self._h._tracer = self.tracer
+        if self.tracer is not None:
+            self.tracer.attach(self.core)
+        self._h._profile = self.profiler
+        if self.profiler is not None:
+            self.profiler.clear()
+        if self.calls is not None:
+            self.calls.clear()
+            self.calls.attach(self._h)
+        if self.access is not None:
+            self.access.clear()
+            self.access.attach(self.core)
+    def record_history(self, every = 4096, keep = 256):
+        '''
+        Keeps a History of checkpoints every cycles apart as this HOKSTER
+        runs or steps, at most keep of them; every = 0 stops keeping one.
+        '''
+        self.history = History(self, every, keep) if every else None
+        self._h._history = self.history
+    def trace_to(self, path = None):
+        '''
+        Writes a binary trace of every fsm cycle to path, read it back with
+        hoksterTrace. Runs fall back to the fsm while tracing. path = None
+        stops and closes the trace. Returns None, or an error string.
+        '''
+        if self.tracer is not None:
+            self.tracer.detach(self.core)
+            self.tracer.close()
+            self.tracer = None
+        if path is not None:
+            mnems = []
+            for hndl, name, op in self._h._ins.ops():
+                if name not in mnems:
+                    mnems.append(name)
+            try:
+                self.tracer = TraceWriter(path, mnems)
+            except IOError as er:
+                return "Error: Trace file \"{}\" could not be opened: {}".format(path, er)
+            self.tracer.attach(self.core)
+        self._h._tracer = self.tracer
+        return None
+    def profile(self, on = True):
+        '''
+        Counts cycles per PC in self.profiler from now on, see Profile and
+        hoksterProf for the report; reset() starts the counts over.
+        on = False stops.
+        '''
+        self.profiler = Profile(2**self.core._srgs._PC._pcBits) if on else None
+        self._h._profile = self.profiler
+    def call_graph(self, on = True):
+        '''
+        Keeps a CallGraph of the subroutines and interrupts run from here
+        on in self.calls, rooted at the current PC; see hoksterProf for the
+        report and flame graph stacks. reset() starts it over. on = False
+        stops.
+        '''
+        if self.calls is not None:
+            self.calls.detach(self._h)
+            self.calls = None
+        if on:
+            self.calls = CallGraph(2**self.core._srgs._PC._pcBits, self.core._srgs._PC._pc, self.core._cycle + self.core._haltCycles)
+            self.calls.attach(self._h)
+    def _restart_counts(self, profile = True, calls = True, access = True):
+        '''
+        Starts the chosen counts kept over from the current state, the
+        call graph rooted at the current PC.
+        '''
+        if profile and self.profiler is not None:
+            self.profiler.clear()
+        if calls and self.calls is not None:
+            self.calls.clear(self.core._srgs._PC._pc, self.core._cycle + self.core._haltCycles)
+        if access and self.access is not None:
+            self.access.clear()
+    def count_access(self, on = True):
+        '''
+        Counts reads and writes per DRAM address in self.access from now
+        on, see MemAccess and hoksterMem for the report and heatmap. Runs
+        fall back to the fsm while counting; reset() starts the counts
+        over. on = False stops.
+        '''
+        if self.access is not None:
+            self.access.detach(self.core)
+            self.access = None
+        if on:
+            self.access = MemAccess(len(self.core._dram._mem))
+            self.access.attach(self.core)
+    def snapshot(self):
+        '''
+        Keeps the loaded PRAM (decoded) and a copy of DRAM for restore().
+        '''
+        self._snap = (self.core._pram, self._h._maxpc, self.core._dram._mem[:], self.meta._highest)
+    def restore(self):
+        '''
+        reset() back to the snapshot with bulk copies, without parsing or
+        decoding the program again.
+        '''
+        if self._snap is None:
+            return "Error: No snapshot to restore."
+        pram, maxpc, mem, highest = self._snap
+        self.reset()
+        self._h.pram_copy(pram, maxpc)
+        self.core._dram._mem[:] = mem
+        self.meta._highest = highest
+        return None
+    def fork(self):
+        '''
+        New HOKSTER in exactly this one's state, to branch experiments off one
+        prefix of execution. DRAM is copied in one go, the PRAM with its
+        decoded entries is adopted and the small register state is copied.
+        '''
+        child = HOKSTER(self._ps, self._pw, self._ds, self._dww, self._daw)
+        child._snap = self._snap
+        for (name, src, skip), (cname, dst, cskip) in zip(self._parts(), child._parts()):
+            copy_state(src, dst, skip)
+        child.core._dram._mem[:] = self.core._dram._mem
+        child._h.pram_copy(self.core._pram, self._h._maxpc)
+        child._relink(self._h.decoded._word if self._h.decoded is not None else None)
+        return child
+    def _parts(self):
+        '''
+        (name, object, skip) of every object holding machine state, for
+        fork() and checkpoints. Tables rebuilt from meta on the next run or
+        step (breakpoint flags, the interrupt schedule) are skipped.
+        '''
+        core = self.core
+        srgs = core._srgs
+        parts = [
+            ("meta", self.meta, ()),
+            ("occur", self.meta._occur, ()),
+            ("core", core, ()),
+            ("regs", core._regs, ("_watch",)),
+            ("ivects", core._iVects, ()),
+            ("pstate", core._pState, ()),
+            ("sbus", core._sbus, ()),
+            ("srgs", srgs, ()),
+            ("sp", srgs._SP, ()),
+            ("ie", srgs._IE, ()),
+            ("pc", srgs._PC, ()),
+            ("sr", srgs._SR, ()),
+            ("handler", self._h, ("state_map", "_bpflag", "_biflag", "_history", "_tracer", "_profile", "_calls")),
+            ("intr", self._h._intr, ("_heap", "_cyc", "_pcint", "_pckey", "_src")),
+        ]
+        for hndl, name, op in self._h._ins.ops():
+            parts.append(("{}.{}".format(hndl, name), op, ("_op",)))
+            if op._aluc and op._ise is not None:
+                parts.append(("{}.{}.ise".format(hndl, name), op._ise, ()))
+        return parts
+    def _relink(self, word):
+        '''
+        After its state was copied in: points the handler's decoded entry
+        (word, None for none), the current instruction and the ISE wait
+        requests at this HOKSTER's own objects, and rebuilds the skipped
+        tables.
+        '''
+        h = self._h
+        h.decoded = h._ins.entry(word) if word is not None else None
+        if h.op1 is not None:
+            instr = h._ins._opc1._instrs[h.op1]
+            self.core._instr, self.core._op = h._ins.lookup(h.op1, h.op2 if instr._cycles == -2 else None)
+        wait = self.core._srgs._wait
+        for name in wait:
+            wait[name] = h._ins._aluc._ops[name]._wait_req
+        h._intr._src = None
+        h._intr.schedule()
+        h.debug_sets()
+    def save_state(self, path):
+        '''
+        Writes the whole machine state to the checkpoint file path: DRAM,
+        PRAM, registers and shadows, PC/SR/SP/IE, ISE state machines,
+        pending interrupts, counters and the mid-instruction progress.
+        DRAM is stored raw at an mmap aligned offset.
+        Returns None, or an error string.
+        '''
+        state = {name: plain_state(obj, skip) for name, obj, skip in self._parts()}
+        state["decoded"] = self._h.decoded._word if self._h.decoded is not None else None
+        blob = bytearray()
+        try:
+            pack_state(state, blob)
+        except TypeError as er:
+            return "Error: {}".format(er)
+        dram = self.core._dram.view()
+        pram = self.core._pram.view(0, self._h._maxpc + 1)
+        doff = mmap.ALLOCATIONGRANULARITY
+        poff = doff + dram.nbytes
+        soff = poff + pram.nbytes
+        head = _chk_head.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, doff, dram.nbytes, poff, pram.nbytes, soff, len(blob))
+        try:
+            with open(path, "wb") as f:
+                f.write(head)
+                f.write(bytes(doff - len(head)))
+                f.write(dram)
+                f.write(pram)
+                f.write(blob)
+        except IOError as er:
+            return "Error: {}".format(er)
+        return None
+    def load_state(self, path):
+        '''
+        Puts this HOKSTER in the state save_state wrote to path. DRAM is
+        read straight into memory in one go. The snapshot restore() goes
+        back to is kept, the counts kept start over. Returns None, or an
+        error string.
+        '''
+        try:
+            with open(path, "rb") as f:
+                head = f.read(_chk_head.size)
+                if len(head) < _chk_head.size or head[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+                    return "Error: \"{}\" is not a HOKSTER checkpoint.".format(path)
+                magic, version, doff, dlen, poff, plen, soff, slen = _chk_head.unpack(head)
+                if version != CHECKPOINT_VERSION:
+                    return "Error: Checkpoint version {} of \"{}\" is not supported, expected {}.".format(version, path, CHECKPOINT_VERSION)
+                if dlen != self.core._dram.view().nbytes:
+                    return "Error: Checkpoint DRAM of {} bytes does not match this core's {}.".format(dlen, self.core._dram.view().nbytes)
+                f.seek(poff)
+                words = f.read(plen)
+                f.seek(soff)
+                state, end = unpack_state(memoryview(f.read(slen)))
+                pram = self.core._pram
+                maxpc = self._h._maxpc
+                self.reset()
+                if bytes(pram.view(0, maxpc + 1)) == words:
+                    self._h.pram_copy(pram, maxpc)
+                else:
+                    ret = self._h.pram_words(words, path)
+                    if "Error" in ret:
+                        return ret
+                f.seek(doff)
+                if f.readinto(self.core._dram.view()) != dlen:
+                    return "Error: Checkpoint \"{}\" is truncated.".format(path)
+        except (IOError, ValueError, KeyError, IndexError, struct.error) as er:
+            return "Error: Checkpoint \"{}\" could not be read: {}".format(path, er)
+        for name, obj, skip in self._parts():
+            if name in state:
+                set_state(obj, state[name])
+        self._relink(state.get("decoded"))
+        self._restart_counts()
+        return None
     class Meta(object):
         def __init__(self):
             self._occur = Occurrence()
@@ -2459,8 +3602,28 @@ class HOKSTER(object):
             self._timer = Timeout()
             self._highest = 0
             self._timeout = 30
+            # run limits, None for no limit
+            self._max_cycles = None
+            self._max_instructions = None
+            # on limits: ask (prompt on timeout), continue, stop or raise
+            self._policies = [
+                "ask",
+                "continue",
+                "stop",
+                "raise"
+            ]
+            self._policy = "ask"
             self._trace = False
             self._print = True
+            # quiet: no per-op messages at all, only results and counters
+            self._quiet = False
+            # fsm: every cycle through Handler.handle_fsm
+            # block: translated basic blocks, fsm where cycles are watched
+            self._engines = [
+                "fsm",
+                "block"
+            ]
+            self._engine = "fsm"
             self._num_pairs_shadowed = 2
             self._validtypes = [
                 "hex",
@@ -2481,10 +3644,32 @@ class HOKSTER(object):
                 self._timeout = seconds
             else:
                 return self._timeout
+        def limits(self, max_cycles = None, max_instructions = None, max_wall_seconds = None, policy = None):
+            '''
+            Sets the run limits given, 0 clears a cycle or instruction budget.
+            '''
+            if max_cycles is not None:
+                self._max_cycles = max_cycles or None
+            if max_instructions is not None:
+                self._max_instructions = max_instructions or None
+            if max_wall_seconds is not None:
+                self._timeout = max_wall_seconds
+            if policy in self._policies:
+                self._policy = policy
+        def quiet(self, on = None):
+            if on is not None:
+                self._quiet = bool(on)
+            else:
+                return self._quiet
+        def engine(self, name = None):
+            if name is None:
+                return self._engine
+            if name in self._engines:
+                self._engine = name
         def datatype(self, dtype):
             if dtype in self._validtypes:
                 self._datatype = dtype
-        def repr(self, bA : BitArray, dtype = None):
+        def repr(self, bA, dtype = None, width = 8):
             if dtype is not None:
                 self.datatype(dtype)
             if type(bA) is BitArray:
@@ -2498,11 +3683,25 @@ class HOKSTER(object):
                     return bA.bin
                 elif self._datatype == "oct":
                     return bA.oct
+            elif type(bA) is int:
+                # int words carry no length, width gives the bits to show
+                if self._datatype == "hex":
+                    return "{:0{}x}".format(bA, (width+3)//4)
+                elif self._datatype == "uint":
+                    return bA
+                elif self._datatype == "int":
+                    return bA - (bA >> (width-1) << width)
+                elif self._datatype == "bin":
+                    return "{:0{}b}".format(bA, width)
+                elif self._datatype == "oct":
+                    return "{:0{}o}".format(bA, (width+2)//3)
             else:
                 #pass
-                raise TypeError("{} is type {} but requires type BitArray.".format(bA, type(bA)))
+                raise TypeError("{} is type {} but requires type BitArray or int.".format(bA, type(bA)))
         def check_break(self, pc):
-            return pc.uint in self._breakpoints.keys()
+            if type(pc) is BitArray:
+                pc = pc.uint
+            return pc in self._breakpoints.keys()
     class Core(object):
         def __init__(self, meta, p_Size, p_Width, d_Size, dword_Width, daddr_Width):
             # Reference to meta
@@ -2516,7 +3715,7 @@ class HOKSTER(object):
             # Data RAM instance
             self._dram = Memory(d_Size, dword_Width, daddr_Width)
             # Program RAM instance
-            self._pram = Memory(p_Size,dword_Width, p_Width)
+            self._pram = ProgMemory(p_Size,dword_Width, p_Width)
             # System Bus instance
             self._sbus = System()
             # Special Registers instance
@@ -2525,11 +3724,95 @@ class HOKSTER(object):
             self._op = Operation(self._instr, meta)
             self._cycle = 0
             self._haltCycles = 0
+            # halted cycles jumped over by Handler.skip_halt
+            self._haltSkipped = 0
             self._args = []
             # Handler for operations, program execution
         def clearOp(self):
             self._instr = Instruction("None", None, -1)
             self._op = Operation(self._instr, self._meta)
 
+class SimResult(object):
+    '''
+    Outcome of simulate(): why the run stopped (stop, a Stop, and the errc
+    text), the counters and the final registers, plus the DRAM ranges asked
+    for as bytes keyed by (start, end).
+    '''
+    def __init__(self, h, ranges = ()):
+        core = h.core
+        self.stop = h._h.stop
+        self.errc = h._h.errc
+        self.cycles = core._cycle
+        self.halt_cycles = core._haltCycles
+        self.instructions = h.meta._occur.count
+        self.occ = dict(h.meta._occur.occ)
+        self.pc = core._srgs._PC._pc
+        self.sp = core._srgs._SP._sp
+        self.sr = core._srgs._SR._stat
+        self.ie = core._srgs._IE._ie
+        self.regs = list(core._regs._reg)
+        self.dram = {(start, end): bytes(core._dram.view(start, end)) for start, end in ranges}
+    def __repr__(self):
+        return "SimResult(stop={}, cycles={}, halt_cycles={}, instructions={})".format(self.stop.name if self.stop is not None else None, self.cycles, self.halt_cycles, self.instructions)
+
+def _words(h, src):
+    # raw words as bytes, else hex lines in a list or a file at path src
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return bytes(src), "<bytes>"
+    if isinstance(src, (list, tuple)):
+        return h._h.hex_words(src), "<lines>"
+    with open(src) as f:
+        return h._h.hex_words(f.readlines()), str(src)
+
+def load_program(h, prog, data = None):
+    '''
+    Loads prog and data into HOKSTER h, each raw words as bytes, hex lines,
+    or the path of a _prog.hex/_data.hex file. Raises ValueError if either
+    does not load.
+    '''
+    words, fn = _words(h, prog)
+    ret = h._h.pram_words(words, fn)
+    if "Error" in ret:
+        raise ValueError(ret)
+    if data is not None:
+        words, fn = _words(h, data)
+        ret = h._h.data_words(words, fn)
+        if "Error" in ret:
+            raise ValueError(ret)
 
+def run_loaded(h, max_cycles = None, inputs = None, ranges = (), max_instructions = None, max_wall_seconds = None,
+        engine = "block", interrupts = None, cycinterr = None):
+    '''
+    The run half of simulate(), on a HOKSTER h that already holds its
+    program, e.g. one just restore()d to its snapshot.
+    '''
+    h.meta.quiet(True)
+    h.meta.engine(engine)
+    h.meta._print = False
+    h.meta._trace = False
+    h.meta._policy = "stop"
+    for addr, val in (inputs or {}).items():
+        h.core._dram.load(addr, val)
+    h.meta._interrupts = dict(interrupts or {})
+    h.meta._cycinterr = dict(cycinterr or {})
+    if max_wall_seconds is None:
+        # not meta's, that is the REPL's 30 s
+        max_wall_seconds = float("inf")
+    h._h.run(max_cycles, max_instructions, max_wall_seconds)
+    return SimResult(h, ranges)
 
+def simulate(prog, data = None, max_cycles = None, inputs = None, ranges = (), max_instructions = None, max_wall_seconds = None,
+        engine = "block", interrupts = None, cycinterr = None):
+    '''
+    Runs a program headless and returns a SimResult. prog and data are raw
+    words as bytes, hex lines, or the path of a _prog.hex/_data.hex file.
+    inputs maps DRAM addresses to bytes written before the run, ranges
+    lists the (start, end) DRAM slices to return. interrupts and cycinterr
+    map a PC or a cycle to an int iv as the REPL's intr and intrc do.
+    Limits stop the run, they never prompt. There is no wall clock limit
+    unless max_wall_seconds is given.
+    Raises ValueError if prog or data do not load.
+    '''
+    h = HOKSTER(quiet = True)
+    load_program(h, prog, data)
+    return run_loaded(h, max_cycles, inputs, ranges, max_instructions, max_wall_seconds, engine, interrupts, cycinterr)
@@ -0,0 +1,163 @@
+'''
+hoksterMem: how much of its DRAM a HOKSTER program uses, and where.
+
+HOKSTER.count_access() counts reads and writes per DRAM address: ldb/lpb,
+stb/spb, psh/pop and the stack words of jsr/ret and str/lsr. From the
+counts this reports the working set (addresses touched, the highest one
+and the smallest DRAM, a power of two as d_Size, holding it), totals per
+region, by default every 256 byte page touched, and the addresses
+accessed most. A high reads per write count there points at loads that
+could stay in a register. heatmap() writes the counts as 256x256 (a row
+per page, a column per low address byte), as CSV or as a PGM image.
+
+    python hoksterMem.py X_prog.hex [-d X_data.hex] [-n 10] [-r 0000:000f:state ...] [-m X_Heat.csv] [-k all]
+
+From Python:
+
+    h.count_access()
+    h._h.run()
+    print(hoksterMem.report(h))
+    hoksterMem.heatmap(h.access, "X_Heat.pgm")
+'''
+import os
+import sys
+import math
+import argparse
+import hoksterCore
+
+KINDS = ("all", "reads", "writes")
+
+def counts(acc, kind = "all"):
+    '''
+    Per address counts of kind: "reads", "writes" or "all" for both.
+    '''
+    if kind == "reads":
+        return acc.reads
+    if kind == "writes":
+        return acc.writes
+    return [r + w for r, w in zip(acc.reads, acc.writes)]
+
+def working_set(acc):
+    '''
+    (touched, lowest, highest, d_size): addresses read or written, the
+    lowest and highest of them and the smallest power of two DRAM size
+    holding the highest. lowest and highest are None if none was touched.
+    '''
+    touched = acc.touched()
+    if not touched:
+        return 0, None, None, 0
+    return len(touched), touched[0], touched[-1], 2**math.ceil(math.log2(touched[-1] + 1))
+
+def parse_region(text):
+    '''
+    (start, end, name) from "start:end[:name]", start and end hex and
+    included. Raises ValueError.
+    '''
+    parts = text.split(":", 2)
+    if len(parts) < 2:
+        raise ValueError("Region \"{}\" is not start:end[:name].".format(text))
+    start, end = int(parts[0], 16), int(parts[1], 16)
+    if end < start:
+        raise ValueError("Region \"{}\" ends before it starts.".format(text))
+    return start, end, parts[2] if len(parts) > 2 else "{:04x}-{:04x}".format(start, end)
+
+def pages(acc):
+    '''
+    (start, end, name) of every 256 byte page with an access.
+    '''
+    spans = []
+    for addr in acc.touched():
+        if not spans or spans[-1][0] != addr & ~0xFF:
+            start = addr & ~0xFF
+            spans.append((start, start + 0xFF, "page {:02x}".format(start >> 8)))
+    return spans
+
+def regions(acc, spans = None):
+    '''
+    (name, start, end, reads, writes, touched) per region of spans, a
+    list of (start, end, name) with end included, the pages touched if
+    None.
+    '''
+    if spans is None:
+        spans = pages(acc)
+    rows = []
+    for start, end, name in spans:
+        reads = acc.reads[start:end+1]
+        writes = acc.writes[start:end+1]
+        rows.append((name, start, end, sum(reads), sum(writes), sum(1 for r, w in zip(reads, writes) if r or w)))
+    return rows
+
+def top(acc, n = 10):
+    '''
+    (address, reads, writes) of the n addresses accessed most.
+    '''
+    ranked = sorted(acc.touched(), key = lambda a: (-(acc.reads[a] + acc.writes[a]), a))
+    return [(a, acc.reads[a], acc.writes[a]) for a in ranked[:n]]
+
+def report(hk, spans = None, n = 10):
+    '''
+    Text report of hk's DRAM accesses: the working set, totals per region
+    and the n addresses accessed most.
+    '''
+    acc = hk.access
+    touched, lo, hi, dsize = working_set(acc)
+    reads, writes = sum(acc.reads), sum(acc.writes)
+    out = ["DRAM: {} reads, {} writes, {} of {} addresses touched".format(reads, writes, touched, len(acc.reads))]
+    if touched:
+        out.append("Working set {:04x}-{:04x}, fits a DRAM of {} words ({} address bits).".format(lo, hi, dsize, int(math.log2(dsize))))
+    out += ["", "By region:", "  {:<16} {:>9} {:>10} {:>10} {:>8}".format("region", "span", "reads", "writes", "touched")]
+    for name, start, end, r, w, t in regions(acc, spans):
+        out.append("  {:<16} {:04x}-{:04x} {:>10} {:>10} {:>8}".format(name, start, end, r, w, t))
+    out += ["", "Most accessed:", "  {:>4} {:>10} {:>10} {:>11}".format("addr", "reads", "writes", "reads/write")]
+    for a, r, w in top(acc, n):
+        out.append("  {:04x} {:>10} {:>10} {:>11}".format(a, r, w, "{:.1f}".format(r / w) if w else "-"))
+    return "\n".join(out)
+
+def heatmap(acc, path, kind = "all"):
+    '''
+    Writes the counts of kind as a grid of 256 per row, one row per page:
+    as a binary PGM image, log scaled, if path ends in .pgm, else as CSV.
+    '''
+    cnt = counts(acc, kind)
+    rows = len(cnt) // 256
+    if path.lower().endswith(".pgm"):
+        peak = math.log1p(max(cnt)) or 1.0
+        pixels = bytes(int(255 * math.log1p(c) / peak) for c in cnt[:rows*256])
+        with open(path, "wb") as f:
+            f.write("P5\n256 {}\n255\n".format(rows).encode())
+            f.write(pixels)
+        return
+    with open(path, "w") as f:
+        for row in range(rows):
+            f.write(",".join(str(c) for c in cnt[row*256:(row+1)*256]) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='Report how a HOKSTER program uses its DRAM: working set, regions and a heatmap.')
+    parser.add_argument('prog', type=str, help='_prog.hex file')
+    parser.add_argument('--data', '-d', type=str, help='_data.hex file, default the one next to prog', default=None, required=False)
+    parser.add_argument('--top', '-n', type=int, help='addresses to list, default 10', default=10, required=False)
+    parser.add_argument('--region', '-r', type=str, action='append', help='start:end[:name] in hex, end included, repeatable; default every page touched', default=None, required=False)
+    parser.add_argument('--max-cycles', '-c', type=int, help='cycle limit', default=None, required=False)
+    parser.add_argument('--heatmap', '-m', type=str, help='heatmap file to write, .pgm for an image, CSV otherwise', default=None, required=False)
+    parser.add_argument('--kind', '-k', type=str, help='accesses in the heatmap, default all', default='all', choices=KINDS, required=False)
+    args = parser.parse_args()
+    data = args.data
+    if data is None:
+        dsource = args.prog.replace("_prog", "_data")
+        data = dsource if dsource != args.prog and os.path.exists(dsource) else None
+    try:
+        spans = [parse_region(r) for r in args.region] if args.region is not None else None
+        h = hoksterCore.HOKSTER(quiet = True)
+        hoksterCore.load_program(h, args.prog, data)
+    except (IOError, ValueError) as er:
+        print("Error: {}".format(er), file=sys.stderr)
+        sys.exit(1)
+    h.count_access()
+    r = hoksterCore.run_loaded(h, max_cycles = args.max_cycles, engine = "fsm")
+    print("{} after {} cycles.".format(r.errc, r.cycles + r.halt_cycles))
+    print(report(h, spans, args.top))
+    if args.heatmap is not None:
+        heatmap(h.access, args.heatmap, args.kind)
+
+if __name__ == '__main__':
+    main()
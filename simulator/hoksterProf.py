@@ -0,0 +1,268 @@
+'''
+hoksterProf: where the cycles of a HOKSTER run go.
+
+HOKSTER.profile() counts cycles, ISE wait cycles, halted cycles and
+instructions started per PC. With the program's assembly source, parsed
+by hoksterAsm, the counts are summed per label (each PC counts towards
+the nearest label at or before it) and loops, a backward jmp or branch
+to a label, are ranked by cycles with their source lines.
+
+HOKSTER.call_graph() keeps a shadow call stack from jsr/ret and
+interrupts/rti. Each subroutine gets its calls, inclusive cycles (with
+everything it called) and exclusive cycles (its own code only), named by
+the label it was called at. folded() writes the stacks as collapsed
+stack lines, "main;round;mixColumns 1234", for flame graph tools.
+
+    python hoksterProf.py X_prog.hex [-d X_data.hex] [-s X.txt] [-e fsm] [-n 10] [-o X_Profile.txt] [-f X.folded]
+
+From Python:
+
+    h.profile()
+    h._h.run()
+    print(hoksterProf.report(h, hoksterProf.Symbols("X.txt")))
+    h.call_graph()
+    h._h.run()
+    hoksterProf.folded(h, "X.folded", hoksterProf.Symbols("X.txt"))
+'''
+import io
+import os
+import sys
+import bisect
+import argparse
+import contextlib
+import hoksterCore
+
+# jumps and branches whose label argument can close a loop
+BRANCHES = ("jmp", "bzi", "bni", "bci", "bxi")
+
+def assembler():
+    '''
+    hoksterAsm, from the assembler folder next to this one.
+    '''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assembler")
+    if path not in sys.path:
+        sys.path.append(path)
+    import hoksterAsm
+    return hoksterAsm
+
+def source_for(prog):
+    '''
+    The assembly source next to a _prog.hex, None if there is none.
+    '''
+    src = prog[:-len("_prog.hex")] + ".txt" if prog.endswith("_prog.hex") else None
+    return src if src is not None and os.path.exists(src) else None
+
+class Symbols(object):
+    '''
+    Labels, source lines and loops of an assembly file by PC. labels is a
+    sorted list of (pc, name), lines maps the PC of each instruction to
+    (line number, text) and loops lists (start, end, label) for every
+    backward jump or branch, end being the PC after it. Raises ValueError
+    if the source does not assemble.
+    '''
+    def __init__(self, path):
+        asm = assembler()
+        ref = asm.HoksterRef
+        # HoksterRef keeps its tables on the class, shared by every parse
+        ref.labels.clear()
+        ref.constants.clear()
+        ref.data.clear()
+        parser = asm.HoksterParser()
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser.parse_file(path)
+        if parser.has_errors:
+            raise ValueError("\"{}\" does not assemble.".format(path))
+        self.path = path
+        named = {name: int(pc, 16) for name, pc in ref.labels.items()}
+        self.labels = sorted((pc, name) for name, pc in named.items())
+        self._starts = [pc for pc, name in self.labels]
+        self.lines = {}
+        self.loops = []
+        for ins in parser.instructions:
+            if not ins.is_instr:
+                continue
+            self.lines[ins.PC] = (ins.line_num, ins.unparsed)
+            args = ins.instr_list
+            if args[0] in BRANCHES and len(args) > 1 and args[1] in named and named[args[1]] <= ins.PC:
+                self.loops.append((named[args[1]], ins.get_next_PC(), args[1]))
+    def label(self, pc):
+        '''
+        (name, offset) of the nearest label at or before pc, (None, pc)
+        before the first one.
+        '''
+        i = bisect.bisect_right(self._starts, pc) - 1
+        if i < 0:
+            return None, pc
+        return self.labels[i][1], pc - self.labels[i][0]
+    def where(self, pc):
+        name, off = self.label(pc)
+        if name is None:
+            return "{:03x}".format(pc)
+        return name if off == 0 else "{}+{}".format(name, off)
+
+def totals(prof, start = 0, end = None):
+    '''
+    (cycles, waits, halts, instrs) summed over PCs start to end.
+    '''
+    return tuple(sum(a[start:end]) for a in (prof.cycles, prof.waits, prof.halts, prof.instrs))
+
+def by_label(prof, sym):
+    '''
+    (name, start, cycles, waits, halts, instrs) per label, most cycles first.
+    Code before the first label counts as "-".
+    '''
+    bounds = [0] + sym._starts + [len(prof.cycles)]
+    names = ["-"] + [name for pc, name in sym.labels]
+    rows = []
+    for i, name in enumerate(names):
+        if bounds[i] == bounds[i+1]:
+            continue
+        row = totals(prof, bounds[i], bounds[i+1])
+        if row[0]:
+            rows.append((name, bounds[i]) + row)
+    rows.sort(key = lambda r: -r[2])
+    return rows
+
+def hot_loops(prof, sym, n = 10):
+    '''
+    (cycles, start, end, label) of the n loops with the most cycles in
+    their body, nested ones counted in each loop around them.
+    '''
+    loops = {(start, end, name) for start, end, name in sym.loops}
+    ranked = sorted(((sum(prof.cycles[start:end]), start, end, name) for start, end, name in loops), reverse = True)
+    return [l for l in ranked if l[0]][:n]
+
+def graph(hk):
+    '''
+    hk's CallGraph with the cycles up to now charged.
+    '''
+    calls = hk.calls
+    calls.settle(hk.core._cycle + hk.core._haltCycles)
+    return calls
+
+def frame_name(calls, frame, sym = None):
+    '''
+    Label of a frame's entry PC, the PC in hex without Symbols; interrupt
+    frames get " [interrupt]" appended.
+    '''
+    pc = frame - calls._intr if frame >= calls._intr else frame
+    name = sym.where(pc) if sym is not None else "{:03x}".format(pc)
+    return name + " [interrupt]" if frame >= calls._intr else name
+
+def by_frame(calls):
+    '''
+    (frame, calls, inclusive, exclusive) per frame, most inclusive cycles
+    first. A frame that is on a stack more than once (recursion) counts
+    that stack's cycles once towards its inclusive cycles.
+    '''
+    entered = {}
+    incl = {}
+    excl = {}
+    for path, n in calls.entered.items():
+        entered[path[-1]] = entered.get(path[-1], 0) + n
+    for path, c in calls.stacks.items():
+        excl[path[-1]] = excl.get(path[-1], 0) + c
+        for frame in set(path):
+            incl[frame] = incl.get(frame, 0) + c
+    rows = [(frame, entered.get(frame, 0), c, excl.get(frame, 0)) for frame, c in incl.items()]
+    rows.sort(key = lambda r: (-r[2], r[0]))
+    return rows
+
+def folded(hk, path, sym = None):
+    '''
+    Writes hk's call stacks to path as collapsed stack lines, frames from
+    the root down separated by ";" and the cycles of the top frame.
+    '''
+    calls = graph(hk)
+    with open(path, "w") as f:
+        for stack, c in sorted(calls.stacks.items()):
+            if c:
+                f.write("{} {}\n".format(";".join(frame_name(calls, frame, sym) for frame in stack), c))
+
+def report(hk, sym = None, top = 10):
+    '''
+    Text report of hk's profile: totals, cycles per label, the hottest
+    loops with their source lines and the hottest instructions. Without
+    Symbols only the instructions are listed, by PC and mnemonic. With a
+    call graph kept, the [top] subroutines by inclusive cycles follow.
+    '''
+    prof = hk.profiler
+    cycles, waits, halts, instrs = totals(prof)
+    pct = lambda c: 100.0 * c / cycles if cycles else 0.0
+    out = ["Profile: {} cycles ({} ISE wait, {} halted), {} instructions".format(cycles, waits, halts, instrs)]
+    if sym is not None:
+        out += ["", "By label:", "  {:<16} {:>4} {:>10} {:>6} {:>9} {:>8} {:>8}".format("label", "pc", "cycles", "%", "instrs", "waits", "halts")]
+        for name, start, c, w, hl, i in by_label(prof, sym):
+            out.append("  {:<16} {:03x} {:>10} {:>6.2f} {:>9} {:>8} {:>8}".format(name, start, c, pct(c), i, w, hl))
+        out += ["", "Hottest loops:"]
+        for c, start, end, name in hot_loops(prof, sym, top):
+            out.append("  {} {:03x}-{:03x}: {} cycles, {:.2f}%, {} passes".format(name, start, end - 1, c, pct(c), prof.instrs[start]))
+            for pc in range(start, end):
+                if pc in sym.lines:
+                    line, text = sym.lines[pc]
+                    out.append("    {:>5} {:03x} {:>10} {:>9}  {}".format(line, pc, prof.cycles[pc], prof.instrs[pc], text))
+    out += ["", "Hottest instructions:", "  {:>4} {:<20} {:>10} {:>6} {:>9} {:>8}  {}".format("pc", "at", "cycles", "%", "instrs", "waits", "source")]
+    hot = sorted(prof.pcs(), key = lambda pc: -prof.cycles[pc])[:top]
+    for pc in hot:
+        if sym is not None and pc in sym.lines:
+            where = sym.where(pc)
+            src = "{}: {}".format(*sym.lines[pc])
+        else:
+            where = ""
+            src = hk._h._ins.get_mnem(pc)
+        out.append("  {:03x} {:<20} {:>10} {:>6.2f} {:>9} {:>8}  {}".format(pc, where, prof.cycles[pc], pct(prof.cycles[pc]), prof.instrs[pc], prof.waits[pc], src))
+    if hk.calls is not None:
+        calls = graph(hk)
+        out += ["", "Subroutines:", "  {:<28} {:>8} {:>10} {:>6} {:>10} {:>6}".format("called at", "calls", "inclusive", "%", "exclusive", "%")]
+        for frame, n, incl, excl in by_frame(calls)[:top]:
+            out.append("  {:<28} {:>8} {:>10} {:>6.2f} {:>10} {:>6.2f}".format(frame_name(calls, frame, sym), n, incl, pct(incl), excl, pct(excl)))
+    return "\n".join(out)
+
+def dump(hk, path, sym = None, top = 10):
+    '''
+    Writes report() to path, followed by every PC with cycles as CSV.
+    '''
+    prof = hk.profiler
+    with open(path, "w") as f:
+        f.write(report(hk, sym, top) + "\n\n")
+        f.write("pc,label,line,cycles,waits,halts,instrs\n")
+        for pc in prof.pcs():
+            line = sym.lines[pc][0] if sym is not None and pc in sym.lines else ""
+            f.write("{:03x},{},{},{},{},{},{}\n".format(pc, sym.where(pc) if sym is not None else "", line,
+                prof.cycles[pc], prof.waits[pc], prof.halts[pc], prof.instrs[pc]))
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile a HOKSTER program: cycles per PC, label, loop and subroutine.')
+    parser.add_argument('prog', type=str, help='_prog.hex file')
+    parser.add_argument('--data', '-d', type=str, help='_data.hex file, default the one next to prog', default=None, required=False)
+    parser.add_argument('--source', '-s', type=str, help='assembly source, default the .txt next to prog', default=None, required=False)
+    parser.add_argument('--engine', '-e', type=str, help='fsm or block, default block', default='block', choices=['fsm', 'block'], required=False)
+    parser.add_argument('--top', '-n', type=int, help='loops and instructions to list, default 10', default=10, required=False)
+    parser.add_argument('--max-cycles', '-c', type=int, help='cycle limit', default=None, required=False)
+    parser.add_argument('--output', '-o', type=str, help='dump file to write as well', default=None, required=False)
+    parser.add_argument('--folded', '-f', type=str, help='collapsed call stacks file for flame graphs to write as well', default=None, required=False)
+    args = parser.parse_args()
+    data = args.data
+    if data is None:
+        dsource = args.prog.replace("_prog", "_data")
+        data = dsource if dsource != args.prog and os.path.exists(dsource) else None
+    src = args.source if args.source is not None else source_for(args.prog)
+    try:
+        sym = Symbols(src) if src is not None else None
+        h = hoksterCore.HOKSTER(quiet = True)
+        hoksterCore.load_program(h, args.prog, data)
+    except (IOError, ValueError) as er:
+        print("Error: {}".format(er), file=sys.stderr)
+        sys.exit(1)
+    h.profile()
+    h.call_graph()
+    r = hoksterCore.run_loaded(h, max_cycles = args.max_cycles, engine = args.engine)
+    print("{} after {} cycles.".format(r.errc, r.cycles + r.halt_cycles))
+    print(report(h, sym, args.top))
+    if args.output is not None:
+        dump(h, args.output, sym, args.top)
+    if args.folded is not None:
+        folded(h, args.folded, sym)
+
+if __name__ == '__main__':
+    main()
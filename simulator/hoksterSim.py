@@ -1,19 +1,11 @@
 import sys
 import argparse
 import os
-try: 
-    import cmd2
-except ImportError:
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "cmd2"])
-    import cmd2
-try: 
-    from bitstring import BitArray
-except ImportError:
-    import subprocess
-    subprocess.check_call([sys.executable,"-m", "pip", "install", "bitstring"])
-    from bitstring import BitArray
+import cmd2
+from bitstring import BitArray
 import hoksterCore
+import hoksterProf
+import hoksterMem
 
 class SimLoop(cmd2.Cmd):
     def __init__(self, source = None):
@@ -32,6 +24,8 @@ class SimLoop(cmd2.Cmd):
         
         #* instantiating the core
         self.hokster = hoksterCore.HOKSTER()
+        # checkpoints for rstep/rcont to go back from
+        self.hokster.record_history()
         
         #* hiding shortcuts from help
         shrt = ['r', 's', 'st', 'stats']
@@ -45,6 +39,10 @@ class SimLoop(cmd2.Cmd):
         self.add_settable(cmd2.Settable('log',bool,'Log causes the output from run/step/cont to be appended to a log file.'))
         self.add_settable(cmd2.Settable('trace',bool,'Trace causes a status to be displayed on every clock cycle.'))
         self.add_settable(cmd2.Settable('print',bool,'Print causes the result of execution through run/cont/step to be displayed.'))
+        self.quiet = False
+        self.engine = "fsm"
+        self.add_settable(cmd2.Settable('engine',str,'Engine for run/cont: fsm steps every cycle, block runs translated basic blocks and falls back to fsm where cycles matter.',choices=['fsm','block']))
+        self.add_settable(cmd2.Settable('quiet',bool,'Quiet skips building per-instruction messages entirely, overriding print. Use when only results and cycle counts matter.'))
         
         self.Ns = 2
         self.add_settable(cmd2.Settable('Ns',int,'Generic for Number of pair registers Ri&Ai to shadow on interrupt.'))
@@ -141,6 +139,8 @@ class SimLoop(cmd2.Cmd):
             self.hokster.meta._timeout = self.timeout
         self.hokster.meta._print = self.print
         self.hokster.meta._trace = self.trace
+        self.hokster.meta.quiet(self.quiet)
+        self.hokster.meta.engine(self.engine)
         self.hokster.meta._log = self.log
         self.hokster.meta._interrupts = {key: value[:] for key, value in self._interrupts.items()}
         self.hokster.meta._cycinterr = {key: value[:] for key, value in self._cycinterr.items()}
@@ -171,9 +171,8 @@ class SimLoop(cmd2.Cmd):
                 end = self.hokster.core._dram._maxaddr
             self.poutput("Data Memory from {} to {}:".format(inp[0],"{0:#0{1}x}".format(end,6)[2:]))
             it = start
-            while it <= end:
-                dword = self.hokster.core._dram.bus(it).hex
-                self.poutput(dword,end=" ")
+            for dword in self.hokster.core._dram.view(start, end+1):
+                self.poutput("{:02x}".format(dword),end=" ")
                 it += 1
                 if it % 16 == 0:
                     self.poutput("\n",end="")
@@ -204,33 +203,33 @@ class SimLoop(cmd2.Cmd):
             if end > self.hokster.core._srgs._PC._maxPC:
                 self.perror("Error: <end> is {} but max PC is {}".format(hex(end)[2:].zfill(3),hex(self.hokster.core._srgs._PC._maxPC)[2:].zfill(3)))
             self.poutput("PC  : Progword")
-            for it,pword in enumerate(self.hokster.core._pram._mem[start:end+1]):
+            for it,pword in enumerate(self.hokster.core._pram.view(start, end+1)):
                 pc = it + start
                 if pc > self.hokster.core._srgs._PC._maxPC:
                     break
-                if self.hokster.core._srgs._PC._pc.uint == pc:
-                    self.poutput("{} : {} <".format(hex(pc)[2:].zfill(3),pword.hex))
+                if self.hokster.core._srgs._PC._pc == pc:
+                    self.poutput("{} : {:02x} <".format(hex(pc)[2:].zfill(3),pword))
                 else:
-                    self.poutput("{} : {}".format(hex(pc)[2:].zfill(3),pword.hex))
+                    self.poutput("{} : {:02x}".format(hex(pc)[2:].zfill(3),pword))
         elif inp.__len__() == 1:
             addr = int(inp[0],16)
             if addr > self.hokster.core._srgs._PC._maxPC:
                 self.perror("Error: <addr> is {} but max PC is {}".format(hex(addr)[2:].zfill(3),hex(self.hokster.core._srgs._PC._maxPC)[2:].zfill(3)))
-            pword = self.hokster.core._pram._mem[addr]
+            pword = self.hokster.core._pram.bus(addr)
             self.poutput("PC  : Progword")
-            if self.hokster.core._srgs._PC._pc.uint == addr:
-                self.poutput("{} : {} <".format(hex(addr)[2:].zfill(3),pword.hex))
+            if self.hokster.core._srgs._PC._pc == addr:
+                self.poutput("{} : {:02x} <".format(hex(addr)[2:].zfill(3),pword))
             else:
-                self.poutput("{} : {}".format(hex(addr)[2:].zfill(3),pword.hex))
+                self.poutput("{} : {:02x}".format(hex(addr)[2:].zfill(3),pword))
         elif inp.__len__() == 0:
             self.poutput("PC  : Progword")
-            for pc,pword in enumerate(self.hokster.core._pram._mem):
+            for pc,pword in enumerate(self.hokster.core._pram.view()):
                 if pc > self.hokster.core._srgs._PC._maxPC:
                     break
-                if self.hokster.core._srgs._PC._pc.uint == pc:
-                    self.poutput("{} : {} <".format(hex(pc)[2:].zfill(3),pword.hex))
+                if self.hokster.core._srgs._PC._pc == pc:
+                    self.poutput("{} : {:02x} <".format(hex(pc)[2:].zfill(3),pword))
                 else:
-                    self.poutput("{} : {}".format(hex(pc)[2:].zfill(3),pword.hex))
+                    self.poutput("{} : {:02x}".format(hex(pc)[2:].zfill(3),pword))
         else:
             self.perror("Read Prog Error: Too many arguments passed to rprog.\n'help rprog' for syntax.")
     def do_lmem(self, inp):
@@ -306,6 +305,7 @@ class SimLoop(cmd2.Cmd):
             if addr.uint > self.hokster.core._dram._maxaddr:
                 self.perror("Write Memory Warning: Address value {} for wmem greater than DRAM max address. Stopped writing values after {} have been written.".format(addr, it))
                 break
+        self.edited()
         #print("{} not yet implemented.".format(sys._getframe().f_code.co_name[3:]))
     def do_jump(self, inp):
         '''Jump: 'jump'
@@ -324,11 +324,17 @@ class SimLoop(cmd2.Cmd):
         except ValueError:
             self.perror("Jump Error: <newPC> must be a three-digit hex value")
             return
-        self.hokster.core._srgs._PC._pc = newPC.__copy__()
+        self.hokster.core._srgs._PC._pc = newPC.uint
         self.poutput("Jumped to {}".format(newPC.hex))
+        self.edited()
         #print("{} not yet implemented.".format(sys._getframe().f_code.co_name[3:]))
     def get_intr(self):
         self._interrupts = {key: value[:] for key, value in self.hokster.meta._interrupts.items()}
+        self._cycinterr = {key: value[:] for key, value in self.hokster.meta._cycinterr.items()}
+    def edited(self):
+        # user edits are not replayed, so history has to start over from them
+        if self.hokster.history is not None:
+            self.hokster.history.record()
     def do_step(self, inp):
         '''Step: 'step' 's'
     Executes a single cycle.'''
@@ -406,7 +412,7 @@ class SimLoop(cmd2.Cmd):
         self.pass_flags()
         errc, ret = self.hokster._h.run()
         if errc is not None:
-            if errc == "System End signal received.":
+            if errc == "System End signal received." or self.hokster._h.stop == hoksterCore.Stop.Halted:
                 self.pwarning(errc)
             if "Error" in errc:
                 self.perror(errc)
@@ -423,7 +429,7 @@ class SimLoop(cmd2.Cmd):
         if self.hokster.core._sbus._sys.hex != 'ff':
             errc, ret = self.hokster._h.run()
             if errc is not None:
-                if errc == "System End signal received.":
+                if errc == "System End signal received." or self.hokster._h.stop == hoksterCore.Stop.Halted:
                     self.pwarning(errc)
                 if "Error" in errc:
                     self.perror(errc)
@@ -431,6 +437,48 @@ class SimLoop(cmd2.Cmd):
         else:
             self.perror("Program end already reached.")
     #do_cont = do_run
+    def do_rstep(self, inp):
+        '''Reverse Step: 'rstep'
+    Steps back <n> cycles, default 1, to the state the core was in then.
+    Goes back to the nearest earlier checkpoint and replays up to that cycle;
+    breakpoints and settings stay as they are now.
+
+    Usage: "rstep [n]"
+    Example: rstep 10'''
+        inp = inp.arg_list
+        n = 1
+        if len(inp) > 0:
+            try:
+                n = int(inp[0])
+            except ValueError:
+                self.perror("Reverse Step Error: <n>={} must be a decimal number of cycles.".format(inp[0]))
+                return
+        if self.hokster.history is None:
+            self.perror("Reverse Step Error: No history is kept.")
+            return
+        self.pass_flags()
+        hist = self.hokster.history
+        ret = hist.rewind(max(hist.now() - n, 0))
+        if ret is not None:
+            self.perror(ret)
+            return
+        self.get_intr()
+        self.poutput("Back at cycle {}, pc = {}.".format(hist.now(), self.hokster.core._srgs._PC.hex()))
+    def do_rcont(self, inp):
+        '''Reverse Cont: 'rcont'
+    Runs backwards to the last cycle the program counter arrived at a breakpoint.
+    Without one it stops at the oldest checkpoint kept.'''
+        if self.hokster.history is None:
+            self.perror("Reverse Cont Error: No history is kept.")
+            return
+        self.pass_flags()
+        hist = self.hokster.history
+        cyc = hist.previous_break()
+        self.get_intr()
+        if cyc is None:
+            self.pwarning("No breakpoint reached before, back at the oldest checkpoint: cycle {}, pc = {}.".format(hist.now(), self.hokster.core._srgs._PC.hex()))
+        else:
+            self.poutput("Breakpoint at pc = {} reached at cycle {}.".format(self.hokster.core._srgs._PC.hex(), cyc))
     def do_setbreak(self, inp):
         '''Set Break: setbreak
     Sets a user-defined breakpoint at the three-digit hex address specified in <breakpoint>.
@@ -480,15 +528,48 @@ class SimLoop(cmd2.Cmd):
         inp = inp.arg_list
         self.poutput("{} not yet implemented.".format(sys._getframe().f_code.co_name[3:]))
     def ex_reset(self):
+        if self.hokster.restore() is None:
+            return
         self.hokster.reset()
         self.hokster._h.pram_load(self._proglines,self._psource)
         if (self._datalines is not None):
             self.hokster._h.data_load(self._datalines, self._dsource)
+        self.hokster.snapshot()
     def do_reset(self, inp):
         '''Reset: reset
-    Resets the instance of the program. PRAM and DRAM are re-loaded from files.'''
+    Resets the instance of the program to PRAM and DRAM as loaded from files.'''
         self.ex_reset()
-        
+    def do_checkpoint(self, inp):
+        '''Checkpoint: 'checkpoint'
+    Saves the whole machine state to <file>, default "<source>_State.bin"
+    where <source> precedes _prog.hex in the given program file.
+    Use 'restore' to resume from it, also in a later session.
+
+    Usage: "checkpoint [file]"
+    Example: checkpoint gift_round20.bin'''
+        inp = inp.arg_list
+        fn = inp[0] if len(inp) > 0 else self.source + "_State.bin"
+        ret = self.hokster.save_state(fn)
+        if ret is not None:
+            self.perror(ret)
+            return
+        self.poutput("Checkpoint \"{}\" written at cycle {}.".format(fn, self.hokster.core._cycle))
+    def do_restore(self, inp):
+        '''Restore: 'restore'
+    Puts the core in the state saved by 'checkpoint' to <file>, default "<source>_State.bin".
+    Continue from there with 'cont' or 'step'; 'run' and 'reset' still start over.
+
+    Usage: "restore [file]"
+    Example: restore gift_round20.bin'''
+        inp = inp.arg_list
+        fn = inp[0] if len(inp) > 0 else self.source + "_State.bin"
+        ret = self.hokster.load_state(fn)
+        if ret is not None:
+            self.perror(ret)
+            return
+        self.get_intr()
+        self.poutput("Restored \"{}\" at cycle {}, pc = {}.".format(fn, self.hokster.core._cycle, self.hokster.core._srgs._PC.hex()))
+
     def do_status(self, inp):
         '''Status: 'status' 'st'
     Displays current PC, instruction code and mnemonic, register contents, and status register.'''
@@ -623,6 +704,60 @@ class SimLoop(cmd2.Cmd):
         ds.close()
         # else:
         #self.poutput("{} not yet implemented.".format(sys._getframe().f_code.co_name[3:]))
+    def do_profile(self, inp):
+        '''Profile: 'profile'
+    'profile on' counts cycles per PC and per subroutine from then on, until
+    'profile off'. 'profile' shows where the cycles went since the last run or
+    reset: cycles per label of the assembly source "<source>.txt", the [n] hottest
+    loops with their source lines and the [n] hottest instructions, default 10. ISE wait and halted cycles count
+    at the instruction they belong to. The [n] subroutines with the most cycles
+    follow, with their calls and cycles inclusive and exclusive of what they called.
+    'profile dump' also writes it, with the counts of every PC, to [file],
+    default "<source>_Profile.txt".
+    'profile folded' writes the call stacks for flame graph tools to [file],
+    default "<source>.folded".
+
+    Usage: "profile on", "profile off", "profile [n]", "profile dump [file]", "profile folded [file]"
+    Example: profile 5'''
+        inp = inp.arg_list
+        if len(inp) > 0 and inp[0] in ("on", "off"):
+            self.hokster.profile(inp[0] == "on")
+            self.hokster.call_graph(inp[0] == "on")
+            self.poutput("Profiling {}.".format(inp[0]))
+            return
+        if self.hokster.profiler is None:
+            self.perror("Profile Error: Not profiling, start with 'profile on'.")
+            return
+        top = 10
+        fn = None
+        fold = None
+        if len(inp) > 0 and inp[0] == "dump":
+            fn = inp[1] if len(inp) > 1 else self.source + "_Profile.txt"
+        elif len(inp) > 0 and inp[0] == "folded":
+            fold = inp[1] if len(inp) > 1 else self.source + ".folded"
+        elif len(inp) > 0:
+            try:
+                top = int(inp[0])
+            except ValueError:
+                self.perror("Profile Error: <n>={} must be a decimal number.".format(inp[0]))
+                return
+        sym = None
+        src = os.path.join(self.dir, self.source + ".txt")
+        if not os.path.exists(src):
+            self.pwarning("No assembly source \"{}\", listing by PC only.".format(src))
+        else:
+            try:
+                sym = hoksterProf.Symbols(src)
+            except (IOError, ValueError) as er:
+                self.pwarning("Profile Warning: {}".format(er))
+        if fold is not None:
+            hoksterProf.folded(self.hokster, fold, sym)
+            self.poutput("Call stacks written to \"{}\".".format(fold))
+            return
+        self.poutput(hoksterProf.report(self.hokster, sym, top))
+        if fn is not None:
+            hoksterProf.dump(self.hokster, fn, sym, top)
+            self.poutput("Profile written to \"{}\".".format(fn))
     def do_logon(self, inp):
         '''Log Enable: 'logon'
     Enables logging instructions to <source>_Log.txt
@@ -650,6 +785,59 @@ class SimLoop(cmd2.Cmd):
         self.trace = False
         self.poutput("Trace disabled.")
         #self.poutput("{} not yet implemented.".format(sys._getframe().f_code.co_name[3:]))
+    def do_tracefile(self, inp):
+        '''Trace File: 'tracefile'
+    Writes a binary record of every clock cycle to <file>, default "<source>_Trace.bin",
+    until 'tracefile off'. Convert it with hoksterTrace.py.
+
+    Usage: "tracefile [file]", "tracefile off"
+    Example: tracefile gift.trace'''
+        inp = inp.arg_list
+        if len(inp) > 0 and inp[0] == "off":
+            tracer = self.hokster.tracer
+            if tracer is None:
+                self.perror("Trace File Error: No trace file is being written.")
+                return
+            self.hokster.trace_to(None)
+            self.poutput("Wrote {} cycles to \"{}\".".format(tracer.count, tracer.path))
+            return
+        fn = inp[0] if len(inp) > 0 else self.source + "_Trace.bin"
+        ret = self.hokster.trace_to(fn)
+        if ret is not None:
+            self.perror(ret)
+            return
+        self.poutput("Tracing to \"{}\".".format(fn))
+    def do_dramuse(self, inp):
+        '''DRAM Use: 'dramuse'
+    'dramuse on' counts reads and writes per DRAM address from then on, runs use
+    the fsm while counting, until 'dramuse off'. 'dramuse' shows the working set,
+    accesses per 256 byte page and the [n] addresses accessed most, default 10.
+    'dramuse map' writes a 256x256 heatmap, a row per page, to [file], default
+    "<source>_Heat.csv", as an image if [file] ends in .pgm.
+
+    Usage: "dramuse on", "dramuse off", "dramuse [n]", "dramuse map [file]"
+    Example: dramuse map aes.pgm'''
+        inp = inp.arg_list
+        if len(inp) > 0 and inp[0] in ("on", "off"):
+            self.hokster.count_access(inp[0] == "on")
+            self.poutput("Counting DRAM accesses {}.".format(inp[0]))
+            return
+        if self.hokster.access is None:
+            self.perror("DRAM Use Error: Not counting, start with 'dramuse on'.")
+            return
+        if len(inp) > 0 and inp[0] == "map":
+            fn = inp[1] if len(inp) > 1 else self.source + "_Heat.csv"
+            hoksterMem.heatmap(self.hokster.access, fn)
+            self.poutput("Heatmap written to \"{}\".".format(fn))
+            return
+        top = 10
+        if len(inp) > 0:
+            try:
+                top = int(inp[0])
+            except ValueError:
+                self.perror("DRAM Use Error: <n>={} must be a decimal number.".format(inp[0]))
+                return
+        self.poutput(hoksterMem.report(self.hokster, None, top))
     def default(self, inp):
         if self.progloaded:
             self.perror("Command Not Recognized.")
@@ -704,6 +892,7 @@ class SimLoop(cmd2.Cmd):
                 raise IOError(load[1])
             elif "Success" in load[1]:
                 self.poutput(load[1])
+        self.hokster.snapshot()
  
 if __name__ == '__main__':
     source = ""
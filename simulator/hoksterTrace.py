@@ -0,0 +1,144 @@
+'''
+hoksterTrace: reads the binary traces HOKSTER.trace_to writes and turns
+them into CSV or text.
+
+A trace is a header, TRACE_HEAD ("HOKTRACE", the format version, the
+record size and the length of the comma separated mnemonic names that
+follow it), then one fixed width TRACE_RECORD per cycle. A record holds
+the cycle, PC, progword, mnemonic, the register writes (two for lxb)
+and DRAM write of the cycle and the SR flags (see hoksterCore).
+
+    python hoksterTrace.py X.trace [--csv X.csv] [--text X.txt] [--start N] [--end N]
+
+From Python:
+
+    tr = hoksterTrace.TraceReader("X.trace")
+    for rec in tr:
+        rec.cycle, rec.pc, tr.mnem(rec), rec.reg, rec.val
+'''
+import os
+import sys
+import csv
+import argparse
+import collections
+import hoksterCore
+from hoksterCore import TRACE_HEAD, TRACE_RECORD, TRACE_REG, TRACE_MEM, TRACE_HALT, TRACE_END
+
+TraceRecord = collections.namedtuple("TraceRecord", hoksterCore.TRACE_FIELDS)
+
+CSV_FIELDS = ("cycle", "pc", "word", "mnem", "reg", "val", "reg2", "val2", "addr", "mem", "z", "n", "c", "x", "halt", "end")
+
+class TraceReader(object):
+    '''
+    The records of a trace file as TraceRecords, read chunk records at a
+    time. Raises ValueError if path is not a trace this version reads.
+    '''
+    def __init__(self, path, chunk = 1 << 16):
+        self.path = path
+        self._chunk = chunk
+        with open(path, "rb") as f:
+            head = f.read(TRACE_HEAD.size)
+            if len(head) < TRACE_HEAD.size or head[:len(hoksterCore.TRACE_MAGIC)] != hoksterCore.TRACE_MAGIC:
+                raise ValueError("\"{}\" is not a HOKSTER trace.".format(path))
+            magic, version, size, nlen = TRACE_HEAD.unpack(head)
+            if version != hoksterCore.TRACE_VERSION or size != TRACE_RECORD.size:
+                raise ValueError("Trace version {} of \"{}\" is not supported, expected {}.".format(version, path, hoksterCore.TRACE_VERSION))
+            self.mnems = f.read(nlen).decode().split(",")
+        self._start = TRACE_HEAD.size + nlen
+    def __len__(self):
+        return (os.path.getsize(self.path) - self._start) // TRACE_RECORD.size
+    def __iter__(self):
+        size = TRACE_RECORD.size
+        with open(self.path, "rb") as f:
+            f.seek(self._start)
+            while True:
+                buf = f.read(size * self._chunk)
+                n = len(buf) - len(buf) % size
+                if n == 0:
+                    break
+                for rec in TRACE_RECORD.iter_unpack(memoryview(buf)[:n]):
+                    yield TraceRecord._make(rec)
+    def mnem(self, rec):
+        return self.mnems[rec.ins] if rec.ins < len(self.mnems) else "?"
+    def records(self, start = None, end = None):
+        '''
+        Records of cycles start to end, both included, None for no bound.
+        '''
+        for rec in self:
+            if start is not None and rec.cycle < start:
+                continue
+            if end is not None and rec.cycle > end:
+                break
+            yield rec
+
+def reg_name(reg):
+    '''
+    Register index as the source names it, r0-r7 and a0-a7.
+    '''
+    return "ra"[reg >> 3] + str(reg & 7)
+
+def flags(rec):
+    '''
+    SR flags of a record as "zncx", with "-" for the ones not set.
+    '''
+    return "".join(f if rec.flags >> i & 1 else "-" for i, f in enumerate("zncx"))
+
+def to_csv(reader, out, start = None, end = None):
+    '''
+    Writes the records as CSV rows to the text file out. The register
+    and DRAM columns are empty on cycles that wrote none.
+    '''
+    w = csv.writer(out)
+    w.writerow(CSV_FIELDS)
+    for rec in reader.records(start, end):
+        f = rec.flags
+        reg = (rec.reg, "{:02x}".format(rec.val)) if f & TRACE_REG else ("", "")
+        reg += (rec.reg2, "{:02x}".format(rec.val2)) if rec.reg2 != 0xFF else ("", "")
+        mem = ("{:04x}".format(rec.addr), "{:02x}".format(rec.mem)) if f & TRACE_MEM else ("", "")
+        w.writerow((rec.cycle, "{:03x}".format(rec.pc), "{:02x}".format(rec.word), reader.mnem(rec)) + reg + mem
+            + tuple(f >> i & 1 for i in range(4)) + (int(bool(f & TRACE_HALT)), int(bool(f & TRACE_END))))
+
+def to_text(reader, out, start = None, end = None):
+    '''
+    Writes the records as one line per cycle to the text file out.
+    '''
+    for rec in reader.records(start, end):
+        f = rec.flags
+        line = "{:>10} pc: {:03x} {:02x} {:<4} {}".format(rec.cycle, rec.pc, rec.word, reader.mnem(rec), flags(rec))
+        if f & TRACE_REG:
+            line += " {} = {:02x}".format(reg_name(rec.reg), rec.val)
+        if rec.reg2 != 0xFF:
+            line += " {} = {:02x}".format(reg_name(rec.reg2), rec.val2)
+        if f & TRACE_MEM:
+            line += " [{:04x}] = {:02x}".format(rec.addr, rec.mem)
+        if f & TRACE_HALT:
+            line += " halt"
+        if f & TRACE_END:
+            line += " end"
+        out.write(line + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a binary HOKSTER trace to CSV or text.')
+    parser.add_argument('trace', type=str, help='trace file written by trace_to or the tracefile command')
+    parser.add_argument('--csv', type=str, help='CSV file to write, - for stdout', default=None, required=False)
+    parser.add_argument('--text', type=str, help='text file to write, - for stdout (the default without --csv)', default=None, required=False)
+    parser.add_argument('--start', type=int, help='first cycle to convert', default=None, required=False)
+    parser.add_argument('--end', type=int, help='last cycle to convert', default=None, required=False)
+    args = parser.parse_args()
+    try:
+        reader = TraceReader(args.trace)
+    except (IOError, ValueError) as er:
+        print("Error: {}".format(er), file=sys.stderr)
+        sys.exit(1)
+    if args.csv is None and args.text is None:
+        args.text = "-"
+    for path, conv in ((args.csv, to_csv), (args.text, to_text)):
+        if path is None:
+            continue
+        out = sys.stdout if path == "-" else open(path, 'w', newline='')
+        conv(reader, out, args.start, args.end)
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,538 @@
+'''
+hoksterVec: lockstep simulation of many instances of one HOKSTER program.
+
+Lockstep holds the state of n machines as NumPy arrays, regs (n, 16),
+ivects (n, 16), pc, sp, sr, ie, sbus and cycles (n,), and DRAM as 256 byte
+pages shared with the loaded image until an instance writes to them.
+Instances at the same PC run together, a basic block at a time, over the
+decode of Instruction_Handler and the ISE machines of hoksterCore; a branch
+or ret that sends them different ways splits the group, and groups that
+reach the same PC are merged again. Cycle counts match hoksterCore's fsm
+for programs that end on "sys 0xff". Interrupts are not modelled, as in
+hoksterAOT: hlt ends the run, and rti, str and lsr end it with an error.
+
+Needs numpy, which the rest of the simulator does not.
+
+    python hoksterVec.py prog.hex [-d data.hex] -i 0x0000 pt.txt [-r 0x0000 0x0010] [-o results.jsonl]
+
+Each -i file holds one hex line per instance, written at the address
+before the run; -n sets the instance count when there is no -i.
+'''
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import hoksterCore
+from hoksterCore import ISE_Tables, ISE_AMC, ISE_SWD, ISE_GSP, Stop
+
+class Lockstep_DRAM(object):
+    '''
+    DRAM of n instances. Pages nobody has written are read from the shared
+    image; the first write to a page gives it its own (n, 256) array.
+    Methods take the rows as sel (a slice or index array, for per-row
+    arrays) and idx (always an index array, for pairing with addresses).
+    '''
+    def __init__(self, image, n):
+        self._image = np.frombuffer(bytes(image), dtype=np.uint8)
+        self._n = n
+        self._pages = {}
+    def page(self, p):
+        pg = self._pages.get(p)
+        if pg is None:
+            pg = self._pages[p] = np.tile(self._image[p << 8:(p + 1) << 8], (self._n, 1))
+        return pg
+    def read(self, sel, idx, addr):
+        hi = addr >> 8
+        p = int(hi[0])
+        if (hi == p).all():
+            pg = self._pages.get(p)
+            if pg is None:
+                return self._image[addr]
+            return pg[idx, addr & 0xFF]
+        out = np.empty(len(idx), dtype=np.uint8)
+        for p in np.unique(hi):
+            m = hi == p
+            out[m] = self.read(idx[m], idx[m], addr[m])
+        return out
+    def write(self, sel, idx, addr, words):
+        hi = addr >> 8
+        p = int(hi[0])
+        if (hi == p).all():
+            self.page(p)[idx, addr & 0xFF] = words
+            return
+        words = np.broadcast_to(words, idx.shape)
+        for p in np.unique(hi):
+            m = hi == p
+            self.page(int(p))[idx[m], addr[m] & 0xFF] = words[m]
+    def load(self, start, words):
+        '''
+        Writes words at start in every instance: bytes for all of them, or
+        an (n, k) array with a row per instance.
+        '''
+        words = np.asarray(bytearray(words) if isinstance(words, (bytes, bytearray)) else words, dtype=np.uint8)
+        end = start + words.shape[-1]
+        if start < 0 or end > len(self._image):
+            raise IndexError("Memory Error: {} words at {} exceed size {}".format(words.shape[-1], start, len(self._image)))
+        for p in range(start >> 8, ((end - 1) >> 8) + 1):
+            lo, hi = max(start, p << 8), min(end, (p + 1) << 8)
+            self.page(p)[:, lo & 0xFF:((hi - 1) & 0xFF) + 1] = words[..., lo - start:hi - start]
+    def view(self, start, end):
+        '''
+        Words [start, end) of every instance as an (n, end - start) array.
+        '''
+        out = np.empty((self._n, end - start), dtype=np.uint8)
+        for p in range(start >> 8, ((end - 1) >> 8) + 1) if end > start else ():
+            lo, hi = max(start, p << 8), min(end, (p + 1) << 8)
+            pg = self._pages.get(p)
+            out[:, lo - start:hi - start] = self._image[lo:hi] if pg is None else pg[:, lo & 0xFF:((hi - 1) & 0xFF) + 1]
+        return out
+
+class ISE_Lanes(object):
+    '''
+    An ISE_Machine of hoksterCore with a lane per instance: its fields as
+    uint64 arrays, the lane last, and a state per lane. step and run act on
+    rows that share one state st, stepping the machine on their lanes.
+    '''
+    def __init__(self, machine, n):
+        self._m = machine
+        self.fields = {name: np.zeros((n,) if width is None else (width, n), dtype=np.uint64) for name, width in machine.FIELDS}
+        self.state = np.full(n, machine.DONE, dtype=np.uint8)
+    def reset(self, rows):
+        for arr in self.fields.values():
+            arr[..., rows] = 0
+        self.state[rows] = self._m.DONE
+    def step(self, R, rows, a, b, st):
+        m = self._m
+        if st == m.DONE:
+            self.reset(rows)
+            st = 0
+        for name, arr in self.fields.items():
+            setattr(m, name, arr[..., rows])
+        out = m.step(st, R[rows, a].astype(np.uint64), R[rows, b].astype(np.uint64))
+        for name, arr in self.fields.items():
+            arr[..., rows] = getattr(m, name)
+        if out is not None:
+            R[rows, b] = out
+        if st + 1 == m.DONE:
+            self.reset(rows)
+        else:
+            self.state[rows] = st + 1
+        return st in m.WAIT
+    def run(self, R, rows, a, b, st):
+        n = 1
+        while self.step(R, rows, a, b, st):
+            st = st % self._m.DONE + 1
+            n += 1
+        return n
+
+class Lane_GSP(ISE_GSP):
+    '''
+    ISE_GSP on lanes: the S-box as an array and the permutation through a
+    table per input byte.
+    '''
+    _perm = None
+    @classmethod
+    def perm_table(cls):
+        # (16, 256, 16): the output bytes of each value of input byte k
+        if cls._perm is None:
+            tbl = np.zeros((16, 256, 16), dtype=np.uint8)
+            vals = np.arange(256)
+            for j, k in enumerate(ISE_Tables.get().perm):
+                tbl[j >> 3, (vals >> (j & 7)) & 1 == 1, k >> 3] |= 1 << (k & 7)
+            cls._perm = tbl
+        return cls._perm
+    def __init__(self):
+        super(Lane_GSP, self).__init__()
+        self.sbox = np.frombuffer(ISE_Tables.get().gift, dtype=np.uint8)
+    def permute(self, inp):
+        return np.bitwise_or.reduce(self.perm_table()[np.arange(16)[:, None], inp], axis=0).T
+
+class Lockstep(object):
+    '''
+    n instances of the program prog (with data), raw words as bytes, hex
+    lines, or the path of a _prog.hex/_data.hex file. Write per-instance
+    inputs with load(), run(), then read regs, cycles, stop, errc and
+    view() of DRAM, each with a row per instance. stop holds Stop values,
+    -1 while an instance has not stopped.
+    Raises ValueError if prog or data do not load.
+    '''
+    def __init__(self, prog, data = None, n = 1):
+        h = hoksterCore.HOKSTER(quiet = True)
+        hoksterCore.load_program(h, prog, data)
+        self._ins = h._h._ins
+        self._pram = h.core._pram
+        self._maxpc = h.core._srgs._PC._maxPC
+        self._top = h.core._dram._maxaddr
+        self._dec = {}
+        self.n = n
+        self.dram = Lockstep_DRAM(h.core._dram.view(), n)
+        self.regs = np.zeros((n, 16), dtype=np.uint8)
+        self.ivects = np.zeros((n, 16), dtype=np.uint8)
+        self.pc = np.zeros(n, dtype=np.int32)
+        self.sp = np.zeros(n, dtype=np.int32)
+        self.sr = np.zeros(n, dtype=np.uint8)
+        self.ie = np.zeros(n, dtype=np.uint16)
+        self.sbus = np.zeros(n, dtype=np.uint8)
+        self.cycles = np.zeros(n, dtype=np.int64)
+        self.instructions = np.zeros(n, dtype=np.int64)
+        self.stop = np.full(n, -1, dtype=np.int8)
+        self.errc = [None]*n
+        self._asb = np.frombuffer(ISE_Tables.get().asb, dtype=np.uint8)
+        self._ise = {"amc" : ISE_Lanes(ISE_AMC(), n), "swd" : ISE_Lanes(ISE_SWD(), n), "gsp" : ISE_Lanes(Lane_GSP(), n)}
+        self._groups = {0 : np.arange(n)}
+        self._branch_flag = {"bzi": 1, "bni": 2, "bci": 4, "bxi": 8}
+        self._ops = {
+            "mvs" : self.op_mvs,
+            "mvv" : self.op_mvv,
+            "jmp" : self.op_jmp,
+            "jsr" : self.op_jsr,
+            "bzi" : self.op_bxx,
+            "bni" : self.op_bxx,
+            "bci" : self.op_bxx,
+            "bxi" : self.op_bxx,
+            "mvi" : self.op_mvi,
+            "psh" : self.op_psh,
+            "pop" : self.op_pop,
+            "add" : self.op_add,
+            "adc" : self.op_add,
+            "adi" : self.op_add,
+            "sub" : self.op_sub,
+            "sbc" : self.op_sub,
+            "sbi" : self.op_sub,
+            "and" : self.op_log,
+            "lor" : self.op_log,
+            "xor" : self.op_log,
+            "not" : self.op_not,
+            "sll" : self.op_sft,
+            "slr" : self.op_sft,
+            "rol" : self.op_sft,
+            "ror" : self.op_sft,
+            "mov" : self.op_mov,
+            "lxb" : self.op_lxb,
+            "sxb" : self.op_sxb,
+            "ret" : self.op_ret,
+            "rie" : self.op_rie,
+            "sie" : self.op_sie,
+            "asb" : self.op_asb,
+            "amc" : self.op_ise,
+            "swd" : self.op_ise,
+            "gsp" : self.op_ise,
+            "sys" : self.op_sys,
+            "hlt" : self.op_hlt,
+        }
+        # the fsm counts one cycle for the aluc byte of a waiting ISE, the
+        # lanes count the rest; the hlt cycle itself is never counted
+        self._cycles = {"amc" : 1, "swd" : 1, "gsp" : 1, "hlt" : 0}
+
+    def load(self, start, words):
+        self.dram.load(start, words)
+    def view(self, start, end):
+        return self.dram.view(start, end)
+
+    ##ops: each takes the group's rows as sel and idx (see Lockstep_DRAM)
+    ## and returns None to go on with the block, else the next PC, one per
+    ## row or one for all, with -1 for rows that stopped
+    def op_mvs(self, sel, idx, pc, b0, b1):
+        self.sp[sel] = ((((b0 & 0xF) << 8) | b1) << 4) & 0xFFF
+    def op_mvv(self, sel, idx, pc, b0, b1):
+        self.ivects[sel, b0 & 0xF] = b1
+    def op_jmp(self, sel, idx, pc, b0, b1):
+        return ((b0 & 0xF) << 8) | b1
+    def op_jsr(self, sel, idx, pc, b0, b1):
+        ret = (pc + 2) % 2**12
+        sp = self.sp[sel]
+        self.dram.write(sel, idx, sp, ret >> 8)
+        sp = np.where(sp > 0, sp - 1, sp)
+        self.dram.write(sel, idx, sp, ret & 0xFF)
+        self.sp[sel] = np.where(sp > 0, sp - 1, sp)
+        return ((b0 & 0xF) << 8) | b1
+    def op_bxx(self, sel, idx, pc, b0, b1):
+        taken = (self.sr[sel] & self._branch_flag[self._dec[pc][0]]) != 0
+        im = ((b0 & 0xF) << 8) | b1
+        if taken.all():
+            return im
+        if not taken.any():
+            return pc + 2
+        return np.where(taken, im, pc + 2)
+    def op_mvi(self, sel, idx, pc, b0, b1):
+        self.regs[sel, b0 & 0xF] = b1
+    def op_psh(self, sel, idx, pc, b0, b1):
+        sp = self.sp[sel]
+        self.dram.write(sel, idx, sp, self.regs[sel, b0 & 0xF])
+        self.sp[sel] = np.where(sp > 0, sp - 1, sp)
+    def op_pop(self, sel, idx, pc, b0, b1):
+        sp = self.sp[sel]
+        sp = np.where(sp < self._top, sp + 1, sp)
+        self.sp[sel] = sp
+        self.regs[sel, b0 & 0xF] = self.dram.read(sel, idx, sp)
+    def flags(self, sel, t, c):
+        # t the 8 bit result, c the carry; x is kept
+        self.sr[sel] = (self.sr[sel] & 0xF8) | (t == 0) | (t > 0x7F) << 1 | c << 2
+    def op_add(self, sel, idx, pc, b0, b1):
+        R = self.regs
+        a, b = b1 >> 4, b1 & 0xF
+        mnem = self._dec[pc][0]
+        if mnem == "adi":
+            t = R[sel, b].astype(np.uint16) + (a + 1)
+        elif mnem == "adc":
+            t = R[sel, a].astype(np.uint16) + R[sel, b] + ((self.sr[sel] >> 2) & 1)
+        else:
+            t = R[sel, a].astype(np.uint16) + R[sel, b]
+        t8 = t.astype(np.uint8)
+        self.flags(sel, t8, t > 0xFF)
+        R[sel, b] = t8
+    def op_sub(self, sel, idx, pc, b0, b1):
+        R = self.regs
+        a, b = b1 >> 4, b1 & 0xF
+        mnem = self._dec[pc][0]
+        if mnem == "sbi":
+            s, u = R[sel, b].astype(np.int16), a + 1
+        elif mnem == "sbc":
+            s, u = R[sel, a].astype(np.int16), R[sel, b].astype(np.int16) + ((self.sr[sel] >> 2) & 1)
+        else:
+            s, u = R[sel, a].astype(np.int16), R[sel, b].astype(np.int16)
+        t8 = (s - u).astype(np.uint8)
+        self.flags(sel, t8, s < u)
+        R[sel, b] = t8
+    def op_log(self, sel, idx, pc, b0, b1):
+        R = self.regs
+        a, b = b1 >> 4, b1 & 0xF
+        mnem = self._dec[pc][0]
+        if mnem == "and":
+            R[sel, b] = R[sel, b] & R[sel, a]
+        elif mnem == "lor":
+            R[sel, b] = R[sel, b] | R[sel, a]
+        else:
+            R[sel, b] = R[sel, b] ^ R[sel, a]
+    def op_not(self, sel, idx, pc, b0, b1):
+        self.regs[sel, b1 & 0xF] = self.regs[sel, b1 >> 4] ^ 0xFF
+    def op_sft(self, sel, idx, pc, b0, b1):
+        R = self.regs
+        a, b = b1 >> 4, b1 & 0xF
+        mnem = self._dec[pc][0]
+        s = R[sel, a].astype(np.uint16)
+        t = R[sel, b].astype(np.uint16)
+        if mnem == "sll":
+            R[sel, b] = (t << s) & 0xFF
+        elif mnem == "slr":
+            R[sel, b] = t >> s
+        elif mnem == "rol":
+            s &= 7
+            R[sel, b] = ((t << s) | (t >> (8 - s))) & 0xFF
+        else:
+            s &= 7
+            R[sel, b] = ((t >> s) | (t << (8 - s))) & 0xFF
+    def op_mov(self, sel, idx, pc, b0, b1):
+        self.regs[sel, b1 & 0xF] = self.regs[sel, b1 >> 4]
+    def op_lxb(self, sel, idx, pc, b0, b1):
+        R = self.regs
+        src, dst = b1 >> 4, b1 & 0xF
+        ri = src & 7
+        addr = (R[sel, ri + 8].astype(np.int32) << 8) | R[sel, ri]
+        R[sel, dst] = self.dram.read(sel, idx, addr)
+        if src & 8:
+            R[sel, ri] = (addr + 1) & 0xFF
+    def op_sxb(self, sel, idx, pc, b0, b1):
+        R = self.regs
+        src, dst = b1 >> 4, b1 & 0xF
+        ri = dst & 7
+        addr = (R[sel, ri + 8].astype(np.int32) << 8) | R[sel, ri]
+        self.dram.write(sel, idx, addr, R[sel, src])
+        if dst & 8:
+            R[sel, ri] = (addr + 1) & 0xFF
+    def op_ret(self, sel, idx, pc, b0, b1):
+        sp = self.sp[sel]
+        sp = np.where(sp < self._top, sp + 1, sp)
+        t = self.dram.read(sel, idx, sp).astype(np.int32)
+        sp = np.where(sp < self._top, sp + 1, sp)
+        self.sp[sel] = sp
+        nxt = ((self.dram.read(sel, idx, sp).astype(np.int32) & 0xF) << 8) | t
+        if (nxt == nxt[0]).all():
+            return int(nxt[0])
+        return nxt
+    def op_rie(self, sel, idx, pc, b0, b1):
+        ri = (b1 >> 4) & 7
+        ie = self.ie[sel]
+        self.regs[sel, ri + 8] = ie >> 8
+        self.regs[sel, ri] = ie & 0xFF
+    def op_sie(self, sel, idx, pc, b0, b1):
+        ri = (b1 >> 4) & 7
+        self.ie[sel] = (self.regs[sel, ri + 8].astype(np.uint16) << 8) | self.regs[sel, ri]
+    def op_asb(self, sel, idx, pc, b0, b1):
+        self.regs[sel, b1 & 0xF] = self._asb[self.regs[sel, b1 >> 4]]
+    def op_ise(self, sel, idx, pc, b0, b1):
+        ise = self._ise[self._dec[pc][0]]
+        states = ise.state[sel]
+        st = int(states[0])
+        if (states == st).all():
+            self.cycles[sel] += ise.run(self.regs, sel, b1 >> 4, b1 & 0xF, st)
+            return
+        for st in np.unique(states):
+            rows = idx[states == st]
+            self.cycles[rows] += ise.run(self.regs, rows, b1 >> 4, b1 & 0xF, int(st))
+    def op_sys(self, sel, idx, pc, b0, b1):
+        self.sbus[sel] = b1
+        if b1 == 0xff:
+            self.halt(sel, idx, Stop.End, "System End signal received.", pc + 1)
+            return -1
+    def op_hlt(self, sel, idx, pc, b0, b1):
+        self.halt(sel, idx, Stop.End, "Halted.", pc + 1)
+        return -1
+
+    def halt(self, sel, idx, stop, errc, pc):
+        self.stop[sel] = stop
+        self.pc[sel] = pc
+        for i in idx.tolist():
+            self.errc[i] = errc
+
+    def decode(self, pc):
+        '''
+        (mnem, first byte, second byte, length) of the instruction at pc.
+        '''
+        ent = self._dec.get(pc)
+        if ent is None:
+            dec = self._ins.fetch(pc)
+            mnem = dec._op._instr._mnem if dec._op is not None else None
+            length = dec._op._cycles if dec._op is not None else 1
+            b1 = self._pram.bus(pc + 1) if length > 1 and pc + 1 <= self._pram._maxaddr else 0
+            ent = self._dec[pc] = (mnem, dec._word, b1, length)
+        return ent
+
+    def block(self, pc, idx):
+        '''
+        Runs the rows idx, all at pc, to the end of the basic block and
+        returns where each goes next, as the ops do.
+        '''
+        sel = slice(None) if len(idx) == self.n else idx
+        cycles = 0
+        count = 0
+        nxt = None
+        while nxt is None:
+            mnem, b0, b1, length = self.decode(pc)
+            op = self._ops.get(mnem)
+            if op is None:
+                if mnem is None:
+                    errc = "Error: Unrecognized instruction {:02x}".format(b0)
+                else:
+                    errc = "Error: {} not supported in lockstep".format(mnem)
+                self.halt(sel, idx, Stop.Error, "{} at pc = {:03x}.".format(errc, pc), pc)
+                nxt = -1
+                break
+            # the fsm stops with "Max PC Exceeded." when it cannot advance past
+            # the last cycle it ran; jumps only need to get past their first one
+            jumps = mnem in ("jmp", "jsr") or mnem in self._branch_flag
+            last = pc if jumps or (mnem == "sys" and b1 == 0xff) else pc + length - 1
+            if mnem != "ret" and last + 1 > self._maxpc:
+                ran = max(1, min(length, self._maxpc - pc + 1))
+                if ran == length and not jumps and mnem != "hlt" and not (mnem == "sys" and b1 == 0xff):
+                    op(sel, idx, pc, b0, b1)
+                    count += 1
+                cycles += ran
+                self.halt(sel, idx, Stop.Error, "Error: Max PC Exceeded.", self._maxpc)
+                nxt = -1
+                break
+            cycles += self._cycles.get(mnem, length)
+            count += 1
+            nxt = op(sel, idx, pc, b0, b1)
+            pc += length
+        self.cycles[sel] += cycles
+        self.instructions[sel] += count
+        return nxt
+
+    def merge(self, pc, idx):
+        have = self._groups.get(pc)
+        self._groups[pc] = idx if have is None else np.union1d(have, idx)
+
+    def run(self, max_cycles = None):
+        '''
+        Runs every instance until it stops, or its cycles reach max_cycles
+        at the start of a block. The group at the lowest PC goes first so
+        that groups which split come together again.
+        '''
+        groups = self._groups
+        while groups:
+            pc = min(groups)
+            idx = groups.pop(pc)
+            self.pc[idx] = pc
+            if max_cycles is not None:
+                over = self.cycles[idx] >= max_cycles
+                if over.any():
+                    self.halt(idx[over], idx[over], Stop.CycleLimit, "Cycle limit of {} reached.".format(max_cycles), pc)
+                    idx = idx[~over]
+                    if not len(idx):
+                        continue
+            if pc > self._maxpc:
+                self.halt(idx, idx, Stop.Error, "Error: Max PC Exceeded.", self._maxpc)
+                continue
+            nxt = self.block(pc, idx)
+            if isinstance(nxt, np.ndarray):
+                for p in np.unique(nxt).tolist():
+                    if p >= 0:
+                        self.merge(p, idx[nxt == p])
+            elif nxt >= 0:
+                self.merge(nxt, idx)
+        return self
+
+def lockstep(prog, data = None, inputs = None, n = None, max_cycles = None):
+    '''
+    Builds and runs a Lockstep. inputs maps DRAM addresses to bytes for
+    every instance or an (n, k) array, one row per instance; n defaults to
+    the rows of the inputs.
+    '''
+    inputs = inputs or {}
+    if n is None:
+        n = max([len(v) for v in inputs.values() if np.ndim(v) == 2] or [1])
+    ls = Lockstep(prog, data, n)
+    for addr, words in inputs.items():
+        ls.load(addr, words)
+    return ls.run(max_cycles)
+
+def hex_rows(path):
+    with open(path) as f:
+        return np.array([bytearray.fromhex(line.strip()) for line in f if line.strip()], dtype=np.uint8)
+
+def num(x):
+    return int(x, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run many instances of a HOKSTER program in lockstep.')
+    parser.add_argument('prog', type=str, help='program hex file')
+    parser.add_argument('--data', '-d', type=str, help='data hex file', default=None, required=False)
+    parser.add_argument('--input', '-i', type=str, nargs=2, action='append', metavar=('ADDR', 'FILE'), default=[],
+        help='file of hex lines, one per instance, to write at ADDR')
+    parser.add_argument('--range', '-r', type=num, nargs=2, action='append', metavar=('START', 'END'), default=[],
+        help='DRAM range to report')
+    parser.add_argument('--instances', '-n', type=int, help='instances when there is no input', default=None, required=False)
+    parser.add_argument('--max-cycles', '-c', type=int, help='cycle limit per instance', default=None, required=False)
+    parser.add_argument('--output', '-o', type=str, help='JSON lines file to write, default stdout', default=None, required=False)
+    args = parser.parse_args()
+    if args.data is None and "prog" in args.prog:
+        dsource = args.prog.replace("prog", "data")
+        if os.path.exists(dsource):
+            args.data = dsource
+    try:
+        inputs = {num(addr): hex_rows(fn) for addr, fn in args.input}
+        ls = lockstep(args.prog, args.data, inputs, args.instances, args.max_cycles)
+    except (IOError, ValueError, IndexError) as er:
+        print("Error: {}".format(er), file=sys.stderr)
+        sys.exit(1)
+    dram = {(a, b): ls.view(a, b) for a, b in args.range}
+    out = sys.stdout if args.output is None else open(args.output, 'w')
+    for i in range(ls.n):
+        out.write(json.dumps({
+            "id": i,
+            "stop": Stop(int(ls.stop[i])).name,
+            "errc": ls.errc[i],
+            "cycles": int(ls.cycles[i]),
+            "instructions": int(ls.instructions[i]),
+            "pc": int(ls.pc[i]),
+            "sp": int(ls.sp[i]),
+            "regs": ls.regs[i].tolist(),
+            "dram": {"{:04x}-{:04x}".format(a, b): v[i].tobytes().hex() for (a, b), v in dram.items()},
+        }) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+if __name__ == '__main__':
+    main()